@@ -0,0 +1,231 @@
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+CHECKPOINT_INTERVAL = 300  # seconds between writes, the ticks in between only add up in memory
+LEDGER_MAX_BYTES = 32 << 20   # compact the ledger past this size
+COMPACT_AFTER = 86400         # ledger entries older than this are merged into one per process and day
+FIELDS = ('cpu', 'read', 'write', 'uptime', 'restarts')
+PERIOD = re.compile(r'^(\d+(?:\.\d+)?)([smhdw])$')
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+def parse_since(text: str, now: float = None):
+    """The start of a period given as 7d, 12h, 30m... back from now, or as an ISO date"""
+    text = text.strip()
+    match = PERIOD.match(text)
+    if match:
+        return (now or time.time()) - float(match[1]) * UNITS[match[2]]
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise ValueError(f"invalid period '{text}', expected e.g. 7d, 12h or 2026-01-31")
+
+
+def accounting_dir(config_dir: str):
+    return os.path.join(config_dir, 'accounting')
+
+
+def _empty():
+    return dict.fromkeys(FIELDS, 0)
+
+
+class Accounting:
+    """Cumulative CPU seconds, IO bytes, uptime and restarts of every process.
+
+    ``update`` runs on every sample tick and adds what each run consumed
+    since the previous tick; a new PID (or start time) begins a new run,
+    whose counters start at zero. Totals only reach the disk on
+    ``checkpoint``: ``totals.json`` is rewritten with the totals and where
+    each run's counters were last read, so a daemon restarted while a
+    process kept running carries on from there, and the deltas since the
+    previous checkpoint are appended to ``usage.ndjson`` for reports over a
+    period. Processes using a cgroup are accounted for their whole tree,
+    each run gets a new group so its counters start at zero too.
+    """
+
+    def __init__(self, pm):
+        self.pm = pm
+        self.dir = accounting_dir(pm.config_dir)
+        self.totals_file = os.path.join(self.dir, 'totals.json')
+        self.ledger_file = os.path.join(self.dir, 'usage.ndjson')
+        self.accounts = {}  # title -> totals, 'since' and the current 'run'
+        self._pending = {}  # title -> deltas since the last checkpoint
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.totals_file, 'r') as f:
+                self.accounts = json.load(f).get('accounts') or {}
+        except (OSError, ValueError):
+            self.accounts = {}
+
+    def _counters(self, title: str, sample):
+        """(CPU seconds, bytes read, bytes written) of the current run, None if not sampled"""
+        info = self.pm.processes.get(title)
+        if info is not None and info.spec.cgroup and self.pm.cgroups.available:
+            stats = self.pm.cgroups.stats(title)
+            return stats['cpu_usec'] / 1e6, stats['io_read'], stats['io_write']
+        if sample.get('cpu_time') is None:
+            return None
+        return sample['cpu_time'], sample.get('io_read'), sample.get('io_write')
+
+    def _add(self, title: str, **deltas):
+        account, pending = self.accounts[title], self._pending.setdefault(title, _empty())
+        for name, value in deltas.items():
+            account[name] += value
+            pending[name] += value
+
+    def update(self, samples, now: float = None):
+        """Add what the sampled processes consumed since the previous tick"""
+        now = now or time.time()
+        with self._lock:
+            for title, sample in samples.items():
+                counters = self._counters(title, sample)
+                if counters is None:
+                    continue
+                cpu, read, write = counters
+                started = sample.get('started') or now
+                account = self.accounts.get(title)
+                if account is None:
+                    # The first run is counted from its start, even if that was before the daemon's
+                    account = self.accounts[title] = dict(_empty(), since=min(started, now), run=None)
+                run = account['run']
+                if run is None or run['pid'] != sample['pid'] or run['started'] != started:
+                    if run is not None:
+                        self._add(title, restarts=1)
+                    run = account['run'] = {'pid': sample['pid'], 'started': started,
+                                            'cpu': 0, 'read': 0, 'write': 0, 'seen': started}
+                # Counters only grow within a run, but a cgroup can be recreated under a running title
+                self._add(title,
+                          cpu=max(0.0, cpu - run['cpu']),
+                          read=max(0, read - run['read']) if read is not None else 0,
+                          write=max(0, (write or 0) - run['write']) if read is not None else 0,
+                          uptime=max(0.0, now - run['seen']))
+                run['cpu'] = cpu
+                if read is not None:
+                    run['read'], run['write'] = read, write or 0
+                run['seen'] = now
+
+    def checkpoint(self, now: float = None):
+        """Write the totals and append the deltas since the last checkpoint to the ledger"""
+        now = now or time.time()
+        with self._lock:
+            os.makedirs(self.dir, exist_ok=True)
+            temp_file = f"{self.totals_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w') as f:
+                json.dump({'time': now, 'accounts': self.accounts}, f, separators=(',', ':'))
+            os.replace(temp_file, self.totals_file)
+            pending, self._pending = self._pending, {}
+            lines = ''.join(
+                json.dumps({'t': round(now, 1), 'title': title,
+                            **{name: round(value, 3) for name, value in deltas.items() if value}},
+                           separators=(',', ':')) + '\n'
+                for title, deltas in pending.items() if any(deltas.values())
+            )
+            if lines:
+                with open(self.ledger_file, 'a') as f:
+                    f.write(lines)
+            try:
+                if os.path.getsize(self.ledger_file) > LEDGER_MAX_BYTES:
+                    self._compact(now)
+            except OSError:
+                pass
+
+    def _compact(self, now: float):
+        """Merge the ledger entries older than a day into one per process and day"""
+        days = {}  # (title, day) -> merged entry
+        recent = []
+        for entry in read_ledger(self.ledger_file):
+            if entry['t'] >= now - COMPACT_AFTER:
+                recent.append(entry)
+                continue
+            key = (entry['title'], time.strftime('%Y-%m-%d', time.localtime(entry['t'])))
+            merged = days.setdefault(key, {'t': entry['t'], 'title': entry['title']})
+            merged['t'] = max(merged['t'], entry['t'])
+            for name in FIELDS:
+                if name in entry:
+                    merged[name] = round(merged.get(name, 0) + entry[name], 3)
+        temp_file = f"{self.ledger_file}.{os.getpid()}.tmp"
+        with open(temp_file, 'w') as f:
+            for entry in sorted(days.values(), key=lambda entry: entry['t']) + recent:
+                f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        os.replace(temp_file, self.ledger_file)
+
+    def metrics(self):
+        """Yield (title, account) with the lifetime totals, for the exporter"""
+        with self._lock:
+            accounts = list(self.accounts.items())
+        yield from accounts
+
+
+def read_ledger(path: str):
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash
+                    continue
+    except OSError:
+        return
+
+
+def report(config_dir: str, since: float = None):
+    """{title: totals} consumed since ``since``, or over each process's lifetime"""
+    directory = accounting_dir(config_dir)
+    if since is None:
+        try:
+            with open(os.path.join(directory, 'totals.json'), 'r') as f:
+                accounts = json.load(f).get('accounts') or {}
+        except (OSError, ValueError):
+            return {}
+        return {title: {name: account[name] for name in FIELDS} | {'since': account['since']}
+                for title, account in accounts.items()}
+    totals = {}
+    for entry in read_ledger(os.path.join(directory, 'usage.ndjson')):
+        if entry['t'] < since:
+            continue
+        total = totals.setdefault(entry['title'], dict(_empty(), since=since))
+        for name in FIELDS:
+            total[name] += entry.get(name, 0)
+    return totals
+
+
+def format_bytes(value):
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if value < 1024 or unit == 'TB':
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+        value /= 1024
+
+
+def print_report(pm, totals, since: float = None):
+    """One row per process, busiest first, and the sum over all of them"""
+    from rich.table import Table
+    from index import format_duration
+    now = time.time()
+    period = f"since {datetime.fromtimestamp(since).isoformat(sep=' ', timespec='minutes')}" if since else "lifetime"
+    table = Table(show_header=True, header_style="bold magenta", title=f"Usage ({period})")
+    for column in ("Process", "CPU time", "Avg cores", "Read", "Written", "Uptime", "Restarts"):
+        table.add_column(column, justify="left" if column == "Process" else "right")
+
+    def row(title, total, start):
+        cpu = total['cpu']
+        return (title, f"{cpu:.1f}s" if cpu < 60 else format_duration(cpu),
+                f"{cpu / max(now - start, 1):.3f}", format_bytes(total['read']), format_bytes(total['write']),
+                format_duration(total['uptime']), str(int(total['restarts'])))
+
+    for title, total in sorted(totals.items(), key=lambda item: item[1]['cpu'], reverse=True):
+        table.add_row(*row(title, total, since or total['since']))
+    if len(totals) > 1:
+        overall = {name: sum(total[name] for total in totals.values()) for name in FIELDS}
+        start = since or min(total['since'] for total in totals.values())
+        table.add_row(*(f"[bold]{cell}[/bold]" for cell in row('Total', overall, start)))
+    pm.console.print(table)
+    if not totals:
+        pm.console.print("No usage recorded yet: the daemon accounts for the processes it samples")
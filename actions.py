@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from control import ControlClient
+
+ACTION_WORKERS = 4
+SPINNER = '⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏'
+PROGRESS = {'start': 'starting', 'stop': 'stopping', 'restart': 'restarting', 'setup_startup': 'setting up'}
+DONE = {'start': 'Started', 'stop': 'Stopped', 'restart': 'Restarted', 'setup_startup': 'Set up startup'}
+DAEMON_ACTIONS = ('start', 'stop', 'restart')
+
+
+def outcome(pm, action: str, title: str, status: str = None):
+    """(ok, message) for an action that just returned, judged by the process's status"""
+    if status is None:
+        info = pm.processes.get(title)
+        status = info.state.status if info is not None else None
+    if (status == 'running') != (action != 'stop'):
+        return False, f"Failed to {action} {title}"
+    return True, f"{DONE[action]} {title}"
+
+
+class ActionRunner:
+    """Run start/stop/restart on a small thread pool, so frontends never wait on them.
+
+    Only one action runs per process at a time. Finished actions are queued
+    as (title, action, ok, message) for the frontend to pick up with
+    ``results`` on its next refresh. Start, stop and restart go to the daemon
+    when one is running, so it keeps owning the processes.
+    """
+
+    def __init__(self, pm, workers: int = ACTION_WORKERS):
+        self.pm = pm
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pypm-action')
+        self._pending = {}  # title (or action without one) -> action
+        self._results = deque()
+        self._lock = threading.Lock()
+
+    def submit(self, action: str, title: str = None):
+        """Queue ``pm.<action>(title)``, False if one is already running for the process"""
+        key = title or action
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending[key] = action
+        self._pool.submit(self._run, action, title)
+        return True
+
+    def _via_daemon(self, action: str, title: str):
+        """The daemon's response to the action, or None if no daemon is running"""
+        try:
+            response = ControlClient(self.pm).request(action, title=title)
+        except OSError:
+            return None
+        # The daemon saved the new state, show it here too
+        self.pm._load_processes()
+        return response
+
+    def _run(self, action: str, title: str):
+        ok, message = True, DONE[action] + (f" {title}" if title else '')
+        try:
+            response = self._via_daemon(action, title) if title and action in DAEMON_ACTIONS else None
+            if response is not None:
+                if response.get('ok'):
+                    ok, message = outcome(self.pm, action, title, response.get('status'))
+                else:
+                    ok, message = False, f"Failed to {action} {title}: {response.get('error')}"
+            elif title is None:
+                getattr(self.pm, action)()
+            else:
+                getattr(self.pm, action)(title)
+                ok, message = outcome(self.pm, action, title)
+        except Exception as e:
+            ok, message = False, f"Failed to {action.replace('_', ' ')} {title or ''}: {str(e)}"
+        finally:
+            with self._lock:
+                self._pending.pop(title or action, None)
+            self._results.append((title, action, ok, message))
+
+    def busy(self, title: str):
+        """The action running for a process, if any"""
+        return self._pending.get(title)
+
+    def active(self):
+        return bool(self._pending)
+
+    def progress(self, title: str):
+        """'⠹ restarting' while an action runs for the process, else None"""
+        action = self._pending.get(title)
+        if action is None:
+            return None
+        return f"{SPINNER[int(time.time() * 10) % len(SPINNER)]} {PROGRESS[action]}"
+
+    def results(self):
+        """Take the actions finished since the last call"""
+        results = []
+        while self._results:
+            results.append(self._results.popleft())
+        return results
+
+    def summary(self):
+        """One status line for the actions finished since the last call, or None"""
+        results = self.results()
+        if not results:
+            return None
+        if len(results) == 1:
+            return results[0][3]
+        failed = [message for _, _, ok, message in results if not ok]
+        line = f"{len(results) - len(failed)}/{len(results)} actions succeeded"
+        return f"{line}: {failed[-1]}" if failed else line
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,147 @@
+import math
+import os
+import signal
+import subprocess
+import threading
+import time
+
+DEFAULT_SCALE_UP = 75.0
+DEFAULT_SCALE_DOWN = 25.0
+DEFAULT_COOLDOWN = 60.0
+COMMAND_TIMEOUT = 5  # seconds
+
+
+def validate(min_instances: int = None, max_instances: int = None, scale_up: float = None,
+             scale_down: float = None):
+    """Raise ValueError if the instance limits or the thresholds leave nothing to scale between"""
+    if min_instances is not None and max_instances is not None and min_instances > max_instances:
+        raise ValueError(f"min_instances ({min_instances}) is above max_instances ({max_instances})")
+    # Unset thresholds are filled in the way desired_instances does
+    up = float(scale_up or DEFAULT_SCALE_UP)
+    down = float(scale_down or DEFAULT_SCALE_DOWN)
+    if down >= up:
+        raise ValueError(f"scale_down ({down:g}) must be below scale_up ({up:g})")
+
+
+class Autoscaler:
+    """Scale a process between ``min_instances`` and ``max_instances``.
+
+    The load per instance is either the group's aggregate CPU % from the
+    sampler, or the number printed by ``scale_command`` (e.g. queue depth)
+    divided by the current instance count. Above ``scale_up`` the group grows
+    straight to the size that brings the load back under the threshold;
+    below ``scale_down`` it shrinks by one instance. The gap between the two
+    thresholds is the hysteresis band, and no group is scaled again within
+    ``scale_cooldown`` seconds of its last change.
+
+    A ``scale_command`` runs on a thread of its own and its result comes back
+    through the timers, so a slow command never holds up the daemon's other
+    timers.
+    """
+
+    def __init__(self, pm, sampler, timers):
+        self.pm = pm
+        self.sampler = sampler
+        self.timers = timers
+        self._last_scaled = {}  # title -> time of the last change
+        self._busy = set()
+        self._lock = threading.Lock()
+
+    def _command_load(self, title: str, spec):
+        """Run the group's scale command, the number it printed or None"""
+        try:
+            process = subprocess.Popen(spec.scale_command, shell=True, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL, text=True, cwd=spec.cwd,
+                                       start_new_session=True)
+            try:
+                output, _ = process.communicate(timeout=COMMAND_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                # Kill the whole session, a child left holding stdout would block communicate()
+                os.killpg(process.pid, signal.SIGKILL)
+                process.communicate()
+                raise
+            return float(output.strip().split()[0])
+        except (OSError, subprocess.TimeoutExpired, ValueError, IndexError) as e:
+            self.pm.console.print(f"[red]Scale command for '{title}' failed: {str(e)}[/red]")
+            return None
+
+    def _measure(self, title: str, spec, current: int):
+        """Run the scale command off the timer thread and decide on the timer thread"""
+        with self._lock:
+            self._busy.add(title)
+
+        def worker():
+            load = None
+            try:
+                load = self._command_load(title, spec)
+            finally:
+                self.timers.call_later(0, self._decide, title, current, load)
+
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+
+    def _decide(self, title: str, current: int, load):
+        """Scale a group to its load, if it was measured and the group didn't change meanwhile"""
+        with self._lock:
+            self._busy.discard(title)
+        info = self.pm.processes.get(title)
+        if load is None or info is None or int(info.state.instances or 1) != current:
+            return
+        desired = self.desired_instances(info.spec, current, load)
+        if desired != current:
+            self.pm.console.print(
+                f"[cyan]Scaling '{title}' from {current} to {desired} instances (load {load:.1f})[/cyan]")
+            self._scale(title, desired)
+
+    def desired_instances(self, spec, current: int, load: float):
+        """Instance count for a load, clamped to the group's limits"""
+        low = int(spec.min_instances or 1)
+        high = int(spec.max_instances or low)
+        scale_up = float(spec.scale_up or DEFAULT_SCALE_UP)
+        scale_down = float(spec.scale_down or DEFAULT_SCALE_DOWN)
+
+        per_instance = load / max(current, 1)
+        desired = current
+        if per_instance > scale_up:
+            desired = math.ceil(load / scale_up)
+        elif per_instance < scale_down:
+            desired = current - 1
+        return max(low, min(high, desired))
+
+    def evaluate(self):
+        """Check every autoscaled group once"""
+        for title, info in self.pm.snapshot():
+            spec = info.spec
+            if not spec.max_instances or spec.group:
+                continue
+            with self._lock:
+                if title in self._busy:
+                    continue
+            cooldown = float(spec.scale_cooldown or DEFAULT_COOLDOWN)
+            if time.time() - self._last_scaled.get(title, 0) < cooldown:
+                continue
+
+            current = int(info.state.instances or 1)
+            if spec.scale_command:
+                self._measure(title, spec, current)
+            else:
+                self._decide(title, current, self.sampler.group_cpu(self.pm.instances(title)))
+
+    def _scale(self, title: str, count: int):
+        """Scale in the background so slow starts don't hold up the daemon"""
+        with self._lock:
+            self._busy.add(title)
+        self._last_scaled[title] = time.time()
+
+        def worker():
+            try:
+                self.pm.scale(title, count)
+            finally:
+                with self._lock:
+                    self._busy.discard(title)
+                self._last_scaled[title] = time.time()
+
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from rich.console import Console
+from process_manager import ProcessManager
+from models import ProcessRecord
+from sampler import Sampler
+
+SLEEPER = "import time\ntime.sleep(3600)\n"
+LIST_SIZES = (10, 100, 1000)
+LIST_RUNNING = (0, 10)  # processes running among the saved ones, list() measures each for 0.1s
+
+
+class Benchmark:
+    """Time the supervisor's hot paths against dummy child processes.
+
+    Everything runs in a throwaway config directory so the user's own
+    processes are never touched.
+    """
+
+    def __init__(self, repeat: int = 5, sizes=LIST_SIZES, running=LIST_RUNNING, log_mb: int = 50):
+        self.repeat = repeat
+        self.sizes = sizes
+        self.running = running
+        self.log_mb = log_mb
+        self.results = {}
+        self.workdir = tempfile.mkdtemp(prefix='pypm-bench-')
+        self.script = os.path.join(self.workdir, 'sleeper.py')
+        with open(self.script, 'w') as f:
+            f.write(SLEEPER)
+
+    def _manager(self, name: str):
+        """A ProcessManager with its own config directory and silenced output"""
+        pm = ProcessManager(config_dir=os.path.join(self.workdir, name))
+        pm.console = Console(file=io.StringIO())
+        return pm
+
+    def _record(self, name: str, timings, **extra):
+        self.results[name] = {
+            'runs': len(timings),
+            'mean': statistics.mean(timings),
+            'min': min(timings),
+            'max': max(timings),
+            'p50': statistics.median(timings),
+            **extra,
+        }
+
+    def _time(self, fn, *args):
+        start = time.perf_counter()
+        fn(*args)
+        return time.perf_counter() - start
+
+    def bench_lifecycle(self):
+        """Latency of start, stop and restart of a single process"""
+        pm = self._manager('lifecycle')
+        pm.save('sleeper', f"python {self.script}", cwd=self.workdir)
+        starts, stops, restarts = [], [], []
+        for _ in range(self.repeat):
+            starts.append(self._time(pm.start, 'sleeper'))
+            restarts.append(self._time(pm.restart, 'sleeper'))
+            stops.append(self._time(pm.stop, 'sleeper'))
+        self._record('start', starts)
+        self._record('stop', stops)
+        self._record('restart', restarts)
+
+    def bench_list(self):
+        """list() time as the number of saved processes, and of running ones among them, grows"""
+        for size in self.sizes:
+            pm = self._manager(f"list-{size}")
+            pm.save('proc-0', f"python {self.script}", cwd=self.workdir)
+            # Share the spec rather than calling save() size times, which rewrites the file each time
+            for i in range(1, size):
+                pm.processes[f"proc-{i}"] = ProcessRecord(pm.processes['proc-0'].spec)
+            pm._save_processes()
+            started = []
+            try:
+                for running in sorted(set(min(count, size) for count in self.running)):
+                    while len(started) < running:
+                        started.append(f"proc-{len(started)}")
+                        pm.start(started[-1])
+                    name = f"list_{size}" if not running else f"list_{size}_running_{running}"
+                    self._record(name, [self._time(pm.list) for _ in range(self.repeat)],
+                                 processes=size, running=running)
+            finally:
+                for title in started:
+                    pm.stop(title)
+
+    def bench_cli_cold_start(self):
+        """Wall time of a fresh `pypm --help` interpreter"""
+        env = dict(os.environ, HOME=self.workdir)
+        cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cli.py')
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, cli, '--help'], env=env, stdout=subprocess.DEVNULL, check=True)
+            timings.append(time.perf_counter() - start)
+        self._record('cli_cold_start', timings)
+
+    def bench_log_tail(self):
+        """view_logs() latency on a large log file"""
+        pm = self._manager('logs')
+        pm.save('chatty', f"python {self.script}", cwd=self.workdir)
+        stdout_log, stderr_log = pm._log_paths('chatty')
+        line = "2024-01-01 12:00:00 INFO request handled in 12ms path=/api/v1/items\n"
+        with open(stdout_log, 'w') as f:
+            f.write(line * (self.log_mb * 1024 * 1024 // len(line)))
+        open(stderr_log, 'w').close()
+        timings = [self._time(pm.view_logs, 'chatty') for _ in range(self.repeat)]
+        self._record('log_tail', timings, size_mb=self.log_mb)
+
+    def bench_sampler(self, count: int = 20):
+        """Cost of one Sampler.sample() over running processes"""
+        pm = self._manager('sampler')
+        for i in range(count):
+            pm.save(f"sleeper-{i}", f"python {self.script}", cwd=self.workdir)
+            pm.start(f"sleeper-{i}")
+        try:
+            sampler = Sampler(pm)
+            sampler.sample()  # Populate the psutil.Process cache
+            timings = [self._time(sampler.sample) for _ in range(self.repeat)]
+            self._record('sampler', timings, processes=count)
+        finally:
+            for i in range(count):
+                pm.stop(f"sleeper-{i}")
+
+    def run(self, only=None):
+        """Run all benchmarks (or the named ones) and return the results"""
+        benchmarks = {
+            'lifecycle': self.bench_lifecycle,
+            'list': self.bench_list,
+            'cli': self.bench_cli_cold_start,
+            'logs': self.bench_log_tail,
+            'sampler': self.bench_sampler,
+        }
+        try:
+            for name, bench in benchmarks.items():
+                if not only or name in only:
+                    bench()
+        finally:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+        return {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+            'results': self.results,
+        }
+
+
+def main(output: str = None, repeat: int = 5, only=None):
+    console = Console()
+    report = Benchmark(repeat=repeat).run(only)
+    data = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(data)
+        console.print(f"[green]Wrote benchmark results to {output}[/green]")
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
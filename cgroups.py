@@ -0,0 +1,265 @@
+import os
+import re
+import signal
+import subprocess
+import time
+
+CGROUP_MOUNTS = ('/sys/fs/cgroup', '/sys/fs/cgroup/unified')
+CONTROLLERS = ('cpu', 'memory', 'io')
+
+
+class CgroupManager:
+    """Place managed processes in their own cgroup v2 group.
+
+    Every process gets ``<base>/<title>`` where ``<base>`` is a ``pypm.slice``
+    inside the delegated ``user@UID.service`` subtree when we are running
+    as a normal user, or directly under the cgroup root when running as
+    root. Stats are read from the group's interface files in one shot and
+    stopping writes to ``cgroup.kill``, so neither depends on the size of
+    the process tree. A group that can't be removed (e.g. a member stuck in
+    uninterruptible sleep) is left behind and the next run gets
+    ``<base>/<title>@<n>``; the group of a process is the one with the
+    highest ``n``.
+
+    A base only counts as available once a short-lived child could be moved
+    into a group under it: creating and writing ``pypm.slice`` isn't enough
+    when we run in a session scope, moving a process out of it also needs
+    write access to the common ancestor's ``cgroup.procs``.
+    """
+
+    def __init__(self):
+        self._paths = {}  # title -> group of its current run, once known
+        self.mount = self._find_mount()
+        self.base = self._find_base() if self.mount else None
+
+    @property
+    def available(self):
+        return self.base is not None
+
+    def _find_mount(self):
+        """Find the cgroup v2 hierarchy (pure v2 or hybrid mode)"""
+        for mount in CGROUP_MOUNTS:
+            if os.path.exists(os.path.join(mount, 'cgroup.controllers')):
+                return mount
+        return None
+
+    def _own_cgroup(self):
+        """Return our own cgroup v2 path relative to the mount"""
+        try:
+            with open('/proc/self/cgroup', 'r') as f:
+                for line in f:
+                    if line.startswith('0::'):
+                        return line[3:].strip()
+        except OSError:
+            pass
+        return '/'
+
+    def _find_base(self):
+        """Pick a writable parent group for pypm, preferring the user delegation"""
+        own = self._own_cgroup().strip('/').split('/')
+        candidates = []
+        for i, part in enumerate(own):
+            if part.startswith('user@') and part.endswith('.service'):
+                candidates.append(os.path.join(self.mount, *own[:i + 1], 'pypm.slice'))
+                break
+        if os.geteuid() == 0:
+            candidates.append(os.path.join(self.mount, 'pypm.slice'))
+
+        for base in candidates:
+            try:
+                os.makedirs(base, exist_ok=True)
+            except OSError:
+                continue
+            if os.access(base, os.W_OK) and self._can_attach(base):
+                self._enable_controllers(base)
+                return base
+        return None
+
+    def _can_attach(self, base):
+        """Move a throwaway child into a group under base, the way a started process will be"""
+        probe = os.path.join(base, f"probe-{os.getpid()}")
+        child = None
+        try:
+            os.makedirs(probe, exist_ok=True)
+            child = subprocess.Popen(['sleep', '10'], stdin=subprocess.DEVNULL,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            with open(os.path.join(probe, 'cgroup.procs'), 'w') as f:
+                f.write(str(child.pid))
+            return True
+        except OSError:
+            return False
+        finally:
+            if child is not None:
+                child.kill()
+                child.wait()
+            self._remove_dir(probe)
+
+    def _enable_controllers(self, base):
+        """Enable cpu/memory/io for the per-process groups, one at a time"""
+        for controller in CONTROLLERS:
+            try:
+                with open(os.path.join(base, 'cgroup.subtree_control'), 'w') as f:
+                    f.write(f"+{controller}")
+            except OSError:
+                # Not delegated to us; the stat files we read fall back to zero
+                pass
+
+    def _groups(self, title: str):
+        """The groups of a process under the base, oldest first, as (n, path)"""
+        pattern = re.compile(re.escape(title) + r'(?:@(\d+))?')
+        try:
+            names = os.listdir(self.base)
+        except OSError:
+            return []
+        groups = []
+        for name in names:
+            match = pattern.fullmatch(name)
+            if match:
+                groups.append((int(match.group(1) or 0), os.path.join(self.base, name)))
+        return sorted(groups)
+
+    def path(self, title: str):
+        """The group of the process's current (or last) run"""
+        path = self._paths.get(title)
+        if path is None or not os.path.isdir(path):
+            groups = self._groups(title)
+            path = groups[-1][1] if groups else os.path.join(self.base, title)
+            self._paths[title] = path
+        return path
+
+    def create(self, title: str):
+        """Create an empty group for a new run of a process and return its path.
+
+        Groups left by earlier runs that crashed or were never stopped are
+        emptied and removed first: their counters cover their whole
+        lifetime, and a new run must start counting from zero. If one can't
+        be removed, the new run gets a group with a fresh name instead of
+        sharing it.
+        """
+        leftover = []
+        for n, path in self._groups(title):
+            self._kill(path)
+            if not self._remove_group(path):
+                leftover.append(n)
+        if leftover:
+            n = max(max(leftover) + 1, int(time.time()))
+            path = os.path.join(self.base, f"{title}@{n}")
+        else:
+            path = os.path.join(self.base, title)
+        os.makedirs(path)
+        self._paths[title] = path
+        return path
+
+    @staticmethod
+    def attach_self(path: str):
+        """Move the calling process into a group (used by the placement launcher)"""
+        with open(os.path.join(path, 'cgroup.procs'), 'w') as f:
+            f.write('0')
+
+    def pids(self, title: str):
+        """Return every PID in the process's group"""
+        return self._pids(self.path(title))
+
+    @staticmethod
+    def _pids(path: str):
+        try:
+            with open(os.path.join(path, 'cgroup.procs'), 'r') as f:
+                return [int(line) for line in f if line.strip()]
+        except OSError:
+            return []
+
+    def stats(self, title: str):
+        """Read CPU, memory and IO usage for the whole group"""
+        path = self.path(title)
+        stats = {'cpu_usec': 0, 'memory': 0, 'io_read': 0, 'io_write': 0}
+
+        try:
+            with open(os.path.join(path, 'cpu.stat'), 'r') as f:
+                for line in f:
+                    key, value = line.split()
+                    if key == 'usage_usec':
+                        stats['cpu_usec'] = int(value)
+                        break
+        except (OSError, ValueError):
+            pass
+
+        try:
+            with open(os.path.join(path, 'memory.current'), 'r') as f:
+                stats['memory'] = int(f.read().strip())
+        except (OSError, ValueError):
+            pass
+
+        try:
+            with open(os.path.join(path, 'io.stat'), 'r') as f:
+                for line in f:
+                    for field in line.split()[1:]:
+                        key, _, value = field.partition('=')
+                        if key == 'rbytes':
+                            stats['io_read'] += int(value)
+                        elif key == 'wbytes':
+                            stats['io_write'] += int(value)
+        except (OSError, ValueError):
+            pass
+
+        return stats
+
+    def cpu_percent(self, title: str, interval: float = 0.1):
+        """CPU usage of the group over ``interval`` seconds"""
+        before = self.stats(title)['cpu_usec']
+        time.sleep(interval)
+        after = self.stats(title)['cpu_usec']
+        return (after - before) / (interval * 1e6) * 100
+
+    def kill(self, title: str):
+        """Kill every process in the group"""
+        self._kill(self.path(title))
+
+    def _kill(self, path: str):
+        if not self._pids(path):
+            return
+        try:
+            with open(os.path.join(path, 'cgroup.kill'), 'w') as f:
+                f.write('1')
+            return
+        except OSError:
+            # cgroup.kill needs Linux 5.14; fall back to signalling the members
+            pass
+        for pid in self._pids(path):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def remove(self, title: str, timeout: float = 1.0):
+        """Remove the group once its processes are gone"""
+        return self._remove_group(self.path(title), timeout)
+
+    def _remove_group(self, path: str, timeout: float = 1.0):
+        # Killed members linger until they exit, and rmdir fails while any remain
+        deadline = time.time() + timeout
+        while not self._empty(path) and time.time() < deadline:
+            time.sleep(0.05)
+        return self._remove_dir(path, max(0, deadline - time.time()))
+
+    @staticmethod
+    def _empty(path: str):
+        """Whether cgroup.events reports no processes left in the group or below it"""
+        try:
+            with open(os.path.join(path, 'cgroup.events'), 'r') as f:
+                return 'populated 0' in f.read().splitlines()
+        except OSError:
+            # Already gone, or an older kernel: let rmdir decide
+            return True
+
+    @staticmethod
+    def _remove_dir(path: str, timeout: float = 1.0):
+        deadline = time.time() + timeout
+        while os.path.exists(path):
+            try:
+                os.rmdir(path)
+                return True
+            except OSError:
+                if time.time() > deadline:
+                    return False
+                time.sleep(0.05)
+        return True
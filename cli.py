@@ -1,40 +1,383 @@
 #!/usr/bin/env python3
+import sys
 import click
 from process_manager import ProcessManager
 from simple_monitor import main as monitor_main
 
-pm = ProcessManager()
+try:
+    pm = ProcessManager()
+except ValueError as e:
+    # processes.yml failed validation, don't let a later save overwrite it
+    print(f"Invalid processes.yml: {str(e)}", file=sys.stderr)
+    sys.exit(1)
+
+def _via_daemon(cmd, title):
+    """Run an action in the daemon if one is running, so it owns the process and its sockets"""
+    from control import ControlClient
+    try:
+        response = ControlClient(pm).request(cmd, title=title)
+    except OSError:
+        return False
+    if response.get('results'):
+        _print_results([(result['title'], result['ok'], result['message']) for result in response['results']])
+    elif response.get('ok'):
+        pm.console.print(f"[green]{cmd.capitalize()} '{title}' via daemon: {response['status']}[/green]")
+    else:
+        pm.console.print(f"[red]{response.get('error')}[/red]")
+    return True
+
+def _print_results(results):
+    """One row per process of a bulk action"""
+    from rich.table import Table
+    table = Table(show_header=True, header_style="bold magenta")
+    table.add_column("Process")
+    table.add_column("Result")
+    for title, ok, message in results:
+        table.add_row(title, f"[green]{message}[/green]" if ok else f"[red]{message}[/red]")
+    pm.console.print(table)
+    failed = sum(not ok for _, ok, _ in results)
+    if failed:
+        pm.console.print(f"[red]{failed} of {len(results)} failed[/red]")
+
+def _act(ctx, cmd, title):
+    """Start, stop or restart a process or every process a selector matches"""
+    from selection import is_selector, select, run_bulk
+    clients = _remote_clients(ctx)
+    if clients:
+        _remote_action(clients, cmd, title)
+    elif _via_daemon(cmd, title):
+        return
+    elif title not in pm.processes and is_selector(title):
+        titles = select(pm, title)
+        if not titles:
+            pm.console.print(f"[red]No process matches '{title}'[/red]")
+            return
+        # The table reports each process instead
+        pm.console.quiet = True
+        try:
+            results = run_bulk(pm, cmd, titles)
+        finally:
+            pm.console.quiet = False
+        _print_results(results)
+    else:
+        getattr(pm, cmd)(title)
+
+def _remote_clients(ctx):
+    """Clients for the --host daemons, or None to act locally"""
+    from control import RemoteClient, load_token
+    options = ctx.obj or {}
+    if not options.get('hosts'):
+        return None
+    token = options.get('token') or load_token(pm.config_dir)
+    return {host: RemoteClient(host, pm.config_dir, token=token, tls=options.get('tls'))
+            for host in options['hosts']}
+
+def _remote_action(clients, cmd, title):
+    """Run start/stop/restart on every host at once and report each result"""
+    from control import fan_out
+    from rich.table import Table
+    table = Table(show_header=True, header_style="bold magenta")
+    table.add_column("Host")
+    table.add_column("Process")
+    table.add_column("Result")
+    for host, response in fan_out(clients, cmd, title=title).items():
+        if response.get('results'):
+            # A selector, one row per process it matched on the host
+            for result in response['results']:
+                color = "green" if result['ok'] else "red"
+                table.add_row(host, result['title'], f"[{color}]{result['message']}[/{color}]")
+        elif response.get('ok'):
+            table.add_row(host, title, f"[green]{response['status']}[/green]")
+        else:
+            table.add_row(host, title, f"[red]{response.get('error')}[/red]")
+    pm.console.print(table)
+
+def _remote_list(clients):
+    """Merge the process lists of every host into one table"""
+    from control import fan_out
+    from rich.table import Table
+    table = Table(show_header=True, header_style="bold magenta")
+    for column in ("Host", "Title", "Status", "Health", "PID", "CPU %", "MEM MB", "PSS MB"):
+        table.add_column(column)
+    for host, response in sorted(fan_out(clients, 'list').items()):
+        if not response.get('ok'):
+            table.add_row(host, '', f"[red]{response.get('error')}[/red]", '', '', '', '', '')
+            continue
+        samples = response.get('samples') or {}
+        for title, info in response['processes'].items():
+            sample = samples.get(title)
+            status_color = "green" if info['status'] == 'running' else "red"
+            table.add_row(
+                host,
+                title,
+                f"[{status_color}]{info['status']}[/{status_color}]",
+                info.get('health_status') or '-',
+                str(info['pid'] or ''),
+                f"{sample['cpu']:.1f}%" if sample else "N/A",
+                f"{sample['rss'] / 1024 / 1024:.1f}" if sample else "N/A",
+                f"{sample['pss'] / 1024 / 1024:.1f}" if sample and sample.get('pss') is not None else "N/A",
+            )
+    pm.console.print(table)
 
 @click.group()
-def cli():
+@click.option('--host', help='Comma-separated daemons (host[:port]) to control instead of this machine')
+@click.option('--token', help='Token for --host daemons (default: $PYPM_TOKEN or ~/.pyprocessmanager/token)')
+@click.option('--tls', is_flag=True, help='Use mutual TLS with the certificates in ~/.pyprocessmanager/tls')
+@click.pass_context
+def cli(ctx, host=None, token=None, tls=False):
     """Python Process Manager - A simple process manager for your commands"""
-    pass
+    ctx.obj = {
+        'hosts': [h.strip() for h in host.split(',') if h.strip()] if host else [],
+        'token': token,
+        'tls': tls,
+    }
 
 @cli.command()
 @click.argument('title')
 @click.argument('command')
 @click.option('--cwd', help='Working directory for the command')
 @click.option('--autorun', is_flag=True, help='Auto-run on system startup')
-def save(title, command, cwd=None, autorun=False):
+@click.option('--cgroup', is_flag=True, help='Run in its own cgroup v2 for exact accounting')
+@click.option('--cron', help='Start on a cron schedule, e.g. "*/5 * * * *" (needs pypm daemon)')
+@click.option('--interval', type=float, help='Start every N seconds (needs pypm daemon)')
+@click.option('--overlap', type=click.Choice(['skip', 'queue', 'kill']), default='skip',
+              help='What to do when a scheduled run is still active')
+@click.option('--jitter', type=float, default=0, help='Random delay of up to N seconds per scheduled run')
+@click.option('--min-instances', type=int, help='Fewest instances the autoscaler keeps running')
+@click.option('--max-instances', type=int, help='Most instances the autoscaler may start')
+@click.option('--scale-up', type=float, help='Per-instance load above which to scale up (default 75)')
+@click.option('--scale-down', type=float, help='Per-instance load below which to scale down (default 25)')
+@click.option('--scale-command', help='Command printing the load (e.g. queue depth) instead of CPU %')
+@click.option('--scale-cooldown', type=float, help='Seconds between scaling changes (default 60)')
+@click.option('--watch', multiple=True, help='Restart when files under this path change (needs pypm daemon)')
+@click.option('--ignore', multiple=True, help='Glob of watched files to ignore, e.g. "*/logs/*"')
+@click.option('--on-start', help='Command or local URL to call when the process starts')
+@click.option('--on-crash', help='Command or local URL to call when the process crashes')
+@click.option('--post-stop', help='Command or local URL to call after the process is stopped')
+@click.option('--on-alert', help='Command or local URL to call when a log alert fires')
+@click.option('--listen', multiple=True, help='host:port to bind once and pass with LISTEN_FDS')
+@click.option('--health-http', help='Liveness probe: URL that must answer GET with 2xx/3xx')
+@click.option('--health-tcp', help='Liveness probe: host:port that must accept connections')
+@click.option('--health-cmd', help='Liveness probe: command that must exit 0')
+@click.option('--health-interval', type=float, default=10, help='Seconds between probes')
+@click.option('--health-timeout', type=float, default=2, help='Seconds before a probe fails')
+@click.option('--health-threshold', type=int, default=3, help='Consecutive failures before a restart')
+@click.option('--env', 'env_vars', multiple=True,
+              help='KEY=VALUE for the process; ${instance}, ${instance+8000}, ${title} and ${group} are filled in')
+@click.option('--env-file', help='dotenv file with variables for the process')
+@click.option('--sink', 'sinks', multiple=True,
+              help='Also send output to file:PATH[?max_bytes=10M&backups=5], syslog[:SOCKET][?facility=local0], '
+                   'journald or ndjson:HOST:PORT|SOCKET (needs pypm daemon)')
+@click.option('--log-metric', 'log_metrics', multiple=True,
+              help='NAME=REGEX counted over the output, e.g. errors=ERROR (needs pypm daemon)')
+@click.option('--log-alert', 'log_alerts', multiple=True,
+              help='Alert when a log metric passes a count per window, e.g. errors>10/1m, optionally :restart')
+@click.option('--cpu-affinity', help='CPUs to run on, e.g. 0-3,8, or "auto" to give each instance its own share')
+@click.option('--numa-node', type=int, help='NUMA node to run on and allocate memory from')
+@click.option('--nice', type=click.IntRange(-20, 19), help='Scheduling niceness, -20 (highest priority) to 19')
+@click.option('--ionice', help='IO scheduling class[:level], e.g. best-effort:4, idle or realtime:0')
+@click.option('--namespace', help='Namespace to select the process by, e.g. "pypm restart ns:api"')
+@click.option('--tag', 'tags', multiple=True, help='Tag to select the process by, e.g. "pypm stop tag:batch"')
+def save(title, command, cwd=None, autorun=False, cgroup=False, cron=None, interval=None, overlap='skip', jitter=0,
+         min_instances=None, max_instances=None, scale_up=None, scale_down=None, scale_command=None,
+         scale_cooldown=None, watch=(), ignore=(), on_start=None, on_crash=None, post_stop=None, on_alert=None,
+         listen=(), health_http=None, health_tcp=None, health_cmd=None, health_interval=10, health_timeout=2,
+         health_threshold=3, env_vars=(), env_file=None, sinks=(), log_metrics=(), log_alerts=(), cpu_affinity=None, numa_node=None, nice=None,
+         ionice=None, namespace=None, tags=()):
     """Save a command with a title"""
-    pm.save(title, command, cwd, autorun)
+    env = {}
+    for item in env_vars:
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise click.BadParameter(f"'{item}' is not KEY=VALUE", param_hint='--env')
+        env[key] = value
+    if cron:
+        from scheduler import CronSchedule
+        try:
+            CronSchedule(cron)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--cron')
+    from sinks import parse_sink
+    for text in sinks:
+        try:
+            parse_sink(text)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--sink')
+    patterns = {}
+    for item in log_metrics:
+        name, sep, pattern = item.partition('=')
+        if not sep or not name:
+            raise click.BadParameter(f"'{item}' is not NAME=REGEX", param_hint='--log-metric')
+        patterns[name] = pattern
+    from logmetrics import validate as validate_log_metrics
+    try:
+        validate_log_metrics(patterns, log_alerts)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--log-metric/--log-alert')
+    from autoscaler import validate as validate_scaling
+    try:
+        validate_scaling(min_instances, max_instances, scale_up, scale_down)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--min-instances/--max-instances/--scale-up/--scale-down')
+    from placement import parse_cpus, parse_ionice
+    if cpu_affinity and cpu_affinity != 'auto':
+        try:
+            parse_cpus(cpu_affinity)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--cpu-affinity')
+    if ionice:
+        try:
+            parse_ionice(ionice)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--ionice')
+    health = None
+    for kind, target in (('http', health_http), ('tcp', health_tcp), ('exec', health_cmd)):
+        if target:
+            health = {'type': kind, 'target': target, 'interval': health_interval,
+                      'timeout': health_timeout, 'threshold': health_threshold}
+    pm.save(title, command, cwd, autorun, cgroup, cron, interval, overlap, jitter,
+            min_instances=min_instances, max_instances=max_instances, scale_up=scale_up,
+            scale_down=scale_down, scale_command=scale_command, scale_cooldown=scale_cooldown,
+            watch=watch, watch_ignore=ignore, on_start=on_start, on_crash=on_crash, post_stop=post_stop,
+            on_alert=on_alert, listen=listen, health=health, env=env, env_file=env_file, sinks=sinks,
+            log_metrics=patterns, log_alerts=log_alerts,
+            cpu_affinity=cpu_affinity, numa_node=numa_node, nice=nice, ionice=ionice,
+            namespace=namespace, tags=tags)
+
+@cli.command()
+@click.argument('file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Only print what would change')
+def apply(file, dry_run=False):
+    """Make the saved processes match FILE, restarting only what changed"""
+    import reconcile
+    from control import ControlClient
+    try:
+        desired = reconcile.load_ecosystem(file)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='FILE')
+    changes = reconcile.plan(pm, desired)
+    reconcile.print_plan(pm, changes)
+    if dry_run or all(change.action == 'keep' for change in changes):
+        return
+
+    client = ControlClient(pm)
+    try:
+        client.request('ping')
+        daemon = True
+    except OSError:
+        daemon = False
+
+    def run(cmd, title):
+        if daemon:
+            response = client.request(cmd, title=title)
+            if not response.get('ok'):
+                pm.console.print(f"[red]{response.get('error')}[/red]")
+                return
+            pm.console.print(f"[green]{cmd.capitalize()} '{title}' via daemon: {response['status']}[/green]")
+        else:
+            getattr(pm, cmd)(title)
+
+    reconcile.apply(pm, changes, run, reload=(lambda: client.request('reload')) if daemon else None)
+
+@cli.command()
+@click.argument('title', metavar='TITLE|SELECTOR')
+@click.pass_context
+def start(ctx, title):
+    """Start a saved process, or all matching ns:NAME, tag:NAME, group:NAME or a glob"""
+    _act(ctx, 'start', title)
+
+@cli.command()
+@click.argument('title', metavar='TITLE|SELECTOR')
+@click.pass_context
+def stop(ctx, title):
+    """Stop a running process, or all matching ns:NAME, tag:NAME, group:NAME or a glob"""
+    _act(ctx, 'stop', title)
+
+@cli.command()
+@click.argument('title', metavar='TITLE|SELECTOR')
+@click.pass_context
+def restart(ctx, title):
+    """Restart a process, or all matching ns:NAME, tag:NAME, group:NAME or a glob"""
+    _act(ctx, 'restart', title)
 
 @cli.command()
 @click.argument('title')
-def start(title):
-    """Start a saved process"""
-    pm.start(title)
+@click.argument('count', type=int)
+def scale(title, count):
+    """Run COUNT instances of a process"""
+    pm.scale(title, count)
 
 @cli.command()
 @click.argument('title')
-def stop(title):
-    """Stop a running process"""
-    pm.stop(title)
+def describe(title):
+    """Show a process's settings, state and crash history"""
+    pm.describe(title)
 
 @cli.command()
-def list():
-    """List all saved processes"""
-    pm.list()
+@click.option('--since', help='Only the usage of a period back from now (e.g. 7d, 12h) or since a date (2026-01-31)')
+@click.option('--json', 'as_json', is_flag=True, help='Print the totals as JSON')
+@click.argument('selectors', nargs=-1)
+def report(since=None, as_json=False, selectors=()):
+    """CPU time, IO, uptime and restarts per process, added up across restarts"""
+    import json
+    from accounting import parse_since, print_report, report as usage
+    from control import ControlClient
+    try:
+        start = parse_since(since) if since else None
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--since')
+    try:
+        # Include what the daemon counted since its last checkpoint
+        ControlClient(pm).request('checkpoint')
+    except OSError:
+        pass
+    totals = usage(pm.config_dir, start)
+    if selectors:
+        from selection import select
+        titles = set(select(pm, *selectors))
+        totals = {title: total for title, total in totals.items() if title in titles}
+    if as_json:
+        click.echo(json.dumps(totals, indent=2))
+    else:
+        print_report(pm, totals, start)
+
+@cli.command()
+@click.argument('title')
+def history(title):
+    """Show recent scheduled runs of a process"""
+    pm.history(title)
+
+def _published():
+    """The running daemon's snapshot, if it is newer than the saved records"""
+    import os
+    from snapshot import reader
+    published = reader(pm).read()
+    try:
+        if published is not None and os.path.getmtime(pm.processes_file) > published['time']:
+            # Saved since, e.g. a process was just added
+            return None
+    except OSError:
+        pass
+    return published
+
+@cli.command()
+@click.option('--tree', is_flag=True, help='Sum CPU and memory over each process tree and show the children')
+@click.option('--live', is_flag=True, help="Measure the processes now, PSS/USS included, instead of showing the daemon's last sample")
+@click.argument('selectors', nargs=-1)
+@click.pass_context
+def list(ctx, tree=False, live=False, selectors=()):
+    """List all saved processes, or those matching SELECTORS"""
+    clients = _remote_clients(ctx)
+    if clients:
+        _remote_list(clients)
+        return
+    from selection import select
+    titles = set(select(pm, *selectors)) if selectors else None
+    published = None if tree or live else _published()
+    if published is not None:
+        pm.list_published(published, titles=titles)
+    else:
+        pm.list(tree=tree, titles=titles, live=live)
 
 @cli.command()
 def gui_list():
@@ -54,6 +397,73 @@ def monitor():
     """Monitor all processes with terminal UI"""
     monitor_main()
 
+@cli.command()
+@click.option('--type', 'types', multiple=True,
+              help='Only show events of this type (start, stop, restart, crash, exit, unhealthy, log_metric, log_alert)')
+def events(types=()):
+    """Stream lifecycle events from the daemon as JSON lines"""
+    import json
+    from control import ControlClient
+    try:
+        for event in ControlClient(pm).subscribe(types or None):
+            click.echo(json.dumps(event))
+    except (ConnectionRefusedError, FileNotFoundError):
+        pm.console.print("[red]pypm daemon is not running[/red]")
+    except KeyboardInterrupt:
+        pass
+
+@cli.command()
+@click.option('--tcp', help='Also serve the control API on host:port for remote pypm --host clients')
+@click.option('--tls', is_flag=True, help='Require client certificates signed by ~/.pyprocessmanager/tls/ca.pem')
+@click.option('--token', help='Token remote clients must send (default: $PYPM_TOKEN or ~/.pyprocessmanager/token)')
+@click.option('--memory-interval', type=float, default=30, show_default=True,
+              help='Seconds between USS/PSS reads (they parse smaps), 0 to turn them off')
+@click.option('--metrics', help='Serve Prometheus metrics on host:port at /metrics')
+def daemon(tcp=None, tls=False, token=None, memory_interval=30, metrics=None):
+    """Run the pypm daemon (scheduling, autoscaling, file watching, health checks, events)"""
+    from daemon import main
+    from control import load_token
+    if tcp and not token:
+        token = load_token(pm.config_dir)
+    main(tcp=tcp, token=token, tls=tls, memory_interval=memory_interval, metrics=metrics)
+
+@cli.command()
+def metrics():
+    """Print the running daemon's metrics in the Prometheus text format"""
+    from control import ControlClient
+    try:
+        response = ControlClient(pm).request('metrics')
+    except OSError:
+        pm.console.print("[red]pypm daemon is not running[/red]")
+        return
+    if response.get('ok'):
+        click.echo(response['text'], nl=False)
+    else:
+        pm.console.print(f"[red]{response.get('error')}[/red]")
+
+@cli.command()
+@click.option('--output', '-o', help='Write the JSON results to a file')
+@click.option('--repeat', type=int, default=5, help='Runs per benchmark')
+@click.option('--only', multiple=True, type=click.Choice(['lifecycle', 'list', 'cli', 'logs', 'sampler']),
+              help='Run only these benchmarks')
+def bench(output=None, repeat=5, only=()):
+    """Benchmark start/stop/restart, list, CLI start-up, log tail and sampling"""
+    from bench import main
+    main(output, repeat, only)
+
+@cli.command()
+@click.option('--processes', '-n', type=click.IntRange(1, 5000), default=500, help='Processes to run')
+@click.option('--echo', type=click.FloatRange(0, 1), default=0.5, help='Fraction of them writing output')
+@click.option('--log-rate', type=click.IntRange(1, 100000), default=10, help='Lines per second per writing process')
+@click.option('--duration', type=click.FloatRange(5), default=20, help='Seconds to measure the steady state')
+@click.option('--storm', type=click.IntRange(0), default=20, help='Processes restarted at once (0 to skip)')
+@click.option('--repeat', type=click.IntRange(1), default=5, help='Runs per timed refresh')
+@click.option('--output', '-o', help='Write the JSON results to a file')
+def stress(processes=500, echo=0.5, log_rate=10, duration=20, storm=20, repeat=5, output=None):
+    """Run many tiny processes under a throwaway daemon and report how it copes"""
+    from stress import main
+    main(processes, echo, log_rate, duration, storm, repeat, output)
+
 @cli.command()
 def setup_startup():
     """Setup autostart for processes marked with autorun"""
@@ -0,0 +1,301 @@
+import hmac
+import json
+import os
+import queue
+import socket
+import socketserver
+import ssl
+import threading
+from selection import is_selector, select, run_bulk
+
+SOCKET_NAME = 'pypm.sock'
+SUBSCRIBER_QUEUE_SIZE = 1000
+DEFAULT_PORT = 7070
+TOKEN_FILE = 'token'
+TLS_DIR = 'tls'
+
+
+def socket_path(pm):
+    return os.path.join(pm.config_dir, SOCKET_NAME)
+
+
+def tls_files(config_dir: str):
+    """Local certificate paths: a CA that signs both the daemons' and the clients' certs"""
+    tls_dir = os.path.join(config_dir, TLS_DIR)
+    return {
+        'ca': os.path.join(tls_dir, 'ca.pem'),
+        'server_cert': os.path.join(tls_dir, 'server.pem'),
+        'server_key': os.path.join(tls_dir, 'server.key'),
+        'client_cert': os.path.join(tls_dir, 'client.pem'),
+        'client_key': os.path.join(tls_dir, 'client.key'),
+    }
+
+
+def load_token(config_dir: str):
+    """The shared token from PYPM_TOKEN or the config directory, if any"""
+    token = os.environ.get('PYPM_TOKEN')
+    if token:
+        return token
+    try:
+        with open(os.path.join(config_dir, TOKEN_FILE), 'r') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def parse_host(address: str):
+    """Split host[:port], defaulting to DEFAULT_PORT"""
+    host, sep, port = address.rpartition(':')
+    if not sep or not port.isdigit():
+        return address.strip('[]'), DEFAULT_PORT
+    return host.strip('[]') or '127.0.0.1', int(port)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One client connection speaking newline-delimited JSON"""
+
+    def _send(self, message):
+        self.wfile.write((json.dumps(message) + '\n').encode())
+        self.wfile.flush()
+
+    def handle(self):
+        try:
+            self._handle()
+        except (ssl.SSLError, ConnectionError):
+            # Failed handshake or client gone
+            pass
+
+    def _handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                self._send({'ok': False, 'error': 'invalid JSON'})
+                continue
+            if not self.server.authorized(request):
+                self._send({'ok': False, 'error': 'unauthorized'})
+                return
+            if request.get('cmd') == 'subscribe':
+                self._stream(request.get('types'))
+                return
+            try:
+                self._send(self.server.control.dispatch(request))
+            except Exception as e:
+                self._send({'ok': False, 'error': str(e)})
+
+    def _stream(self, types):
+        """Forward bus events to the client until it disconnects"""
+        events = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+        def forward(event):
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                # A stalled subscriber loses events instead of stalling the bus
+                pass
+
+        unsubscribe = self.server.control.bus.subscribe(forward, types=types)
+        try:
+            self._send({'ok': True, 'subscribed': types or 'all'})
+            while not self.server.control.stopped:
+                try:
+                    event = events.get(timeout=1)
+                except queue.Empty:
+                    continue
+                self._send(event.to_dict())
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            unsubscribe()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def authorized(self, request):
+        # The socket is only accessible to our own user
+        return True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """The control API over TCP, authenticated by a token and/or client certificates"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, handler, token=None, ssl_context=None):
+        self.token = token
+        self.ssl_context = ssl_context
+        super().__init__(address, handler)
+
+    def get_request(self):
+        sock, address = super().get_request()
+        if self.ssl_context is not None:
+            # The handshake happens on first read, in the handler thread
+            sock = self.ssl_context.wrap_socket(sock, server_side=True, do_handshake_on_connect=False)
+        return sock, address
+
+    def authorized(self, request):
+        if self.token is None:
+            # mTLS only: the certificate was verified in the handshake
+            return True
+        return hmac.compare_digest(str(request.get('token', '')), self.token)
+
+
+class ControlServer:
+    """The daemon's control API on a Unix socket in the config directory.
+
+    Requests and responses are single JSON lines, e.g. ``{"cmd": "restart",
+    "title": "web"}``. ``{"cmd": "subscribe"}`` turns the connection into an
+    NDJSON stream of lifecycle events.
+    """
+
+    def __init__(self, pm, bus):
+        self.pm = pm
+        self.bus = bus
+        self.stopped = False
+        self.path = socket_path(pm)
+        self.servers = []
+        self.sampler = None  # set by the daemon to include usage in list
+        self.exporter = None
+        self.accounting = None
+
+    def dispatch(self, request):
+        cmd = request.get('cmd')
+        title = request.get('title')
+        if cmd == 'list':
+            samples = self.sampler.samples if self.sampler is not None else {}
+            processes = {title: info.to_dict(compact=False) for title, info in self.pm.snapshot()}
+            return {'ok': True, 'processes': processes, 'samples': samples}
+        if cmd == 'ping':
+            return {'ok': True}
+        if cmd == 'reload':
+            # A client saved records it is about to act on
+            self.pm._load_processes()
+            return {'ok': True}
+        if cmd == 'checkpoint' and self.accounting is not None:
+            # A report is about to read the accounting files
+            self.accounting.checkpoint()
+            return {'ok': True}
+        if cmd == 'metrics' and self.exporter is not None:
+            return {'ok': True, 'text': self.exporter.render()}
+        if cmd in ('start', 'stop', 'restart'):
+            if title not in self.pm.processes:
+                # Saved by a client since the daemon last reloaded
+                self.pm._load_processes()
+            if title not in self.pm.processes and is_selector(title):
+                titles = select(self.pm, title)
+                if not titles:
+                    return {'ok': False, 'error': f"No process matches '{title}'"}
+                return {'ok': True, 'results': [
+                    {'title': name, 'ok': ok, 'message': message}
+                    for name, ok, message in run_bulk(self.pm, cmd, titles)
+                ]}
+            if title not in self.pm.processes:
+                return {'ok': False, 'error': f"No process found with title '{title}'"}
+            getattr(self.pm, cmd)(title)
+            return {'ok': True, 'title': title, 'status': self.pm.processes[title].state.status}
+        return {'ok': False, 'error': f"unknown command '{cmd}'"}
+
+    def _serve(self, server):
+        server.control = self
+        self.servers.append(server)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = _Server(self.path, _Handler)
+        os.chmod(self.path, 0o600)
+        self._serve(server)
+
+    def listen_tcp(self, address: str, token: str = None, tls: bool = False):
+        """Also serve the API on TCP; requires a token, mutual TLS, or both"""
+        if not token and not tls:
+            raise ValueError("refusing to serve the control API on TCP without a token or TLS")
+        context = None
+        if tls:
+            files = tls_files(self.pm.config_dir)
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH, cafile=files['ca'])
+            context.load_cert_chain(files['server_cert'], files['server_key'])
+            context.verify_mode = ssl.CERT_REQUIRED
+        self._serve(_TCPServer(parse_host(address), _Handler, token=token, ssl_context=context))
+
+    def stop(self):
+        self.stopped = True
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class ControlClient:
+    """Talk to a running daemon's control socket"""
+
+    def __init__(self, pm, timeout: float = 30):
+        self.path = socket_path(pm)
+        self.timeout = timeout
+        self.token = None
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.path)
+        return sock
+
+    def _message(self, cmd: str, **params):
+        if self.token:
+            params['token'] = self.token
+        return (json.dumps(dict(params, cmd=cmd)) + '\n').encode()
+
+    def request(self, cmd: str, **params):
+        with self._connect() as sock:
+            sock.sendall(self._message(cmd, **params))
+            with sock.makefile('r') as f:
+                return json.loads(f.readline())
+
+    def subscribe(self, types=None):
+        """Yield events from the daemon as dicts"""
+        with self._connect() as sock:
+            sock.settimeout(None)
+            sock.sendall(self._message('subscribe', types=types))
+            with sock.makefile('r') as f:
+                f.readline()  # Subscription acknowledgement
+                for line in f:
+                    yield json.loads(line)
+
+
+class RemoteClient(ControlClient):
+    """Talk to a daemon's control API on another host over TCP"""
+
+    def __init__(self, address: str, config_dir: str, token: str = None, tls: bool = False, timeout: float = 30):
+        self.address = parse_host(address)
+        self.timeout = timeout
+        self.token = token
+        self.ssl_context = None
+        if tls:
+            files = tls_files(config_dir)
+            self.ssl_context = ssl.create_default_context(cafile=files['ca'])
+            self.ssl_context.load_cert_chain(files['client_cert'], files['client_key'])
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        if self.ssl_context is not None:
+            sock = self.ssl_context.wrap_socket(sock, server_hostname=self.address[0])
+        return sock
+
+
+def fan_out(clients, cmd: str, **params):
+    """Send one request to several daemons ({host: client}) concurrently, return {host: response}"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def call(client):
+        try:
+            return client.request(cmd, **params)
+        except (OSError, ValueError) as e:
+            return {'ok': False, 'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(clients))) as pool:
+        return dict(zip(clients, pool.map(call, clients.values())))
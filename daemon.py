@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+import os
+import signal
+import psutil
+import yaml
+from process_manager import ProcessManager
+from scheduler import TimerHeap, Scheduler
+from sampler import Sampler, MEMORY_INTERVAL
+from autoscaler import Autoscaler
+from watcher import FileWatcher
+from events import EventBus, HookRunner
+from control import ControlServer
+from health import HealthChecker
+from exporter import Exporter
+from logtail import LogTailer
+from sinks import SinkRouter
+from logmetrics import LogMetrics
+from accounting import Accounting, CHECKPOINT_INTERVAL
+from snapshot import SnapshotWriter, snapshot_path, build as build_snapshot
+
+RELOAD_INTERVAL = 5  # seconds
+SAMPLE_INTERVAL = 2  # seconds
+AUTOSCALE_INTERVAL = 10  # seconds
+TAIL_INTERVAL = 0.5  # seconds, for processes with output sinks
+PR_SET_CHILD_SUBREAPER = 36
+
+
+def become_subreaper():
+    """Adopt orphaned descendants, so started processes become our children once their shell exits"""
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc.prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def exit_status(pid: int):
+    """Reap a child, return (exit code, signal name); both None if it isn't ours"""
+    try:
+        reaped, status = os.waitpid(pid, os.WNOHANG)
+    except ChildProcessError:
+        return None, None
+    if not reaped:
+        return None, None
+    code = os.waitstatus_to_exitcode(status)
+    if code < 0:
+        return None, signal.Signals(-code).name
+    return code, None
+
+
+class Supervisor:
+    """Long-running pypm daemon.
+
+    All periodic work is driven by one TimerHeap; the CLI and frontends keep
+    editing ``processes.yml`` and the daemon picks up changes on reload.
+    """
+
+    def __init__(self, pm: ProcessManager = None, tcp: str = None, token: str = None, tls: bool = False,
+                 memory_interval: float = MEMORY_INTERVAL, metrics: str = None):
+        self.pm = pm or ProcessManager()
+        self.bus = EventBus(console=self.pm.console)
+        self.pm.events = self.bus
+        self.hooks = HookRunner(self.pm, self.bus)
+        self.control = ControlServer(self.pm, self.bus)
+        self.timers = TimerHeap(console=self.pm.console)
+        self.scheduler = Scheduler(self.pm, self.timers)
+        self.sampler = Sampler(self.pm, memory_interval=memory_interval, counters=True)
+        self.accounting = Accounting(self.pm)
+        self.tailer = LogTailer(self.pm)
+        self.sinks = SinkRouter(self.pm)
+        self.log_metrics = LogMetrics(self.pm, self.bus)
+        self.tailer.listeners.append(self.sinks)
+        self.tailer.listeners.append(self.log_metrics)
+        self.autoscaler = Autoscaler(self.pm, self.sampler, self.timers)
+        self.watcher = FileWatcher(self.pm, self.timers)
+        self.health = HealthChecker(self.pm)
+        self.exporter = Exporter(self.pm, self.sampler, sinks=self.sinks, log_metrics=self.log_metrics,
+                                 accounting=self.accounting)
+        self.control.sampler = self.sampler
+        self.control.accounting = self.accounting
+        self.control.exporter = self.exporter
+        self.published = SnapshotWriter(snapshot_path(self.pm.config_dir))
+        self.tcp = (tcp, token, tls) if tcp else None
+        self.metrics = metrics
+        self._config_mtime = None
+        self._zombies = set()
+
+    def _reload(self):
+        """Reload the process records if another pypm client changed them"""
+        try:
+            self._sync_records()
+        finally:
+            # Whatever went wrong, keep checking for changes
+            self.timers.call_later(RELOAD_INTERVAL, self._reload)
+
+    def _sync_records(self):
+        try:
+            mtime = os.stat(self.pm.processes_file).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._config_mtime:
+            return
+        self._config_mtime = mtime
+        try:
+            # Our own writes are already in memory
+            if mtime != self.pm.saved_mtime:
+                self.pm._load_processes()
+        except (ValueError, yaml.YAMLError) as e:
+            # Keep running the last valid records
+            self.pm.console.print(f"[red]Not reloading processes.yml: {str(e)}[/red]")
+            return
+        self.scheduler.sync()
+        self.watcher.sync()
+        self.health.sync()
+        self.sinks.sync()
+        self.log_metrics.sync()
+        self.pm.listeners.release(keep={
+            address for _, info in self.pm.snapshot() for address in info.spec.listen
+        })
+        self.tailer.forget(keep=self.pm.processes)
+
+    def _sample(self):
+        self.sampler.sample()
+        self.accounting.update(self.sampler.samples)
+        # Includes the processes that just exited, their pid is still set
+        self.tailer.poll()
+        self.log_metrics.evaluate()
+        for title in self.sampler.exited:
+            # Scheduled runs are reaped and reported by the scheduler
+            info = self.pm.processes.get(title)
+            if info is None or not info.state.pid or self.scheduler.owns(title):
+                continue
+            pid = info.state.pid
+            exit_code, signal_name = exit_status(pid)
+            self.pm.mark_exited(title, exit_code=exit_code, signal=signal_name,
+                                peak_rss=self.sampler.peak_rss(title, pid), stderr=self.tailer.tail(title))
+        self._reap_strays()
+        self._publish()
+        self.timers.call_later(SAMPLE_INTERVAL, self._sample)
+
+    def _publish(self):
+        """Share the state and samples with clients, they render them without asking us"""
+        try:
+            self.published.publish(build_snapshot(self.pm, self.sampler.samples))
+        except (OSError, ValueError) as e:
+            self.pm.console.print(f"[red]Could not publish the state snapshot: {str(e)}[/red]")
+
+    def _tail(self):
+        """Forward output to sinks more often than the sample tick reads it"""
+        titles = self.sinks.titles()
+        if titles:
+            self.tailer.poll([title for title in titles
+                              if title in self.pm.processes and self.pm.processes[title].state.pid])
+        self.timers.call_later(TAIL_INTERVAL, self._tail)
+
+    def _reap_strays(self):
+        """Reap adopted children nobody waits for (stopped processes, orphaned grandchildren)
+
+        Only zombies seen on two ticks in a row are reaped, so the children
+        that subprocess or the scheduler wait for themselves are left alone.
+        """
+        zombies = set()
+        try:
+            for child in psutil.Process().children():
+                try:
+                    if child.status() == psutil.STATUS_ZOMBIE:
+                        zombies.add(child.pid)
+                except psutil.Error:
+                    pass
+        except psutil.Error:
+            pass
+        for pid in zombies & self._zombies:
+            exit_status(pid)
+        self._zombies = zombies
+
+    def _checkpoint(self):
+        try:
+            self.accounting.checkpoint()
+        except OSError as e:
+            self.pm.console.print(f"[red]Could not write the usage accounting: {str(e)}[/red]")
+        self.timers.call_later(CHECKPOINT_INTERVAL, self._checkpoint)
+
+    def _autoscale(self):
+        self.autoscaler.evaluate()
+        self.timers.call_later(AUTOSCALE_INTERVAL, self._autoscale)
+
+    def run(self):
+        """Run until SIGINT/SIGTERM"""
+        def signal_handler(signum, frame):
+            self.stop()
+
+        signal.signal(signal.SIGINT, signal_handler)
+        signal.signal(signal.SIGTERM, signal_handler)
+
+        if not become_subreaper():
+            self.pm.console.print("[yellow]Could not become a subreaper, exit codes of crashed processes are unknown[/yellow]")
+        self.control.start()
+        if self.tcp:
+            address, token, tls = self.tcp
+            self.control.listen_tcp(address, token=token, tls=tls)
+            self.pm.console.print(f"[green]Control API listening on {address}[/green]")
+        if self.metrics:
+            self.exporter.serve(self.metrics)
+            self.pm.console.print(f"[green]Metrics on http://{self.metrics}/metrics[/green]")
+        self.pm.console.print("[green]pypm daemon started[/green]")
+        self._reload()
+        self._sample()
+        self._tail()
+        self.timers.call_later(AUTOSCALE_INTERVAL, self._autoscale)
+        self.timers.call_later(CHECKPOINT_INTERVAL, self._checkpoint)
+        self.timers.run()
+        self.pm.console.print("[yellow]pypm daemon stopped[/yellow]")
+
+    def stop(self):
+        self.scheduler.shutdown()
+        self.watcher.shutdown()
+        self.health.shutdown()
+        self.hooks.shutdown()
+        self.control.stop()
+        self.exporter.stop()
+        self.sampler.stop()
+        try:
+            self.accounting.checkpoint()
+        except OSError:
+            pass
+        self.sinks.close()
+        self.published.close()
+        self.pm.listeners.close()
+        self.timers.stop()
+
+
+def main(tcp: str = None, token: str = None, tls: bool = False, config_dir: str = None,
+         memory_interval: float = MEMORY_INTERVAL, metrics: str = None):
+    pm = ProcessManager(config_dir=config_dir) if config_dir else None
+    Supervisor(pm, tcp=tcp, token=token, tls=tls, memory_interval=memory_interval, metrics=metrics).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import re
+import threading
+
+# ${instance}, ${instance+8000}, ${title} and ${group} in env values
+TEMPLATE_RE = re.compile(r'\$\{(instance|title|group)(?:\s*\+\s*(\d+))?\}')
+
+
+def _double_quoted(value: str):
+    """Unescape a double-quoted value up to its closing quote"""
+    chars = []
+    escapes = {'n': '\n', 't': '\t', '"': '"', '\\': '\\'}
+    i = 1
+    while i < len(value):
+        char = value[i]
+        if char == '\\' and i + 1 < len(value):
+            chars.append(escapes.get(value[i + 1], '\\' + value[i + 1]))
+            i += 2
+            continue
+        if char == '"':
+            break
+        chars.append(char)
+        i += 1
+    return ''.join(chars)
+
+
+def parse_dotenv(text: str):
+    """Parse KEY=VALUE lines (with optional ``export`` and quotes) into a dict"""
+    env = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('export '):
+            line = line[len('export '):].lstrip()
+        key, sep, value = line.partition('=')
+        key = key.strip()
+        if not sep or not key:
+            continue
+        value = value.strip()
+        if value[:1] == "'" and "'" in value[1:]:
+            value = value[1:value.index("'", 1)]
+        elif value[:1] == '"':
+            value = _double_quoted(value)
+        else:
+            # Unquoted values may end in a comment
+            value = value.split(' #', 1)[0].rstrip()
+        env[key] = value
+    return env
+
+
+class EnvFileCache:
+    """Parsed env files, re-read only when their mtime or size changes.
+
+    Starting many instances of a process that share an env file then parses
+    it once. The returned dicts are shared and must not be modified.
+    """
+
+    def __init__(self):
+        self._cache = {}  # path -> (mtime_ns, size, env)
+        self._lock = threading.Lock()
+
+    def load(self, path: str):
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                return cached[2]
+        with open(path, 'r') as f:
+            env = parse_dotenv(f.read())
+        with self._lock:
+            self._cache[path] = (stat.st_mtime_ns, stat.st_size, env)
+        return env
+
+
+def render(value: str, title: str, group: str, instance: int):
+    """Fill in the per-instance template variables of an env value"""
+    def replace(match):
+        name, offset = match.group(1), match.group(2)
+        if name == 'instance':
+            return str(instance + int(offset or 0))
+        return title if name == 'title' else group
+    return TEMPLATE_RE.sub(replace, str(value))
+
+
+def resolve_env_file(spec):
+    """Absolute path of a process's env file, relative paths are taken from its cwd"""
+    path = os.path.expanduser(spec.env_file)
+    return path if os.path.isabs(path) else os.path.join(spec.cwd, path)
@@ -0,0 +1,149 @@
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass, field, asdict
+from urllib.parse import urlparse
+from rich.console import Console
+
+HOOK_QUEUE_SIZE = 100
+HOOK_WORKERS = 2
+HOOK_TIMEOUT = 10  # seconds
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+
+class EventType:
+    START = 'start'
+    STOP = 'stop'
+    RESTART = 'restart'
+    CRASH = 'crash'
+    EXIT = 'exit'
+    UNHEALTHY = 'unhealthy'
+    LOG_METRIC = 'log_metric'  # Output lines matched a log metric's pattern
+    LOG_ALERT = 'log_alert'    # A log metric went over an alert's threshold
+
+    ALL = (START, STOP, RESTART, CRASH, EXIT, UNHEALTHY, LOG_METRIC, LOG_ALERT)
+
+
+# Which process record field holds the hook for an event
+HOOKS = {
+    EventType.START: 'on_start',
+    EventType.CRASH: 'on_crash',
+    EventType.STOP: 'post_stop',
+    EventType.LOG_ALERT: 'on_alert',
+}
+
+
+@dataclass
+class Event:
+    """A lifecycle event of a managed process"""
+    type: str
+    title: str
+    pid: int = None
+    time: float = field(default_factory=time.time)
+    data: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        return asdict(self)
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+
+class EventBus:
+    """In-process publish/subscribe for lifecycle events.
+
+    Subscribers are called synchronously on the publishing thread, so they
+    must only hand the event off (to a queue) and return.
+    """
+
+    def __init__(self, console: Console = None):
+        self.console = console or Console()
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback, types=None):
+        """Call ``callback(event)`` for events of ``types`` (all by default)"""
+        entry = (callback, frozenset(types) if types else None)
+        with self._lock:
+            self._subscribers = self._subscribers + [entry]
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers = [sub for sub in self._subscribers if sub is not entry]
+        return unsubscribe
+
+    def publish(self, event: Event):
+        for callback, types in self._subscribers:
+            if types is None or event.type in types:
+                try:
+                    callback(event)
+                except Exception as e:
+                    self.console.print(f"[red]Event subscriber error: {str(e)}[/red]")
+
+
+class HookRunner:
+    """Run per-process hooks off the hot path.
+
+    Events are put on a bounded queue served by a few worker threads; when
+    the queue is full the hook is dropped rather than blocking the publisher,
+    and every hook is cut off after ``HOOK_TIMEOUT`` seconds. A hook is either
+    a shell command, which gets the event in ``PYPM_*`` variables, or an
+    ``http://`` URL on the local host that receives the event as JSON.
+    """
+
+    def __init__(self, pm, bus: EventBus, workers: int = HOOK_WORKERS):
+        self.pm = pm
+        self.queue = queue.Queue(maxsize=HOOK_QUEUE_SIZE)
+        self._unsubscribe = bus.subscribe(self._enqueue, types=HOOKS)
+        for _ in range(workers):
+            worker = threading.Thread(target=self._work)
+            worker.daemon = True
+            worker.start()
+
+    def _enqueue(self, event: Event):
+        info = self.pm.processes.get(event.title)
+        hook = info and getattr(info.spec, HOOKS[event.type])
+        if not hook:
+            return
+        try:
+            self.queue.put_nowait((hook, event))
+        except queue.Full:
+            self.pm.console.print(f"[red]Hook queue full, dropped {event.type} hook of '{event.title}'[/red]")
+
+    def _work(self):
+        while True:
+            hook, event = self.queue.get()
+            try:
+                self.run_hook(hook, event)
+            except Exception as e:
+                self.pm.console.print(f"[red]{event.type} hook of '{event.title}' failed: {str(e)}[/red]")
+            finally:
+                self.queue.task_done()
+
+    def run_hook(self, hook: str, event: Event):
+        if hook.startswith(('http://', 'https://')):
+            host = urlparse(hook).hostname
+            if host not in LOCAL_HOSTS:
+                raise ValueError(f"webhook host '{host}' is not local")
+            request = urllib.request.Request(
+                hook, data=event.to_json().encode(), headers={'Content-Type': 'application/json'})
+            with urllib.request.urlopen(request, timeout=HOOK_TIMEOUT):
+                pass
+            return
+
+        env = dict(os.environ,
+                   PYPM_EVENT=event.type,
+                   PYPM_TITLE=event.title,
+                   PYPM_PID=str(event.pid or ''),
+                   PYPM_DATA=json.dumps(event.data))
+        info = self.pm.processes.get(event.title)
+        cwd = info.spec.cwd if info else None
+        subprocess.run(hook, shell=True, env=env, cwd=cwd, timeout=HOOK_TIMEOUT,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def shutdown(self):
+        self._unsubscribe()
@@ -0,0 +1,114 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from control import parse_host
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+class Exporter:
+    """The daemon's process metrics in the Prometheus text format.
+
+    Values come from the sampler's last tick, so a scrape never measures
+    anything itself.
+    """
+
+    def __init__(self, pm, sampler, sinks=None, log_metrics=None, accounting=None):
+        self.pm = pm
+        self.sampler = sampler
+        self.sinks = sinks
+        self.log_metrics = log_metrics
+        self.accounting = accounting
+        self._server = None
+
+    def collect(self):
+        """Yield (name, type, help, [(labels, value)]) metric families"""
+        samples = self.sampler.samples
+        processes = self.pm.snapshot()
+        yield ('pypm_up', 'gauge', 'Whether the process is running',
+               [({'title': title}, int(info.state.status == 'running')) for title, info in processes])
+        for key, name, help_text in (
+                ('cpu', 'pypm_cpu_percent', 'CPU usage in percent of one core'),
+                ('rss', 'pypm_memory_rss_bytes', 'Resident set size'),
+                ('pss', 'pypm_memory_pss_bytes', 'Proportional set size, shared pages split between sharers'),
+                ('uss', 'pypm_memory_uss_bytes', 'Unique set size, memory freed if the process exited')):
+            yield (name, 'gauge', help_text, [
+                ({'title': title}, sample[key]) for title, sample in samples.items()
+                if sample.get(key) is not None
+            ])
+        if self.sinks is not None:
+            sinks = [({'title': title, 'sink': str(sink)}, sink) for title, sink in self.sinks.sinks()]
+            yield ('pypm_sink_lines_total', 'counter', 'Output lines written to a sink',
+                   [(labels, sink.written) for labels, sink in sinks])
+            yield ('pypm_sink_dropped_total', 'counter', 'Output lines dropped because a sink was full',
+                   [(labels, sink.dropped) for labels, sink in sinks])
+            yield ('pypm_sink_failing', 'gauge', 'Whether the last write to a sink failed',
+                   [(labels, int(sink.error is not None)) for labels, sink in sinks])
+        if self.accounting is not None:
+            # Lifetime totals, they carry on across restarts of the process and the daemon
+            accounts = list(self.accounting.metrics())
+            for key, name, help_text in (
+                    ('cpu', 'pypm_cpu_seconds_total', 'CPU time used, including reaped children'),
+                    ('read', 'pypm_io_read_bytes_total', 'Bytes read from storage'),
+                    ('write', 'pypm_io_write_bytes_total', 'Bytes written to storage'),
+                    ('uptime', 'pypm_uptime_seconds_total', 'Time spent running'),
+                    ('restarts', 'pypm_restarts_total', 'Starts after the first one')):
+                yield (name, 'counter', help_text,
+                       [({'title': title}, round(account[key], 3)) for title, account in accounts])
+        if self.log_metrics is not None:
+            metrics = [({'title': title, 'metric': name}, total, rate, firing)
+                       for title, name, total, rate, firing in self.log_metrics.metrics()]
+            yield ('pypm_log_matches_total', 'counter', 'Output lines matching a log metric pattern',
+                   [(labels, total) for labels, total, _, _ in metrics])
+            yield ('pypm_log_match_rate', 'gauge', 'Matching lines per second over the last minute',
+                   [(labels, round(rate, 4)) for labels, _, rate, _ in metrics])
+            yield ('pypm_log_alert_firing', 'gauge', 'Whether a log alert on the metric is over its threshold',
+                   [(labels, int(firing)) for labels, _, _, firing in metrics])
+
+    def render(self):
+        lines = []
+        for name, kind, help_text, values in self.collect():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in values:
+                lines.append(f"{name}{_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, address: str):
+        """Serve GET /metrics on host:port"""
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(parse_host(address), Handler)
+        self._server.daemon_threads = True
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,225 @@
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+from proctree import TreeStats
+from sampler import MemoryPoller, Sampler
+from snapshot import reader
+from index import ProcessIndex, format_duration, uptime
+from actions import ActionRunner, PROGRESS
+
+ACTION_POLL_MS = 200
+REFRESH_SECONDS = 2
+COLUMNS = ("Status", "PID", "CPU", "Memory", "PSS", "USS", "Uptime", "Restarts", "AutoRun")
+HEADINGS = {"#0": "Process", "Status": "Status", "PID": "PID", "CPU": "CPU %", "Memory": "Memory MB",
+            "PSS": "PSS MB", "USS": "USS MB", "Uptime": "Uptime", "Restarts": "Restarts", "AutoRun": "Auto-Run"}
+SORT_COLUMNS = {'#0': 'name', 'CPU': 'cpu', 'Memory': 'rss', 'Uptime': 'uptime', 'Restarts': 'restarts'}
+
+
+class ProcessListMixin:
+    """The process list shared by the Tk frontends.
+
+    The frontend sets ``root`` and ``pm``, calls ``init_process_list`` and
+    places the widgets it creates. Measuring happens on the update thread
+    in ``collect``; everything touching Tk runs on the Tk thread.
+    """
+
+    def init_process_list(self, parent):
+        """Create the tree, the tree toggle and search variables and the action runner"""
+        self.tree = ttk.Treeview(parent, columns=COLUMNS, show="tree headings")
+        for column, text in HEADINGS.items():
+            self.tree.heading(column, text=text)
+        # Clicking a heading sorts by it, clicking it again reverses the order
+        for column, key in SORT_COLUMNS.items():
+            self.tree.heading(column, command=lambda key=key: self.sort_by(key))
+        for column in COLUMNS:
+            self.tree.column(column, width=80 if column == "Restarts" else 100)
+        self.tree.tag_configure('running', foreground='green')
+        self.tree.tag_configure('stopped', foreground='red')
+        self.tree.tag_configure('child', foreground='gray')
+
+        # Sum usage over each process tree and list the children
+        self.tree_var = tk.BooleanVar(value=False)
+        self.tree_stats = TreeStats()
+        self.memory = MemoryPoller()
+        # Read by the update thread, which must not call into Tk
+        self.show_tree = False
+        self.tree_var.trace_add('write', lambda *args: setattr(self, 'show_tree', self.tree_var.get()))
+        # Filter as you type: words match title, command, group, namespace and tags; group:, ns:, tag: and status: filter
+        self.index = ProcessIndex(self.pm)
+        self.sampler = Sampler(self.pm, memory_interval=0)
+        self.published = reader(self.pm)  # The daemon's samples, when one is running
+        self.samples = {}
+        self.sort_key = None
+        self.sort_reverse = False
+        self.usage = {}
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', lambda *args: self.update_process_list())
+
+        # Actions run in the background, their results show in the status line
+        self.actions = ActionRunner(self.pm)
+        self.pm.console.quiet = True
+        self.status_var = tk.StringVar()
+
+    def start_updates(self):
+        """Start the update thread and the action poll"""
+        self.running = True
+        self.update_thread = threading.Thread(target=self.update_loop)
+        self.update_thread.daemon = True
+        self.update_thread.start()
+        self.root.after(ACTION_POLL_MS, self.poll_actions)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    def collect(self):
+        """Measure the processes for the next redraw, on the update thread"""
+        if self.show_tree:
+            usage = self.tree_stats.collect({
+                title: info.state.pid for title, info in self.pm.snapshot()
+                if info.state.status == 'running' and info.state.pid
+            })
+            self.memory.watch(pid for tree in usage.values() for pid, *_ in tree['nodes'])
+            self.usage = usage
+        else:
+            self.usage = {}
+            published = self.published.read()
+            if published is not None:
+                # The daemon sampled already, PSS/USS included
+                self.samples = published['samples']
+            else:
+                # CPU is measured since the previous refresh, nothing sleeps per process
+                self.sampler.sample()
+                self.samples = self.sampler.samples
+                self.memory.watch(info.state.pid for _, info in self.pm.snapshot() if info.state.pid)
+
+    def update_process_list(self):
+        """Redraw the process list from the last collect(), on the Tk thread"""
+        # Keep expanded trees and the selection across refreshes
+        opened = {item for item in self.tree.get_children() if self.tree.item(item, 'open')}
+        selection = self.tree.selection()
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+
+        usage = self.usage
+        processes = self.index.query(self.search_var.get(), self.sort_key, usage or self.samples,
+                                     self.sort_reverse)
+        for title, info in processes:
+            status = info.state.status
+            pid = info.state.pid or ''
+            cpu = 'N/A'
+            mem = 'N/A'
+
+            tree = usage.get(title)
+            sample = self.samples.get(title)
+            if tree and tree['nodes']:
+                cpu = f"{tree['cpu']:.1f}"
+                mem = f"{tree['rss'] / 1024 / 1024:.1f}"
+            elif sample and not usage:
+                cpu = f"{sample['cpu']:.1f}"
+                mem = f"{sample['rss'] / 1024 / 1024:.1f}"
+
+            # USS/PSS come from the background poller, never from smaps on this thread
+            pss = uss = 'N/A'
+            if tree:
+                memory = self.memory.total(pid for pid, *_ in tree['nodes'])
+            elif sample and sample.get('pss') is not None:
+                memory = sample['pss'], sample['uss']
+            else:
+                memory = self.memory.total((pid,)) if status == 'running' and pid else None
+            if memory:
+                pss, uss = (f"{value / 1024 / 1024:.1f}" for value in memory)
+
+            autorun = '✓' if info.spec.autorun else '✗'
+
+            # Insert with tag for color
+            tags = ('running',) if status == 'running' else ('stopped',)
+            status = self.actions.progress(title) or status
+            self.tree.insert('', tk.END, iid=title, text=title, values=(status, pid, cpu, mem, pss, uss, format_duration(uptime(info)), info.state.restarts, autorun),
+                             tags=tags, open=title in opened)
+            # Descendants nest under their parent process
+            if tree:
+                parents = [title]
+                for child_pid, depth, name, child_cpu, rss in tree['nodes'][1:]:
+                    del parents[depth:]
+                    parents.append(self.tree.insert(
+                        parents[-1], tk.END, iid=f"{title}/{child_pid}", text=name, open=True, tags=('child',),
+                        values=('', child_pid, f"{child_cpu:.1f}", f"{rss / 1024 / 1024:.1f}", '', '', '', '', '')))
+        self.tree.selection_set([item for item in selection if self.tree.exists(item)])
+
+    def redraw(self):
+        """Everything redrawn after a collect(), on the Tk thread"""
+        self.update_process_list()
+
+    def update_loop(self):
+        """Background update loop"""
+        while self.running:
+            self.collect()
+            # Tk isn't thread-safe, widgets are only changed on its own thread
+            self.root.after(0, self.redraw)
+            time.sleep(REFRESH_SECONDS)
+
+    def get_selected_process(self):
+        """Get the selected process from the treeview"""
+        selection = self.tree.selection()
+        if not selection:
+            return None
+        # A child process stands for the managed process at the top of its tree
+        item = selection[0]
+        while self.tree.parent(item):
+            item = self.tree.parent(item)
+        return self.tree.item(item, 'text')
+
+    def get_selected_processes(self):
+        """Get the selected processes, children standing for their managed process"""
+        titles = []
+        for item in self.tree.selection():
+            while self.tree.parent(item):
+                item = self.tree.parent(item)
+            title = self.tree.item(item, 'text')
+            if title not in titles:
+                titles.append(title)
+        return titles
+
+    def sort_by(self, key):
+        """Sort by a column, or reverse the order if it already is"""
+        if self.sort_key == key:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_key, self.sort_reverse = key, False
+        self.update_process_list()
+
+    def run_action(self, action):
+        """Run an action on the selected processes in the background"""
+        for title in self.get_selected_processes():
+            if not self.actions.submit(action, title):
+                self.status_var.set(f"{title} is still {PROGRESS[self.actions.busy(title)]}")
+
+    def poll_actions(self):
+        """Report finished actions and turn the spinners of running ones"""
+        if not self.running:
+            return
+        summary = self.actions.summary()
+        if summary:
+            self.status_var.set(summary)
+        for title, _ in self.pm.snapshot():
+            progress = self.actions.progress(title)
+            if progress and self.tree.exists(title):
+                self.tree.set(title, 'Status', progress)
+        self.root.after(ACTION_POLL_MS, self.poll_actions)
+
+    def start_process(self):
+        """Start the selected processes"""
+        self.run_action('start')
+
+    def stop_process(self):
+        """Stop the selected processes"""
+        self.run_action('stop')
+
+    def restart_process(self):
+        """Restart the selected processes"""
+        self.run_action('restart')
+
+    def on_closing(self):
+        """Handle window closing"""
+        self.running = False
+        self.actions.shutdown()
+        self.root.destroy()
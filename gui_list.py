@@ -1,12 +1,10 @@
 #!/usr/bin/env python3
 import tkinter as tk
 from tkinter import ttk
-import psutil
 from process_manager import ProcessManager
-import time
-import threading
+from gui_common import ProcessListMixin
 
-class ProcessListGUI:
+class ProcessListGUI(ProcessListMixin):
     def __init__(self, root):
         self.root = root
         self.root.title("PyProcessManager - Process List")
@@ -20,7 +18,7 @@ class ProcessListGUI:
         self.main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
         # Create treeview
-        self.tree = ttk.Treeview(self.main_frame, columns=("Status", "PID", "CPU", "Memory", "AutoRun"), show="headings")
+        self.init_process_list(self.main_frame)
         self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
         # Add scrollbar
@@ -28,20 +26,6 @@ class ProcessListGUI:
         scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
         self.tree.configure(yscrollcommand=scrollbar.set)
         
-        # Configure column headings
-        self.tree.heading("Status", text="Status")
-        self.tree.heading("PID", text="PID")
-        self.tree.heading("CPU", text="CPU %")
-        self.tree.heading("Memory", text="Memory MB")
-        self.tree.heading("AutoRun", text="Auto-Run")
-        
-        # Configure column widths
-        self.tree.column("Status", width=100)
-        self.tree.column("PID", width=100)
-        self.tree.column("CPU", width=100)
-        self.tree.column("Memory", width=100)
-        self.tree.column("AutoRun", width=100)
-        
         # Add buttons
         button_frame = ttk.Frame(self.main_frame)
         button_frame.grid(row=1, column=0, columnspan=2, pady=10)
@@ -50,15 +34,15 @@ class ProcessListGUI:
         ttk.Button(button_frame, text="Stop", command=self.stop_process).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Restart", command=self.restart_process).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="View Logs", command=self.view_logs).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(button_frame, text="Process tree", variable=self.tree_var).pack(side=tk.LEFT, padx=5)
+        ttk.Label(button_frame, text="Search:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(button_frame, textvariable=self.search_var, width=24).pack(side=tk.LEFT, padx=5)
+
+        # Actions run in the background, their results show here
+        ttk.Label(self.main_frame, textvariable=self.status_var, anchor=tk.W).grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E))
         
-        # Start update thread
-        self.running = True
-        self.update_thread = threading.Thread(target=self.update_loop)
-        self.update_thread.daemon = True
-        self.update_thread.start()
-        
-        # Bind close event
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        # Start update thread, bind close event
+        self.start_updates()
         
         # Configure grid weights
         self.main_frame.columnconfigure(0, weight=1)
@@ -66,74 +50,6 @@ class ProcessListGUI:
         root.columnconfigure(0, weight=1)
         root.rowconfigure(0, weight=1)
 
-    def get_process_stats(self, pid):
-        try:
-            process = psutil.Process(pid)
-            cpu = process.cpu_percent(interval=0.1)
-            mem = process.memory_info().rss / 1024 / 1024  # Convert to MB
-            return cpu, mem
-        except:
-            return 0, 0
-
-    def update_process_list(self):
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Add processes
-        for title, info in self.pm.processes.items():
-            status = info['status']
-            pid = info['pid'] or ''
-            cpu = 'N/A'
-            mem = 'N/A'
-            
-            if status == 'running' and pid:
-                try:
-                    cpu_usage, mem_usage = self.get_process_stats(pid)
-                    cpu = f"{cpu_usage:.1f}"
-                    mem = f"{mem_usage:.1f}"
-                except:
-                    pass
-            
-            autorun = '✓' if info['autorun'] else '✗'
-            
-            # Insert with tag for color
-            tags = ('running',) if status == 'running' else ('stopped',)
-            self.tree.insert('', tk.END, text=title, values=(status, pid, cpu, mem, autorun), tags=tags)
-        
-        # Configure tags for colors
-        self.tree.tag_configure('running', foreground='green')
-        self.tree.tag_configure('stopped', foreground='red')
-
-    def update_loop(self):
-        while self.running:
-            self.update_process_list()
-            time.sleep(2)
-
-    def get_selected_process(self):
-        selection = self.tree.selection()
-        if not selection:
-            return None
-        item = self.tree.item(selection[0])
-        return item.get('text')  # Get the title
-
-    def start_process(self):
-        title = self.get_selected_process()
-        if title:
-            self.pm.start(title)
-
-    def stop_process(self):
-        title = self.get_selected_process()
-        if title:
-            self.pm.stop(title)
-
-    def restart_process(self):
-        title = self.get_selected_process()
-        if title:
-            self.pm.stop(title)
-            time.sleep(1)
-            self.pm.start(title)
-
     def view_logs(self):
         title = self.get_selected_process()
         if title:
@@ -150,10 +66,6 @@ class ProcessListGUI:
             if os.path.exists(stderr_log):
                 subprocess.Popen(['xdg-open', stderr_log])
 
-    def on_closing(self):
-        self.running = False
-        self.root.destroy()
-
 def main():
     root = tk.Tk()
     app = ProcessListGUI(root)
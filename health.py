@@ -0,0 +1,147 @@
+import asyncio
+import ssl
+import threading
+from urllib.parse import urlparse
+from events import EventType
+
+DEFAULT_INTERVAL = 10.0  # seconds
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_THRESHOLD = 3
+HEALTHY = 'healthy'
+UNHEALTHY = 'unhealthy'
+
+
+async def probe_http(url: str):
+    """GET the URL, healthy on a 2xx or 3xx status"""
+    parsed = urlparse(url)
+    secure = parsed.scheme == 'https'
+    port = parsed.port or (443 if secure else 80)
+    reader, writer = await asyncio.open_connection(
+        parsed.hostname or 'localhost', port, ssl=ssl.create_default_context() if secure else None)
+    try:
+        path = parsed.path or '/'
+        if parsed.query:
+            path += f"?{parsed.query}"
+        writer.write(f"GET {path} HTTP/1.0\r\nHost: {parsed.hostname}\r\nUser-Agent: pypm-health\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        parts = status_line.split()
+        return len(parts) > 1 and parts[1][:1] in (b'2', b'3')
+    finally:
+        writer.close()
+
+
+async def probe_tcp(address: str):
+    """Healthy if a TCP connection can be opened"""
+    host, _, port = address.rpartition(':')
+    _, writer = await asyncio.open_connection(host.strip('[]') or 'localhost', int(port))
+    writer.close()
+    return True
+
+
+async def probe_exec(command: str, cwd: str = None):
+    """Healthy if the command exits with status 0"""
+    proc = await asyncio.create_subprocess_shell(
+        command, cwd=cwd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+    try:
+        return await proc.wait() == 0
+    except asyncio.CancelledError:
+        # Timed out: don't leave the check running
+        proc.kill()
+        raise
+
+
+class HealthChecker:
+    """Liveness probes for every process with a ``health`` check.
+
+    All probes run concurrently as tasks on a single asyncio loop in one
+    background thread. After ``threshold`` consecutive failures the process is
+    marked unhealthy and restarted; the restart runs in the loop's executor
+    so other probes keep going.
+    """
+
+    def __init__(self, pm):
+        self.pm = pm
+        self.loop = asyncio.new_event_loop()
+        self._tasks = {}  # title -> (check config, task)
+        self._thread = threading.Thread(target=self.loop.run_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def sync(self):
+        """Start, restart or cancel probe tasks after the process records changed"""
+        self.loop.call_soon_threadsafe(self._sync)
+
+    def _sync(self):
+        checks = {title: info.spec.health for title, info in self.pm.snapshot() if info.spec.health}
+        for title in list(self._tasks):
+            if checks.get(title) != self._tasks[title][0]:
+                self._tasks.pop(title)[1].cancel()
+        for title, check in checks.items():
+            if title not in self._tasks:
+                self._tasks[title] = (check, self.loop.create_task(self._run(title, dict(check))))
+
+    async def _probe(self, check, cwd):
+        kind, target = check['type'], check['target']
+        if kind == 'http':
+            return await probe_http(target)
+        if kind == 'tcp':
+            return await probe_tcp(target)
+        if kind == 'exec':
+            return await probe_exec(target, cwd)
+        raise ValueError(f"unknown health check type '{kind}'")
+
+    def _set_status(self, title: str, status):
+        with self.pm._lock:
+            info = self.pm.processes.get(title)
+            if info is None or info.state.health_status == status:
+                return
+            info.state.health_status = status
+            self.pm._save_processes()
+
+    async def _run(self, title: str, check):
+        interval = float(check.get('interval') or DEFAULT_INTERVAL)
+        timeout = float(check.get('timeout') or DEFAULT_TIMEOUT)
+        threshold = int(check.get('threshold') or DEFAULT_THRESHOLD)
+        failures = 0
+        while True:
+            await asyncio.sleep(interval)
+            info = self.pm.processes.get(title)
+            if not info or info.state.status != 'running':
+                failures = 0
+                continue
+
+            try:
+                healthy = await asyncio.wait_for(self._probe(check, info.spec.cwd), timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                healthy = False
+
+            if healthy:
+                failures = 0
+                self._set_status(title, HEALTHY)
+                continue
+
+            failures += 1
+            if failures < threshold:
+                continue
+            failures = 0
+            self._set_status(title, UNHEALTHY)
+            self.pm.console.print(f"[red]'{title}' failed {threshold} health checks, restarting[/red]")
+            self.pm._emit(EventType.UNHEALTHY, title, info.state.pid)
+            await self.loop.run_in_executor(None, self.pm.restart, title)
+
+    async def _cancel_all(self):
+        tasks = [task for _, task in self._tasks.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def shutdown(self):
+        try:
+            asyncio.run_coroutine_threadsafe(self._cancel_all(), self.loop).result(timeout=DEFAULT_TIMEOUT)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
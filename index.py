@@ -0,0 +1,145 @@
+import time
+
+SORT_KEYS = ('name', 'cpu', 'rss', 'uptime', 'restarts')
+# Filters written as field:prefix in a search, e.g. "group:web status:run tag:batch"
+FILTERS = ('group', 'status', 'ns', 'tag')
+
+
+def uptime(info, now: float = None):
+    """Seconds the process has been running, None if it isn't"""
+    if info.state.status != 'running' or not info.state.started:
+        return None
+    return (now or time.time()) - info.state.started
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return ''
+    seconds = int(seconds)
+    for unit, size, smaller, smaller_size in (('d', 86400, 'h', 3600), ('h', 3600, 'm', 60), ('m', 60, 's', 1)):
+        if seconds >= size:
+            return f"{seconds // size}{unit} {seconds % size // smaller_size}{smaller}"
+    return f"{seconds}s"
+
+
+def parse_query(query: str):
+    """Split a search into lowercase words and {filter: prefix}"""
+    words, filters = [], {}
+    for token in query.lower().split():
+        name, sep, value = token.partition(':')
+        if sep and name in FILTERS:
+            filters[name] = value
+        else:
+            words.append(token)
+    return words, filters
+
+
+def narrows(old: str, new: str):
+    """Whether everything matching search ``new`` also matches ``old``"""
+    old_words, old_filters = parse_query(old)
+    new_words, new_filters = parse_query(new)
+    return (all(any(old_word in word for word in new_words) for old_word in old_words)
+            and all(new_filters.get(name, '').startswith(value) and name in new_filters
+                    for name, value in old_filters.items()))
+
+
+class ProcessIndex:
+    """Search, filter and sort the process records for the frontends.
+
+    Each record's search text is built once per spec: specs are replaced,
+    never modified, so ``update`` only re-indexes the records whose spec
+    changed since the last call. A search that narrows the previous one
+    (typing on in a search box) filters the previous matches instead of
+    all records, which keeps it instant with thousands of processes.
+    """
+
+    def __init__(self, pm):
+        self.pm = pm
+        self._snapshot = None
+        self._order = []    # titles in snapshot order
+        self._records = {}  # title -> ProcessRecord
+        self._specs = {}    # title -> the spec the entry was built from
+        self._text = {}     # title -> lowercase title, command, group, namespace and tags
+        self._groups = {}   # title -> lowercase group (its own title if not an instance)
+        self._namespaces = {}  # title -> lowercase namespace
+        self._tags = {}     # title -> lowercase tags
+        self._last = None   # (query, matching titles) of the previous search
+
+    def update(self):
+        """Catch up with the saved records, True if anything changed"""
+        snapshot = self.pm.snapshot()
+        if snapshot is self._snapshot:
+            return False
+        self._snapshot = snapshot
+        self._records = dict(snapshot)
+        self._order = [title for title, _ in snapshot]
+        for title, info in snapshot:
+            if self._specs.get(title) is not info.spec:
+                self._index(title, info.spec)
+        for title in list(self._specs):
+            if title not in self._records:
+                del self._specs[title], self._text[title], self._groups[title]
+                del self._namespaces[title], self._tags[title]
+        # Statuses may have changed too
+        self._last = None
+        return True
+
+    def _index(self, title: str, spec):
+        self._specs[title] = spec
+        self._text[title] = ' '.join(filter(None, (title, spec.command, spec.group, spec.namespace, *spec.tags))).lower()
+        self._groups[title] = (spec.group or title).lower()
+        self._namespaces[title] = (spec.namespace or '').lower()
+        self._tags[title] = tuple(tag.lower() for tag in spec.tags)
+
+    def _matches(self, title: str, words, filters):
+        text = self._text[title]
+        if not all(word in text for word in words):
+            return False
+        if 'group' in filters and not self._groups[title].startswith(filters['group']):
+            return False
+        if 'status' in filters and not self._records[title].state.status.startswith(filters['status']):
+            return False
+        if 'ns' in filters and not self._namespaces[title].startswith(filters['ns']):
+            return False
+        if 'tag' in filters and not any(tag.startswith(filters['tag']) for tag in self._tags[title]):
+            return False
+        return True
+
+    def search(self, query: str = ''):
+        """Titles matching every word and filter of the query, in saved order"""
+        self.update()
+        query = ' '.join(query.split())
+        if not query:
+            return self._order
+        last = self._last
+        # Typing on usually narrows the search, only the previous matches can match then
+        candidates = last[1] if last is not None and narrows(last[0], query) else self._order
+        words, filters = parse_query(query)
+        matches = [title for title in candidates if self._matches(title, words, filters)]
+        self._last = (query, matches)
+        return matches
+
+    def sort(self, titles, key: str = 'name', samples=None, reverse: bool = False):
+        """Order titles by name, or by cpu, rss, uptime or restarts, largest first"""
+        if key == 'name':
+            return sorted(titles, reverse=reverse)
+        samples = samples or {}
+        now = time.time()
+
+        def value(title):
+            if key in ('cpu', 'rss'):
+                sample = samples.get(title)
+                return sample[key] if sample else -1
+            if key == 'uptime':
+                seconds = uptime(self._records[title], now)
+                return -1 if seconds is None else seconds
+            return self._records[title].state.restarts
+
+        return sorted(titles, key=value, reverse=not reverse)
+
+    def query(self, query: str = '', sort: str = None, samples=None, reverse: bool = False):
+        """(title, record) pairs matching ``query``, sorted by ``sort`` or in saved order"""
+        titles = self.search(query)
+        if sort:
+            titles = self.sort(titles, sort, samples, reverse)
+        return [(title, self._records[title]) for title in titles]
@@ -0,0 +1,192 @@
+import re
+import threading
+import time
+from collections import deque
+from events import Event, EventType
+
+RATE_WINDOW = 60  # seconds the published rates are averaged over
+ALERT = re.compile(r'^(?P<metric>[\w.-]+)>(?P<threshold>\d+)/(?P<count>\d*)(?P<unit>s|m|min|h)'
+                   r'(?::(?P<action>restart))?$')
+UNITS = {'s': 1, 'm': 60, 'min': 60, 'h': 3600}
+# Constructs that can match differently in a batch of lines than in each line alone
+PER_LINE = re.compile(r'\\[1-9AZ]|\(\?(P=|=|!|<=|<!)')
+
+
+def parse_alert(text: str):
+    """Split ``metric>count/window[:restart]``, e.g. ``errors>10/1m:restart``, into
+    (metric, threshold, window seconds, restart)"""
+    match = ALERT.match(text.replace(' ', ''))
+    if match is None:
+        raise ValueError(f"invalid log alert '{text}', expected e.g. errors>10/1m or errors>10/5m:restart")
+    window = int(match['count'] or 1) * UNITS[match['unit']]
+    if not window:
+        raise ValueError(f"log alert '{text}' has an empty window")
+    return match['metric'], int(match['threshold']), window, match['action'] == 'restart'
+
+
+def validate(log_metrics, log_alerts=()):
+    """Raise ValueError if a pattern doesn't compile or an alert names an unknown metric"""
+    for name, pattern in (log_metrics or {}).items():
+        if not isinstance(pattern, str):
+            raise ValueError(f"log metric '{name}' must be a regular expression string")
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"log metric '{name}': {str(e)}")
+    for text in log_alerts:
+        metric = parse_alert(text)[0]
+        if metric not in (log_metrics or {}):
+            raise ValueError(f"log alert '{text}' refers to unknown log metric '{metric}'")
+
+
+class Matcher:
+    """Count the lines matching each of a process's patterns.
+
+    Each pattern is searched once over the whole batch of lines joined by
+    newlines, with ``^`` and ``$`` matching at every line: the scan runs in
+    the regex engine instead of a Python loop per line, and most batches
+    hold few or no matches. A match only nominates its line, which is then
+    checked on its own, so a pattern reaching into the next line never
+    counts. Patterns with lookarounds, ``\\A``/``\\Z`` or backreferences are
+    searched line by line.
+    """
+
+    def __init__(self, patterns):
+        self.names = tuple(patterns)
+        self.patterns = tuple(re.compile(pattern) for pattern in patterns.values())
+        self.batch = tuple(None if PER_LINE.search(pattern) else re.compile(pattern, re.MULTILINE)
+                           for pattern in patterns.values())
+
+    def count(self, lines, counts):
+        """Add the matching lines among ``lines`` to ``counts``, a list in pattern order"""
+        if not lines:
+            return
+        text = None
+        for i, (pattern, batch) in enumerate(zip(self.patterns, self.batch)):
+            if batch is None:
+                search = pattern.search
+                counts[i] += sum(1 for line in lines if search(line))
+                continue
+            if text is None:
+                text = '\n'.join(lines)
+            match = batch.search(text)
+            while match is not None:
+                start = text.rfind('\n', 0, match.start()) + 1
+                end = text.find('\n', match.start())
+                if end < 0:
+                    end = len(text)
+                if pattern.search(text[start:end]):
+                    counts[i] += 1
+                match = batch.search(text, end + 1)
+
+
+class _Metrics:
+    """The counters and alerts of one process"""
+    __slots__ = ('config', 'matcher', 'counts', 'history', 'alerts', 'firing', 'rates')
+
+    def __init__(self, config, now: float):
+        patterns, alerts = config
+        self.config = config
+        self.matcher = Matcher(dict(patterns))
+        self.counts = [0] * len(self.matcher.names)
+        self.history = deque([(now, tuple(self.counts))])  # (time, counts) per evaluation
+        self.alerts = tuple((text, *parse_alert(text)) for text in alerts)
+        self.firing = set()  # alert texts above their threshold
+        self.rates = {}
+
+    def since(self, start: float):
+        """The counts as of the oldest evaluation at or after ``start``"""
+        for t, counts in self.history:
+            if t >= start:
+                return t, counts
+        return self.history[-1]
+
+
+class LogMetrics:
+    """Regex counters over the output of each process, with rates and alerts.
+
+    Used as a ``LogTailer`` listener, so lines are matched as they are read
+    for the crash reports and sinks anyway: no second pass over the logs.
+    ``evaluate`` runs on the daemon's sample tick; it publishes a
+    ``log_metric`` event for metrics that matched since the last tick, and
+    a ``log_alert`` event when a metric goes over an alert's threshold,
+    restarting the process if the alert says so.
+    """
+
+    def __init__(self, pm, bus=None):
+        self.pm = pm
+        self.bus = bus
+        self._metrics = {}  # title -> _Metrics
+
+    def sync(self):
+        """Pick up added, changed and removed patterns, keeping unchanged counters"""
+        now = time.time()
+        configs = {}
+        for title, info in self.pm.snapshot():
+            if info.spec.log_metrics:
+                configs[title] = (tuple(info.spec.log_metrics.items()), info.spec.log_alerts)
+        for title in list(self._metrics):
+            if configs.get(title) != self._metrics[title].config:
+                del self._metrics[title]
+        for title, config in configs.items():
+            if title not in self._metrics:
+                try:
+                    self._metrics[title] = _Metrics(config, now)
+                except (ValueError, re.error) as e:
+                    self.pm.console.print(f"[red]Log metrics of '{title}': {str(e)}[/red]")
+
+    def __call__(self, title: str, stream: str, lines):
+        metrics = self._metrics.get(title)
+        if metrics is not None:
+            metrics.matcher.count(lines, metrics.counts)
+
+    def evaluate(self, now: float = None):
+        now = now or time.time()
+        for title, metrics in list(self._metrics.items()):
+            counts = tuple(metrics.counts)
+            previous = metrics.history[-1][1]
+            metrics.history.append((now, counts))
+            longest = max([RATE_WINDOW, *(window for _, _, _, window, _ in metrics.alerts)])
+            while metrics.history[0][0] < now - longest - 1:
+                metrics.history.popleft()
+
+            start, old = metrics.since(now - RATE_WINDOW)
+            span = max(now - start, 1)
+            names = metrics.matcher.names
+            metrics.rates = {name: (counts[i] - old[i]) / span for i, name in enumerate(names)}
+            for i, name in enumerate(names):
+                if counts[i] != previous[i]:
+                    self._publish(EventType.LOG_METRIC, title, metric=name, matches=counts[i] - previous[i],
+                                  total=counts[i], rate=metrics.rates[name])
+
+            for text, metric, threshold, window, restart in metrics.alerts:
+                i = names.index(metric)
+                matches = counts[i] - metrics.since(now - window)[1][i]
+                if matches <= threshold:
+                    metrics.firing.discard(text)
+                    continue
+                if text in metrics.firing:
+                    # Fires once per crossing, not on every tick above the threshold
+                    continue
+                metrics.firing.add(text)
+                self.pm.console.print(f"[red]'{title}' logged {matches} {metric} lines in {window}s"
+                                      f"{', restarting' if restart else ''}[/red]")
+                self._publish(EventType.LOG_ALERT, title, alert=text, metric=metric, matches=matches,
+                              window=window, restart=restart)
+                if restart:
+                    # pm.restart waits for the process to stop, keep the tick going
+                    thread = threading.Thread(target=self.pm.restart, args=(title,), name=f"alert-{title}")
+                    thread.daemon = True
+                    thread.start()
+
+    def _publish(self, event_type: str, title: str, **data):
+        info = self.pm.processes.get(title)
+        if self.bus is not None:
+            self.bus.publish(Event(event_type, title, info.state.pid if info else None, data=data))
+
+    def metrics(self):
+        """Yield (title, metric, total, rate per second, whether an alert on it fires)"""
+        for title, metrics in self._metrics.items():
+            firing = {metric for text, metric, *_ in metrics.alerts if text in metrics.firing}
+            for i, name in enumerate(metrics.matcher.names):
+                yield title, name, metrics.counts[i], metrics.rates.get(name, 0.0), name in firing
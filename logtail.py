@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from collections import deque
+
+TAIL_LINES = 20
+READ_LIMIT = 4 << 20   # bytes read per file and poll, the rest waits for the next poll
+BACKFILL = 8192        # bytes read from the end of a file seen for the first time
+LINE_MAX = 64 << 10    # bytes of output without a newline passed on as a line of its own
+STREAMS = ('out', 'err')
+
+
+class _Follower:
+    __slots__ = ('inode', 'offset', 'partial', 'lines', 'history')
+
+    def __init__(self, lines: int, history: bool):
+        self.inode = None
+        self.offset = 0
+        self.partial = b''
+        self.lines = deque(maxlen=lines)
+        self.history = history  # Whether the file predates the tailer, only its end is read then
+
+
+class LogTailer:
+    """Follow the ``.out``/``.err`` logs of managed processes incrementally.
+
+    Each poll reads only what was appended since the previous one and keeps
+    the last lines of every stream in memory, so a crash report doesn't
+    re-read the log from disk. Listeners get the new lines as
+    ``listener(title, stream, lines)``; the end of a log written before the
+    tailer started is only kept for the crash reports. Children keep writing
+    to their log files, so a slow reader never blocks them.
+    """
+
+    def __init__(self, pm, lines: int = TAIL_LINES):
+        self.pm = pm
+        self.lines = lines
+        self.listeners = []
+        self._followers = {}  # (title, stream) -> _Follower
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def _read(self, path: str, follower: _Follower):
+        """Return the complete lines appended to path since the last read"""
+        try:
+            # A stat is enough to tell that nothing was appended
+            stat = os.stat(path)
+            if stat.st_ino == follower.inode and stat.st_size == follower.offset:
+                return []
+            with open(path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if follower.inode != stat.st_ino or stat.st_size < follower.offset:
+                    # New or truncated file (start() truncates the logs)
+                    first = follower.inode is None and follower.history
+                    follower.inode = stat.st_ino
+                    follower.offset = max(0, stat.st_size - BACKFILL) if first else 0
+                    follower.partial = b''
+                    if follower.offset:
+                        # Skip the line cut by the backfill window
+                        f.seek(follower.offset)
+                        follower.offset += len(f.readline())
+                if stat.st_size == follower.offset:
+                    return []
+                f.seek(follower.offset)
+                data = f.read(READ_LIMIT)
+        except FileNotFoundError:
+            # Whatever is written from now on is new
+            follower.history = False
+            return []
+        except OSError:
+            return []
+        follower.offset += len(data)
+        data = follower.partial + data
+        *complete, follower.partial = data.split(b'\n')
+        while len(follower.partial) > LINE_MAX:
+            # Output that never ends a line would otherwise grow without bound
+            complete.append(follower.partial[:LINE_MAX])
+            follower.partial = follower.partial[LINE_MAX:]
+        return [line.decode('utf-8', errors='replace') for line in complete]
+
+    def poll(self, titles=None):
+        """Read new output of the running processes, or of ``titles``"""
+        if titles is None:
+            titles = [title for title, info in self.pm.snapshot() if info.state.pid]
+        with self._lock:
+            for title in titles:
+                out_log, err_log = self.pm._log_paths(title)
+                for stream, path in zip(STREAMS, (out_log, err_log)):
+                    follower = self._followers.get((title, stream))
+                    if follower is None:
+                        info = self.pm.processes.get(title)
+                        started = info.state.started if info else None
+                        follower = self._followers[(title, stream)] = _Follower(
+                            self.lines, history=not started or started < self.started)
+                    backfill = follower.inode is None and follower.history
+                    lines = self._read(path, follower)
+                    if not lines:
+                        continue
+                    follower.lines.extend(lines)
+                    if backfill:
+                        # Output from before we started, already shipped and counted if ever
+                        continue
+                    for listener in self.listeners:
+                        try:
+                            listener(title, stream, lines)
+                        except Exception as e:
+                            self.pm.console.print(f"[red]Log listener error: {str(e)}[/red]")
+
+    def tail(self, title: str, stream: str = 'err'):
+        """The last lines of a stream, as of the last poll"""
+        follower = self._followers.get((title, stream))
+        return list(follower.lines) if follower else []
+
+    def forget(self, keep):
+        """Drop the followers of processes that no longer exist"""
+        with self._lock:
+            for key in list(self._followers):
+                if key[0] not in keep:
+                    del self._followers[key]
@@ -0,0 +1,190 @@
+from dataclasses import dataclass, fields, replace
+from scheduler import OVERLAP_POLICIES, CronSchedule
+from sinks import parse_sink
+from placement import validate as validate_placement
+from logmetrics import validate as validate_log_metrics
+from autoscaler import validate as validate_scaling
+
+HEALTH_TYPES = ('http', 'tcp', 'exec')
+
+
+@dataclass(frozen=True, slots=True)
+class ProcessSpec:
+    """How to run a process, as saved by the user.
+
+    Specs are never modified: a change (save, toggling autorun) replaces the
+    whole spec, so a spec can be shared by every snapshot that saw it. The
+    ``env`` and ``health`` dicts are shared too and must be treated as
+    read-only.
+    """
+    command: str
+    cwd: str
+    autorun: bool = False
+    cgroup: bool = False
+    cpu_affinity: str = None  # CPU list like 0-3,8, or auto to spread a group's instances
+    numa_node: int = None
+    nice: int = None
+    ionice: str = None  # class[:level], e.g. best-effort:4 or idle
+    cron: str = None
+    interval: float = None
+    overlap: str = 'skip'
+    jitter: float = 0
+    min_instances: int = None
+    max_instances: int = None
+    scale_up: float = None
+    scale_down: float = None
+    scale_command: str = None
+    scale_cooldown: float = None
+    watch: tuple = ()
+    watch_ignore: tuple = ()
+    on_start: str = None
+    on_crash: str = None
+    post_stop: str = None
+    on_alert: str = None
+    listen: tuple = ()
+    health: dict = None
+    env: dict = None
+    env_file: str = None
+    sinks: tuple = ()
+    log_metrics: dict = None  # name -> regular expression counted over the output
+    log_alerts: tuple = ()    # metric>count/window[:restart], e.g. errors>10/1m:restart
+    namespace: str = None
+    tags: tuple = ()
+    group: str = None
+    instance: int = None
+
+    def replace(self, **changes):
+        return replace(self, **changes)
+
+
+@dataclass(slots=True)
+class ProcessState:
+    """What the supervisor knows about a process right now"""
+    pid: int = None
+    status: str = 'stopped'
+    instances: int = 1
+    health_status: str = None
+    history: list = None  # Only scheduled processes have runs
+    started: float = None
+    crashes: list = None  # Unexpected exits, newest last
+    restarts: int = 0  # Starts after the first one
+
+
+SPEC_FIELDS = {f.name: f.type for f in fields(ProcessSpec)}
+STATE_FIELDS = {f.name: f.type for f in fields(ProcessState)}
+SPEC_DEFAULTS = {f.name: f.default for f in fields(ProcessSpec)}
+STATE_DEFAULTS = {f.name: f.default for f in fields(ProcessState)}
+# Settings that belong to the group as a whole, not copied to its instances
+GROUP_FIELDS = ('min_instances', 'max_instances', 'scale_up', 'scale_down', 'scale_command',
+                'scale_cooldown', 'cron', 'interval', 'overlap', 'jitter')
+
+
+def _check(title: str, name: str, value, kind):
+    """Validate one field against its annotated type, return the stored value"""
+    if value is None:
+        return None
+    if kind is tuple:
+        if not isinstance(value, (list, tuple)) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"Process '{title}': '{name}' must be a list of strings")
+        return tuple(value)
+    if kind is float and isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if kind in (int, float) and isinstance(value, bool) or not isinstance(value, kind):
+        raise ValueError(f"Process '{title}': '{name}' must be {kind.__name__}, not {type(value).__name__}")
+    return value
+
+
+class ProcessRecord:
+    """A saved process: its immutable spec and its mutable runtime state"""
+    __slots__ = ('spec', 'state')
+
+    def __init__(self, spec: ProcessSpec, state: ProcessState = None):
+        self.spec = spec
+        self.state = state or ProcessState()
+
+    @classmethod
+    def from_dict(cls, title: str, data):
+        """Validate a record loaded from processes.yml"""
+        if not isinstance(data, dict):
+            raise ValueError(f"Process '{title}': expected a mapping, not {type(data).__name__}")
+        unknown = set(data) - set(SPEC_FIELDS) - set(STATE_FIELDS)
+        if unknown:
+            raise ValueError(f"Process '{title}': unknown field(s) {', '.join(sorted(map(str, unknown)))}")
+        for name in ('command', 'cwd'):
+            if not isinstance(data.get(name), str) or not data[name]:
+                raise ValueError(f"Process '{title}': '{name}' is required")
+
+        if isinstance(data.get('cpu_affinity'), list):
+            # Written as a list of CPUs in YAML
+            data = dict(data, cpu_affinity=','.join(str(cpu) for cpu in data['cpu_affinity']))
+        elif isinstance(data.get('cpu_affinity'), int) and not isinstance(data['cpu_affinity'], bool):
+            data = dict(data, cpu_affinity=str(data['cpu_affinity']))
+        spec = {name: _check(title, name, data[name], kind) for name, kind in SPEC_FIELDS.items() if name in data}
+        state = {name: _check(title, name, data[name], kind) for name, kind in STATE_FIELDS.items()
+                 if data.get(name) is not None}
+
+        if spec.get('overlap') is None:
+            spec.pop('overlap', None)
+        elif spec['overlap'] not in OVERLAP_POLICIES:
+            raise ValueError(f"Process '{title}': overlap must be one of {', '.join(OVERLAP_POLICIES)}")
+        if spec.get('cron') is not None:
+            try:
+                CronSchedule(spec['cron'])
+            except ValueError as e:
+                raise ValueError(f"Process '{title}': {str(e)}")
+        if spec.get('jitter') is None:
+            spec.pop('jitter', None)
+        for name in ('autorun', 'cgroup'):
+            spec[name] = bool(spec.get(name))
+        if spec.get('health') is not None:
+            health = spec['health']
+            if health.get('type') not in HEALTH_TYPES or not health.get('target'):
+                raise ValueError(f"Process '{title}': health needs a type ({', '.join(HEALTH_TYPES)}) and a target")
+        try:
+            validate_placement(**{name: spec.get(name) for name in ('cpu_affinity', 'numa_node', 'nice', 'ionice')})
+        except ValueError as e:
+            raise ValueError(f"Process '{title}': {str(e)}")
+        try:
+            validate_scaling(**{name: spec.get(name)
+                                for name in ('min_instances', 'max_instances', 'scale_up', 'scale_down')})
+        except ValueError as e:
+            raise ValueError(f"Process '{title}': {str(e)}")
+        try:
+            validate_log_metrics(spec.get('log_metrics'), spec.get('log_alerts') or ())
+        except ValueError as e:
+            raise ValueError(f"Process '{title}': {str(e)}")
+        for text in spec.get('sinks') or ():
+            try:
+                parse_sink(text)
+            except ValueError as e:
+                raise ValueError(f"Process '{title}': {str(e)}")
+        # Empty values take no space of their own
+        for name in ('watch', 'watch_ignore', 'listen', 'sinks', 'log_alerts', 'tags'):
+            spec[name] = spec.get(name) or ()
+        spec['env'] = {str(key): str(value) for key, value in spec['env'].items()} if spec.get('env') else None
+        spec['log_metrics'] = {str(name): pattern for name, pattern in spec['log_metrics'].items()} \
+            if spec.get('log_metrics') else None
+        return cls(ProcessSpec(**spec), ProcessState(**state))
+
+    def to_dict(self, compact: bool = True):
+        """The flat mapping stored in processes.yml, without the fields left at their defaults if ``compact``"""
+        data = {}
+        for name in SPEC_FIELDS:
+            value = getattr(self.spec, name)
+            if compact and value == SPEC_DEFAULTS[name]:
+                continue
+            # Copies, or records sharing a dict would be written as YAML aliases
+            data[name] = list(value) if isinstance(value, tuple) else dict(value) if isinstance(value, dict) else value
+        for name in STATE_FIELDS:
+            value = getattr(self.state, name)
+            if compact and value == STATE_DEFAULTS[name]:
+                continue
+            data[name] = value
+        return data
+
+    def instance_record(self, title: str, index: int):
+        """A new stopped instance ``index`` of this record's group ``title``"""
+        spec = self.spec.replace(group=title, instance=index,
+                                 **{name: SPEC_DEFAULTS[name] for name in GROUP_FIELDS})
+        return ProcessRecord(spec)
+
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+import ctypes
+import json
+import os
+import platform
+import shlex
+import sys
+import psutil
+
+NODE_DIR = '/sys/devices/system/node'
+IONICE_CLASSES = {'realtime': psutil.IOPRIO_CLASS_RT, 'best-effort': psutil.IOPRIO_CLASS_BE,
+                  'idle': psutil.IOPRIO_CLASS_IDLE} if hasattr(psutil, 'IOPRIO_CLASS_RT') else {}
+MPOL_BIND = 2
+# set_mempolicy has no wrapper in the standard library. Only architectures
+# whose number was checked against the kernel headers; elsewhere memory is
+# not bound and the placement warns.
+SET_MEMPOLICY = {'x86_64': 238, 'aarch64': 237}
+
+
+def parse_cpus(text: str):
+    """Parse a CPU list like ``0-3,8`` into a sorted tuple"""
+    cpus = set()
+    for part in str(text).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition('-')
+        if not first.isdigit() or sep and not last.isdigit():
+            raise ValueError(f"invalid CPU list '{text}', expected e.g. 0-3,8 or auto")
+        cpus.update(range(int(first), int(last or first) + 1))
+    if not cpus:
+        raise ValueError(f"invalid CPU list '{text}', expected e.g. 0-3,8 or auto")
+    return tuple(sorted(cpus))
+
+
+def format_cpus(cpus):
+    """The shortest CPU list for a set of CPUs, e.g. 0-3,8"""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def parse_ionice(text: str):
+    """Split ``class[:level]`` into (psutil class, level or None)"""
+    name, _, level = str(text).partition(':')
+    if name not in IONICE_CLASSES:
+        raise ValueError(f"unknown ionice class '{name}', use one of {', '.join(IONICE_CLASSES) or 'none here'}")
+    if name == 'idle' and level:
+        raise ValueError("the idle ionice class has no level")
+    if level and not (level.isdigit() and int(level) <= 7):
+        raise ValueError(f"ionice level must be 0-7, not '{level}'")
+    return IONICE_CLASSES[name], int(level) if level else None
+
+
+def _class_name(ioclass):
+    return next(name for name, value in IONICE_CLASSES.items() if value == ioclass)
+
+
+def node_cpus(node: int):
+    """The CPUs of a NUMA node, None if there is no such node"""
+    try:
+        with open(os.path.join(NODE_DIR, f'node{node}', 'cpulist'), 'r') as f:
+            return parse_cpus(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def validate(cpu_affinity: str = None, numa_node: int = None, nice: int = None, ionice: str = None):
+    """Raise ValueError if the placement settings can't be parsed"""
+    if cpu_affinity is not None and cpu_affinity != 'auto':
+        parse_cpus(cpu_affinity)
+    if nice is not None and not -20 <= nice <= 19:
+        raise ValueError("nice must be between -20 and 19")
+    if ionice is not None:
+        parse_ionice(ionice)
+    if numa_node is not None and numa_node < 0:
+        raise ValueError("numa_node must be 0 or more")
+
+
+def _mempolicy_call(node: int):
+    """A call binding memory to a node, None where set_mempolicy isn't known"""
+    number = SET_MEMPOLICY.get(platform.machine())
+    if number is None or node >= ctypes.sizeof(ctypes.c_ulong) * 8:
+        return None
+    mask = ctypes.c_ulong(1 << node)
+    syscall = ctypes.CDLL(None, use_errno=True).syscall
+    return lambda: syscall(number, MPOL_BIND, ctypes.byref(mask), ctypes.sizeof(mask) * 8 + 1)
+
+
+class Placement:
+    """Where and how eagerly a process runs: CPUs, NUMA node, nice and ionice.
+
+    Everything is worked out in the supervisor when the process is started,
+    and ``apply`` only makes the system calls, in the launcher the process
+    is started through (see ``launcher_command``): the settings are
+    inherited by the whole process tree. ``warnings`` lists what was left
+    out, e.g. a negative nice without the privilege for it.
+    """
+
+    def __init__(self, cpus=None, nice: int = None, ionice=None, node: int = None):
+        self.cpus = cpus      # CPUs to run on, None for all
+        self.nice = nice
+        self.ionice = ionice  # (psutil class, level or None)
+        self.node = node      # NUMA node to allocate memory from
+        self.warnings = []
+        self._bind_memory = None
+
+    def __bool__(self):
+        return any(value is not None for value in (self.cpus, self.nice, self.ionice, self.node))
+
+    @classmethod
+    def for_process(cls, spec, instances: int = 1):
+        """Resolve a spec's settings; ``auto`` gives each of ``instances`` its own share of the CPUs"""
+        placement = cls()
+        allowed = sorted(os.sched_getaffinity(0))
+        if spec.numa_node is not None:
+            cpus = node_cpus(spec.numa_node)
+            if cpus is None:
+                placement.warnings.append(f"no NUMA node {spec.numa_node}")
+            else:
+                allowed = [cpu for cpu in allowed if cpu in cpus] or allowed
+                placement.cpus = tuple(allowed)
+                placement.node = spec.numa_node
+                placement._bind_memory = _mempolicy_call(spec.numa_node)
+                if placement._bind_memory is None:
+                    placement.warnings.append(f"memory is not bound to NUMA node {spec.numa_node} on this machine")
+        if spec.cpu_affinity == 'auto':
+            instances = max(1, instances)
+            if instances > 1:
+                # Contiguous slices keep an instance's CPUs close together (same core, cache, node)
+                share = max(1, len(allowed) // instances)
+                first = (spec.instance or 0) * share % len(allowed)
+                placement.cpus = tuple(allowed[first:first + share])
+        elif spec.cpu_affinity is not None:
+            cpus = [cpu for cpu in parse_cpus(spec.cpu_affinity) if cpu in allowed]
+            if cpus:
+                placement.cpus = tuple(cpus)
+            else:
+                placement.warnings.append(f"none of CPUs {spec.cpu_affinity} is available")
+        if spec.nice is not None:
+            if spec.nice < os.nice(0) and os.geteuid() != 0:
+                placement.warnings.append(f"nice {spec.nice} needs root")
+            else:
+                placement.nice = spec.nice
+        if spec.ionice is not None:
+            ionice = parse_ionice(spec.ionice)
+            if ionice[0] == IONICE_CLASSES['realtime'] and os.geteuid() != 0:
+                placement.warnings.append("realtime ionice needs root")
+            else:
+                placement.ionice = ionice
+        return placement
+
+    def apply(self):
+        """Place the calling process, run by the launcher before it execs the command"""
+        # Failures are left to the warnings: the launcher has no one to report to
+        if self.cpus is not None:
+            try:
+                os.sched_setaffinity(0, self.cpus)
+            except OSError:
+                pass
+        if self._bind_memory is not None:
+            self._bind_memory()
+        if self.nice is not None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, 0, self.nice)
+            except OSError:
+                pass
+        if self.ionice is not None:
+            try:
+                psutil.Process().ionice(*self.ionice)
+            except (psutil.Error, OSError, ValueError):
+                pass
+
+    def describe(self):
+        parts = []
+        if self.cpus is not None:
+            parts.append(f"CPUs {format_cpus(self.cpus)}")
+        if self.node is not None:
+            parts.append(f"NUMA node {self.node}")
+        if self.nice is not None:
+            parts.append(f"nice {self.nice}")
+        if self.ionice is not None:
+            parts.append(f"ionice {_class_name(self.ionice[0])}" +
+                         (f":{self.ionice[1]}" if self.ionice[1] is not None else ''))
+        return ', '.join(parts)
+
+    def systemd_directives(self):
+        """The same placement as systemd [Service] settings"""
+        lines = []
+        if self.cpus is not None:
+            lines.append(f"CPUAffinity={format_cpus(self.cpus)}")
+        if self.node is not None:
+            lines.append(f"NUMAPolicy=bind\nNUMAMask={self.node}")
+        if self.nice is not None:
+            lines.append(f"Nice={self.nice}")
+        if self.ionice is not None:
+            lines.append(f"IOSchedulingClass={_class_name(self.ionice[0])}")
+            if self.ionice[1] is not None:
+                lines.append(f"IOSchedulingPriority={self.ionice[1]}")
+        return ''.join(line + '\n' for line in lines)
+
+
+def launcher_command(placement, command: str, cgroup: str = None):
+    """Wrap a command so it runs placed and in ``cgroup``, in the same PID.
+
+    Forking a multi-threaded supervisor and running Python between fork and
+    exec (a ``preexec_fn``) can deadlock the child on a lock another thread
+    held, so the system calls are made by a fresh interpreter instead.
+    """
+    settings = {'cgroup': cgroup, 'cpus': placement.cpus, 'node': placement.node,
+                'nice': placement.nice, 'ionice': placement.ionice}
+    return (f"{sys.executable} {shlex.quote(os.path.abspath(__file__))} "
+            f"{shlex.quote(json.dumps(settings))} {shlex.quote(command)}")
+
+
+def main(argv):
+    """Join the cgroup, apply the placement and exec the command in this PID"""
+    settings = json.loads(argv[1])
+    command = argv[2]
+    if settings['cgroup']:
+        from cgroups import CgroupManager
+        try:
+            CgroupManager.attach_self(settings['cgroup'])
+        except OSError as e:
+            print(f"pypm: running without cgroup {settings['cgroup']}: {e}", file=sys.stderr)
+    placement = Placement(cpus=settings['cpus'], nice=settings['nice'], node=settings['node'],
+                          ionice=tuple(settings['ionice']) if settings['ionice'] else None)
+    if placement.node is not None:
+        placement._bind_memory = _mempolicy_call(placement.node)
+    placement.apply()
+    os.execv('/bin/sh', ['sh', '-c', f"exec {command}"])
+
+
+if __name__ == "__main__":
+    main(sys.argv)
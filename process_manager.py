@@ -3,18 +3,43 @@ import sys
 import yaml
 import psutil
 import subprocess
+import threading
 import time
 from datetime import datetime
 from rich.console import Console
 from rich.table import Table
 from pathlib import Path
+from cgroups import CgroupManager
+from events import Event, EventType
+from sockets import SocketRegistry, launcher_command, systemd_address
+from environment import EnvFileCache, render, resolve_env_file
+from models import ProcessRecord, STATE_FIELDS
+from placement import Placement, format_cpus, launcher_command as placement_launcher
+# systemd target grouping all autorun units
+STARTUP_TARGET = 'pypm.target'
+# Unexpected exits kept per process
+CRASH_LIMIT = 20
+# libyaml parses and emits processes.yml several times faster, when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+# Spec fields that only take effect when the process is (re)started
+RESTART_FIELDS = ('command', 'cwd', 'env', 'env_file', 'listen', 'cgroup',
+                  'cpu_affinity', 'numa_node', 'nice', 'ionice')
+
 
 class ProcessManager:
-    def __init__(self):
+    def __init__(self, config_dir: str = None):
         self.home_dir = str(Path.home())
-        self.config_dir = os.path.join(self.home_dir, '.pyprocessmanager')
+        self.config_dir = config_dir or os.path.join(self.home_dir, '.pyprocessmanager')
         self.processes_file = os.path.join(self.config_dir, 'processes.yml')
-        self.processes = {}
+        self.processes = {}  # title -> ProcessRecord
+        self._snapshot = None
+        self.saved_mtime = None  # mtime (ns) of our own last write of processes.yml
+        self._cgroups = None
+        self._lock = threading.RLock()
+        self.events = None  # EventBus, set by the daemon
+        self.listeners = SocketRegistry()
+        self.env_files = EnvFileCache()
         self._init_config()
         self.console = Console()
 
@@ -29,26 +54,188 @@ class ProcessManager:
 
     def _save_processes(self):
         """Save processes to YAML file"""
-        with open(self.processes_file, 'w') as f:
-            yaml.dump(self.processes, f)
+        with self._lock:
+            self._snapshot = None
+            # Write a temporary file and rename it, so a reader never sees half a file
+            temp_file = f"{self.processes_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w') as f:
+                yaml.dump({title: record.to_dict() for title, record in self.processes.items()}, f, Dumper=YAML_DUMPER)
+            os.replace(temp_file, self.processes_file)
+            self.saved_mtime = os.stat(self.processes_file).st_mtime_ns
 
     def _load_processes(self):
-        """Load processes from YAML file"""
-        if os.path.exists(self.processes_file):
+        """Load processes from YAML file, raising ValueError if a record is invalid"""
+        if not os.path.exists(self.processes_file):
+            return
+        # Held throughout, so a concurrent save can't be undone by a stale read
+        with self._lock:
             with open(self.processes_file, 'r') as f:
-                self.processes = yaml.safe_load(f) or {}
+                data = yaml.load(f, Loader=YAML_LOADER) or {}
+            if not isinstance(data, dict):
+                raise ValueError(f"{self.processes_file}: expected a mapping of titles to processes")
+            # Validate everything before touching the current records
+            records = {str(title): ProcessRecord.from_dict(str(title), info) for title, info in data.items()}
+            for title, record in records.items():
+                current = self.processes.get(title)
+                if current is None:
+                    continue
+                # Update the records in place: a start or stop in progress holds them and saves what it sets
+                if current.spec != record.spec:
+                    current.spec = record.spec
+                for name in STATE_FIELDS:
+                    setattr(current.state, name, getattr(record.state, name))
+                records[title] = current
+            self.processes = records
+            self._snapshot = None
+
+    def snapshot(self):
+        """The current (title, record) pairs as a tuple, rebuilt only after records were saved or loaded.
+
+        Frontends iterate this on every refresh instead of copying each
+        record: the records themselves are shared, so reading a row costs
+        no allocation.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshot = tuple(self.processes.items())
+        return snapshot
+
+    @property
+    def cgroups(self):
+        """Lazily probe cgroup v2 support, only processes that ask for it pay for it"""
+        if self._cgroups is None:
+            self._cgroups = CgroupManager()
+        return self._cgroups
+
+    def _uses_cgroup(self, info):
+        """Check whether a process runs in its own cgroup"""
+        return info.spec.cgroup and self.cgroups.available
+
+    def _emit(self, event_type: str, title: str, pid: int = None, **data):
+        """Publish a lifecycle event if an event bus is attached"""
+        if self.events is not None:
+            self.events.publish(Event(event_type, title, pid, data=data))
+
+    def _prepare_command(self, command: str):
+        """Use this interpreter for python commands and expand the home directory"""
+        if command.startswith('python ') or command.startswith('python3 '):
+            # Remove python/python3 prefix and use sys.executable
+            command = command.replace('python3 ', '').replace('python ', '')
+            command = f"{sys.executable} {command}"
+
+        # Expand home directory if needed
+        if '~' in command:
+            command = command.replace('~', os.path.expanduser('~'))
+        return command
+
+    def _listen_command(self, info, command: str):
+        """Hand the process its pre-bound listening sockets, return the command and fds to pass"""
+        if not info.spec.listen:
+            return command, ()
+        fds = tuple(self.listeners.fds(info.spec.listen))
+        return launcher_command(fds, command), fds
+
+    def _process_env(self, title: str, info):
+        """The child's own variables, from env_file and env, with instance templates filled in"""
+        spec = info.spec
+        group = spec.group or title
+        instance = spec.instance or 0
+        env = {'PYPM_TITLE': title, 'PYPM_GROUP': group, 'PYPM_INSTANCE': str(instance)}
+        if spec.env_file:
+            env.update(self.env_files.load(resolve_env_file(spec)))
+        env.update(spec.env or {})
+        return {key: render(value, title, group, instance) for key, value in env.items()}
+
+    def _environment(self, title: str, info):
+        """Full environment for a child process"""
+        env = dict(os.environ)
+        env.update(self._process_env(title, info))
+        return env
+
+    def _log_paths(self, title: str):
+        """Return the stdout and stderr log files for a process"""
+        log_dir = os.path.join(self.config_dir, 'logs')
+        os.makedirs(log_dir, exist_ok=True)
+        return os.path.join(log_dir, f"{title}.out"), os.path.join(log_dir, f"{title}.err")
 
-    def save(self, title: str, command: str, cwd: str = None, autorun: bool = False):
+    def _placement(self, title: str, info):
+        """CPUs, NUMA node, nice and ionice of a process, ``auto`` CPUs shared out over its group"""
+        group = self.processes.get(info.spec.group or title)
+        return Placement.for_process(info.spec, instances=group.state.instances if group else 1)
+
+    def _launch_command(self, title: str, info, command: str):
+        """Wrap a command in the launcher that joins the cgroup and applies the placement, if it needs either"""
+        cgroup_path = None
+        if info.spec.cgroup and not self.cgroups.available:
+            self.console.print(f"[yellow]cgroup v2 is not available, starting '{title}' without a cgroup[/yellow]")
+        elif info.spec.cgroup:
+            cgroup_path = self.cgroups.create(title)
+        placement = self._placement(title, info)
+        for warning in placement.warnings:
+            self.console.print(f"[yellow]'{title}': {warning}, ignored[/yellow]")
+        if not placement and not cgroup_path:
+            return command
+        return placement_launcher(placement, command, cgroup_path)
+
+    def save(self, title: str, command: str, cwd: str = None, autorun: bool = False, cgroup: bool = False,
+             cron: str = None, interval: float = None, overlap: str = 'skip', jitter: float = 0,
+             min_instances: int = None, max_instances: int = None, scale_up: float = None,
+             scale_down: float = None, scale_command: str = None, scale_cooldown: float = None,
+             watch: list = None, watch_ignore: list = None,
+             on_start: str = None, on_crash: str = None, post_stop: str = None, on_alert: str = None,
+             listen: list = None,
+             health: dict = None, env: dict = None, env_file: str = None, sinks: list = None,
+             log_metrics: dict = None, log_alerts: list = None, cpu_affinity: str = None, numa_node: int = None, nice: int = None, ionice: str = None,
+             namespace: str = None, tags: list = None):
         """Save a new command with title"""
-        self.processes[title] = {
+        record = ProcessRecord.from_dict(title, {
             'command': command,
             'cwd': cwd or os.getcwd(),
             'autorun': autorun,
-            'pid': None,
-            'status': 'stopped'
-        }
-        self._save_processes()
+            'cgroup': cgroup,
+            'cron': cron,
+            'interval': interval,
+            'overlap': overlap,
+            'jitter': jitter,
+            'instances': min_instances or 1,
+            'min_instances': min_instances,
+            'max_instances': max_instances,
+            'scale_up': scale_up,
+            'scale_down': scale_down,
+            'scale_command': scale_command,
+            'scale_cooldown': scale_cooldown,
+            'watch': list(watch or []),
+            'watch_ignore': list(watch_ignore or []),
+            'on_start': on_start,
+            'on_crash': on_crash,
+            'post_stop': post_stop,
+            'on_alert': on_alert,
+            'listen': list(listen or []),
+            'health': health,
+            'env': dict(env or {}),
+            'env_file': env_file,
+            'sinks': list(sinks or []),
+            'log_metrics': dict(log_metrics or {}),
+            'log_alerts': list(log_alerts or []),
+            'cpu_affinity': cpu_affinity,
+            'numa_node': numa_node,
+            'nice': nice,
+            'ionice': ionice,
+            'namespace': namespace,
+            'tags': list(tags or []),
+        })
+        with self._lock:
+            current = self.processes.get(title)
+            if current is not None:
+                # Keep the pid and status, the process may be running
+                record.state = current.state
+            self.processes[title] = record
+            self._save_processes()
         self.console.print(f"[green]Saved command '{title}' successfully![/green]")
+        if current is not None and current.state.pid and any(
+                getattr(current.spec, name) != getattr(record.spec, name) for name in RESTART_FIELDS):
+            self.console.print(f"[yellow]'{title}' is running, restart it to apply the changes[/yellow]")
 
     def start(self, title: str):
         """Start a saved process"""
@@ -59,28 +246,17 @@ class ProcessManager:
         process_info = self.processes[title]
         try:
             # First stop any existing process
-            if process_info['pid']:
+            if process_info.state.pid:
                 self.stop(title)
                 time.sleep(1)  # Give it time to stop
 
             # Prepare the command
-            command = process_info['command']
-            if command.startswith('python ') or command.startswith('python3 '):
-                # Remove python/python3 prefix and use sys.executable
-                command = command.replace('python3 ', '').replace('python ', '')
-                command = f"{sys.executable} {command}"
-
-            # Expand home directory if needed
-            if '~' in command:
-                command = command.replace('~', os.path.expanduser('~'))
-
-            # Create log directory
-            log_dir = os.path.join(self.config_dir, 'logs')
-            os.makedirs(log_dir, exist_ok=True)
-            
+            command = self._prepare_command(process_info.spec.command)
+            command, pass_fds = self._listen_command(process_info, command)
+            command = self._launch_command(title, process_info, command)
+
             # Setup log files
-            stdout_log = os.path.join(log_dir, f"{title}.out")
-            stderr_log = os.path.join(log_dir, f"{title}.err")
+            stdout_log, stderr_log = self._log_paths(title)
             
             # Create the command with proper output redirection
             full_command = f"nohup {command} > {stdout_log} 2> {stderr_log} & echo $!"
@@ -91,9 +267,11 @@ class ProcessManager:
                 shell=True,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                cwd=process_info['cwd'],
+                cwd=process_info.spec.cwd,
                 text=True,
-                preexec_fn=os.setsid  # Create new process group
+                env=self._environment(title, process_info),
+                pass_fds=pass_fds,
+                start_new_session=True  # Create new process group
             )
             
             # Get the PID from the output
@@ -104,10 +282,17 @@ class ProcessManager:
                 time.sleep(0.5)
                 try:
                     if psutil.Process(pid).is_running():
-                        self.processes[title]['pid'] = pid
-                        self.processes[title]['status'] = 'running'
-                        self._save_processes()
+                        with self._lock:
+                            # The records may have been reloaded while the process started
+                            process_info = self.processes.get(title, process_info)
+                            process_info.state.pid = pid
+                            process_info.state.status = 'running'
+                            if process_info.state.started is not None:
+                                process_info.state.restarts += 1
+                            process_info.state.started = time.time()
+                            self._save_processes()
                         self.console.print(f"[green]Started process '{title}' with PID {pid}[/green]")
+                        self._emit(EventType.START, title, pid)
                     else:
                         self.console.print(f"[red]Process '{title}' failed to start properly[/red]")
                 except psutil.NoSuchProcess:
@@ -118,6 +303,83 @@ class ProcessManager:
         except Exception as e:
             self.console.print(f"[red]Error starting process '{title}': {str(e)}[/red]")
 
+    def instances(self, title: str):
+        """Return the titles of all instances of a process, the first one being ``title``"""
+        others = sorted(
+            (info.spec.instance, name) for name, info in self.processes.items()
+            if info.spec.group == title
+        )
+        return [title] + [name for _, name in others]
+
+    def scale(self, title: str, count: int):
+        """Run ``count`` instances of a process, named ``title``, ``title:1``, ``title:2``..."""
+        if title not in self.processes:
+            self.console.print(f"[red]No process found with title '{title}'[/red]")
+            return
+
+        base = self.processes[title]
+        count = max(1, count)
+        current = self.instances(title)
+
+        # Remove the newest instances first
+        for name in current[count:]:
+            if self.processes[name].state.pid:
+                self.stop(name)
+            with self._lock:
+                del self.processes[name]
+                self._snapshot = None
+
+        added = []
+        with self._lock:
+            for index in range(len(current), count):
+                name = f"{title}:{index}"
+                self.processes[name] = base.instance_record(title, index)
+                added.append(name)
+            base.state.instances = count
+            self._save_processes()
+
+        # New instances only start if the group is running
+        if base.state.status == 'running':
+            for name in added:
+                self.start(name)
+        self.console.print(f"[green]Scaled '{title}' to {count} instances[/green]")
+
+    def spawn(self, title: str):
+        """Start a run as our own child so the caller can wait for its exit code"""
+        if title not in self.processes:
+            self.console.print(f"[red]No process found with title '{title}'[/red]")
+            return None
+
+        process_info = self.processes[title]
+        stdout_log, stderr_log = self._log_paths(title)
+        try:
+            command, pass_fds = self._listen_command(process_info, self._prepare_command(process_info.spec.command))
+            command = self._launch_command(title, process_info, command)
+            with open(stdout_log, 'a') as stdout, open(stderr_log, 'a') as stderr:
+                process = subprocess.Popen(
+                    command,
+                    shell=True,
+                    stdout=stdout,
+                    stderr=stderr,
+                    cwd=process_info.spec.cwd,
+                    env=self._environment(title, process_info),
+                    pass_fds=pass_fds,
+                    start_new_session=True
+                )
+        except Exception as e:
+            self.console.print(f"[red]Error starting process '{title}': {str(e)}[/red]")
+            return None
+
+        with self._lock:
+            process_info = self.processes.get(title, process_info)
+            process_info.state.pid = process.pid
+            process_info.state.status = 'running'
+            process_info.state.started = time.time()
+            self._save_processes()
+        self.console.print(f"[green]Started run of '{title}' with PID {process.pid}[/green]")
+        self._emit(EventType.START, title, process.pid, scheduled=True)
+        return process
+
     def stop(self, title: str):
         """Stop a running process"""
         if title not in self.processes:
@@ -125,17 +387,22 @@ class ProcessManager:
             return
 
         process_info = self.processes[title]
-        if process_info['pid']:
+        state = process_info.state
+        if state.pid:
             try:
+                # A cgroup holds the whole tree, including escaped grandchildren
+                if self._uses_cgroup(process_info):
+                    self.cgroups.kill(title)
+
                 # Try to kill the process group
                 try:
-                    os.killpg(process_info['pid'], 9)
+                    os.killpg(state.pid, 9)
                 except:
                     pass
 
                 # Fallback: try to kill process and children individually
                 try:
-                    parent = psutil.Process(process_info['pid'])
+                    parent = psutil.Process(state.pid)
                     children = parent.children(recursive=True)
                     for child in children:
                         try:
@@ -145,20 +412,72 @@ class ProcessManager:
                     parent.kill()
                 except:
                     pass
+
+                if self._uses_cgroup(process_info):
+                    self.cgroups.remove(title)
                 
-                self.processes[title]['pid'] = None
-                self.processes[title]['status'] = 'stopped'
-                self._save_processes()
+                pid = state.pid
+                with self._lock:
+                    state.pid = None
+                    state.status = 'stopped'
+                    self._save_processes()
                 self.console.print(f"[green]Stopped process '{title}'[/green]")
+                self._emit(EventType.STOP, title, pid)
             except Exception as e:
                 self.console.print(f"[red]Error stopping process '{title}': {str(e)}[/red]")
                 # Still mark as stopped since we tried our best
-                self.processes[title]['pid'] = None
-                self.processes[title]['status'] = 'stopped'
-                self._save_processes()
+                with self._lock:
+                    state.pid = None
+                    state.status = 'stopped'
+                    self._save_processes()
         else:
             self.console.print(f"[yellow]Process '{title}' is not running[/yellow]")
 
+    def restart(self, title: str):
+        """Restart a process, starting it if it is not running"""
+        if title not in self.processes:
+            self.console.print(f"[red]No process found with title '{title}'[/red]")
+            return
+        # start() stops the old process first
+        self.start(title)
+        self._emit(EventType.RESTART, title, self.processes[title].state.pid)
+
+    def _record_crash(self, state, exit_code: int = None, signal: str = None, peak_rss: int = None, stderr=None):
+        """Append an unexpected exit to the process's bounded crash history"""
+        crash = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'pid': state.pid,
+            'exit_code': exit_code,
+            'signal': signal,
+            'uptime': round(time.time() - state.started, 1) if state.started else None,
+            'peak_rss': peak_rss,
+            'stderr': list(stderr or []),
+        }
+        if state.crashes is None:
+            state.crashes = []
+        state.crashes.append(crash)
+        del state.crashes[:-CRASH_LIMIT]
+        return crash
+
+    def mark_exited(self, title: str, exit_code: int = None, signal: str = None, peak_rss: int = None, stderr=None):
+        """Record that a process died without being stopped through pypm
+
+        The exit code or signal is only known when the caller reaped the
+        process (the daemon is the children's subreaper).
+        """
+        with self._lock:
+            info = self.processes.get(title)
+            if not info or not info.state.pid:
+                return
+            pid = info.state.pid
+            self._record_crash(info.state, exit_code, signal, peak_rss, stderr)
+            info.state.pid = None
+            info.state.status = 'stopped'
+            self._save_processes()
+        reason = f"killed by {signal}" if signal else f"exit code {exit_code}" if exit_code is not None else "unknown status"
+        self.console.print(f"[red]Process '{title}' (PID {pid}) exited unexpectedly ({reason})[/red]")
+        self._emit(EventType.CRASH, title, pid, exit_code=exit_code, signal=signal)
+
     def is_process_running(self, pid):
         """Check if a process is actually running"""
         if not pid:
@@ -169,94 +488,374 @@ class ProcessManager:
         except:
             return False
 
-    def list(self):
-        """List all saved processes and their status"""
+    def list(self, tree: bool = False, titles=None, live: bool = False, memory=None):
+        """List all saved processes (or ``titles``) and their status, with usage summed over each process tree if ``tree``
+
+        PSS and USS come from ``memory`` (a MemoryPoller) when given; only
+        ``live`` reads every process's smaps right away.
+        """
+        processes = [(title, info) for title, info in self.snapshot() if titles is None or title in titles]
+        usage = {}
+        if tree:
+            from proctree import TreeStats
+            stats = TreeStats()
+            roots = {title: info.state.pid for title, info in processes if info.state.pid}
+            stats.collect(roots)
+            time.sleep(0.1)  # One CPU measurement window for all trees
+            usage = stats.collect(roots, full=True)
+
         table = Table(show_header=True, header_style="bold magenta")
         table.add_column("Title")
         table.add_column("Command")
         table.add_column("Status")
+        table.add_column("Health")
         table.add_column("PID")
         table.add_column("Auto-run")
         table.add_column("CPU %")
         table.add_column("MEM MB")
+        table.add_column("PSS MB")
+        table.add_column("USS MB")
 
-        for title, info in self.processes.items():
+        changed = False
+        for title, info in processes:
+            spec, state = info.spec, info.state
             # Verify process status
-            if info['pid'] and not self.is_process_running(info['pid']):
-                info['status'] = 'stopped'
-                info['pid'] = None
-                self._save_processes()
+            if state.pid and not self.is_process_running(state.pid):
+                # Not our child, so the exit status is unknown
+                self._record_crash(state)
+                state.status = 'stopped'
+                state.pid = None
+                changed = True
 
             # Get resource usage
             cpu_usage = "N/A"
             mem_usage = "N/A"
-            if info['pid'] and info['status'] == 'running':
+            pss_usage = "N/A"
+            uss_usage = "N/A"
+            tree_usage = usage.get(title) if state.pid else None
+            if tree_usage and tree_usage['nodes']:
+                cpu_usage = f"{tree_usage['cpu']:.1f}%"
+                mem_usage = f"{tree_usage['rss'] / 1024 / 1024:.1f}"
+                pss_usage = f"{tree_usage['pss'] / 1024 / 1024:.1f}"
+                uss_usage = f"{tree_usage['uss'] / 1024 / 1024:.1f}"
+            elif state.pid and state.status == 'running':
                 try:
-                    process = psutil.Process(info['pid'])
-                    cpu_usage = f"{process.cpu_percent(interval=0.1):.1f}%"
-                    mem_usage = f"{process.memory_info().rss / 1024 / 1024:.1f}"
+                    process = psutil.Process(state.pid)
+                    if self._uses_cgroup(info):
+                        # Exact usage of the whole group in constant time
+                        cpu_usage = f"{self.cgroups.cpu_percent(title):.1f}%"
+                        mem_usage = f"{self.cgroups.stats(title)['memory'] / 1024 / 1024:.1f}"
+                    else:
+                        cpu_usage = f"{process.cpu_percent(interval=0.1):.1f}%"
+                        mem_usage = f"{process.memory_info().rss / 1024 / 1024:.1f}"
+                    if live:
+                        # Parsing smaps is slow, only when asked to measure everything now
+                        full = process.memory_full_info()
+                        pss, uss = getattr(full, 'pss', full.uss), full.uss
+                    else:
+                        measured = memory.get(state.pid) if memory is not None else None
+                        pss, uss = (measured['pss'], measured['uss']) if measured else (None, None)
+                    if uss is not None:
+                        pss_usage = f"{pss / 1024 / 1024:.1f}"
+                        uss_usage = f"{uss / 1024 / 1024:.1f}"
                 except:
                     pass
 
-            status_color = "green" if info['status'] == 'running' else "red"
-            table.add_row(
+            # Health is reported by the daemon's probes
+            health = '-'
+            if state.status == 'running' and state.health_status:
+                health_color = "green" if state.health_status == 'healthy' else "red"
+                health = f"[{health_color}]{state.health_status}[/{health_color}]"
+
+            status_color = "green" if state.status == 'running' else "red"
+            row = [
                 title,
-                info['command'],
-                f"[{status_color}]{info['status']}[/{status_color}]",
-                str(info['pid'] or ''),
-                '✓' if info['autorun'] else '✗',
+                spec.command,
+                f"[{status_color}]{state.status}[/{status_color}]",
+                health,
+                str(state.pid or ''),
+                '✓' if spec.autorun else '✗',
                 cpu_usage,
-                mem_usage
+                mem_usage,
+                pss_usage,
+                uss_usage
+            ]
+            table.add_row(*row)
+            if tree_usage:
+                # The descendants, indented by depth
+                for pid, depth, name, cpu, rss in tree_usage['nodes'][1:]:
+                    table.add_row(f"[dim]{'  ' * depth}└ {name}[/dim]", '', '', '', str(pid), '',
+                                  f"[dim]{cpu:.1f}%[/dim]", f"[dim]{rss / 1024 / 1024:.1f}[/dim]", '', '')
+
+        # One write for all the processes found dead
+        if changed:
+            self._save_processes()
+        self.console.print(table)
+
+    def list_published(self, published, titles=None):
+        """List processes from the daemon's published snapshot: no psutil calls and nothing to verify"""
+        samples = published['samples']
+        table = Table(show_header=True, header_style="bold magenta")
+        for column in ("Title", "Command", "Status", "Health", "PID", "Auto-run", "CPU %", "MEM MB", "PSS MB", "USS MB"):
+            table.add_column(column)
+        for title, state in published['processes'].items():
+            if titles is not None and title not in titles:
+                continue
+            sample = samples.get(title) if state['status'] == 'running' else None
+            health = '-'
+            if state['status'] == 'running' and state['health_status']:
+                health_color = "green" if state['health_status'] == 'healthy' else "red"
+                health = f"[{health_color}]{state['health_status']}[/{health_color}]"
+            status_color = "green" if state['status'] == 'running' else "red"
+            megabytes = lambda name: (f"{sample[name] / 1024 / 1024:.1f}"
+                                      if sample and sample.get(name) is not None else "N/A")
+            table.add_row(
+                title,
+                state['command'],
+                f"[{status_color}]{state['status']}[/{status_color}]",
+                health,
+                str(state['pid'] or ''),
+                '✓' if state['autorun'] else '✗',
+                f"{sample['cpu']:.1f}%" if sample else "N/A",
+                megabytes('rss'),
+                megabytes('pss'),
+                megabytes('uss'),
             )
+        self.console.print(table)
+
+    def history(self, title: str):
+        """Show recent scheduled runs of a process"""
+        if title not in self.processes:
+            self.console.print(f"[red]No process found with title '{title}'[/red]")
+            return
+
+        history = self.processes[title].state.history or []
+        if not history:
+            self.console.print(f"[yellow]No runs recorded for '{title}'[/yellow]")
+            return
+
+        table = Table(show_header=True, header_style="bold magenta")
+        table.add_column("Started")
+        table.add_column("Duration")
+        table.add_column("Exit Code")
+        for run in reversed(history):
+            color = "green" if run['exit_code'] == 0 else "red"
+            table.add_row(run['started'], f"{run['duration']:.1f}s", f"[{color}]{run['exit_code']}[/{color}]")
+        self.console.print(table)
+
+    def describe(self, title: str):
+        """Show a process's settings, state and crash history"""
+        if title not in self.processes:
+            self.console.print(f"[red]No process found with title '{title}'[/red]")
+            return
+
+        spec, state = self.processes[title].spec, self.processes[title].state
+        running = bool(state.pid) and self.is_process_running(state.pid)
+        details = Table(show_header=False, box=None)
+        details.add_column(style="bold")
+        details.add_column()
+        details.add_row("Title", title)
+        details.add_row("Command", spec.command)
+        details.add_row("Directory", spec.cwd)
+        status_color = "green" if running else "red"
+        details.add_row("Status", f"[{status_color}]{'running' if running else 'stopped'}[/{status_color}]")
+        if running:
+            details.add_row("PID", str(state.pid))
+            if state.started:
+                details.add_row("Uptime", f"{time.time() - state.started:.0f}s")
+        if spec.group:
+            details.add_row("Group", f"{spec.group} (instance {spec.instance})")
+        elif state.instances > 1:
+            details.add_row("Instances", str(state.instances))
+        details.add_row("Auto-run", '✓' if spec.autorun else '✗')
+        placement = self._placement(title, self.processes[title])
+        if placement or placement.warnings:
+            details.add_row("Placement", '\n'.join(filter(None, (
+                placement.describe(),
+                *(f"[yellow]{warning}, ignored[/yellow]" for warning in placement.warnings)))))
+        if running and placement:
+            try:
+                process = psutil.Process(state.pid)
+                details.add_row("Running on", f"CPUs {format_cpus(process.cpu_affinity())}, nice {process.nice()}")
+            except (psutil.Error, AttributeError):
+                pass
+        if spec.namespace:
+            details.add_row("Namespace", spec.namespace)
+        if spec.tags:
+            details.add_row("Tags", ', '.join(spec.tags))
+        if spec.sinks:
+            details.add_row("Sinks", '\n'.join(spec.sinks))
+        if spec.log_metrics:
+            details.add_row("Log metrics", '\n'.join(f"{name}: {pattern}" for name, pattern in spec.log_metrics.items()))
+        if spec.log_alerts:
+            details.add_row("Log alerts", '\n'.join(spec.log_alerts))
+        details.add_row("Restarts", str(state.restarts))
+        details.add_row("Crashes", str(len(state.crashes or [])))
+        self.console.print(details)
 
+        crashes = state.crashes or []
+        if not crashes:
+            return
+        table = Table(show_header=True, header_style="bold magenta", title="Crash history")
+        table.add_column("Time")
+        table.add_column("PID")
+        table.add_column("Exit")
+        table.add_column("Uptime")
+        table.add_column("Peak RSS MB")
+        for crash in reversed(crashes):
+            exit_status = crash['signal'] or (str(crash['exit_code']) if crash['exit_code'] is not None else '?')
+            table.add_row(
+                crash['time'],
+                str(crash['pid'] or ''),
+                f"[red]{exit_status}[/red]",
+                f"{crash['uptime']:.1f}s" if crash['uptime'] is not None else '?',
+                f"{crash['peak_rss'] / 1024 / 1024:.1f}" if crash['peak_rss'] else '?',
+            )
         self.console.print(table)
 
+        last = crashes[-1]
+        if last['stderr']:
+            self.console.print(f"[bold]Last stderr lines before the crash at {last['time']}:[/bold]")
+            for line in last['stderr']:
+                self.console.print(line, markup=False, highlight=False)
+
+    def _socket_unit_content(self, title: str, info):
+        """Render the systemd socket unit that activates a process's service"""
+        listen = '\n'.join(f"ListenStream={systemd_address(address)}" for address in info.spec.listen)
+        return f"""[Unit]
+Description=PyProcessManager - {title} sockets
+PartOf={STARTUP_TARGET}
+
+[Socket]
+{listen}
+
+[Install]
+WantedBy=sockets.target {STARTUP_TARGET}
+"""
+
+    def _unit_content(self, title: str, info):
+        """Render the systemd user service for a process"""
+        stdout_log, stderr_log = self._log_paths(title)
+        # systemd passes the sockets itself with LISTEN_FDS
+        sockets = f"Requires=pypm-{title}.socket\nAfter=pypm-{title}.socket\n" if info.spec.listen else ""
+        # The environment pypm start would build, env over env_file and instances rendered; % starts a specifier
+        environment = f"EnvironmentFile={self._unit_env_path(title).replace('%', '%%')}\n"
+        return f"""[Unit]
+Description=PyProcessManager - {title}
+After=network.target
+{sockets}PartOf={STARTUP_TARGET}
+
+[Service]
+Type=simple
+WorkingDirectory={info.spec.cwd}
+ExecStart={self._prepare_command(info.spec.command)}
+{environment}{self._placement(title, info).systemd_directives()}Restart=always
+StandardOutput=append:{stdout_log}
+StandardError=append:{stderr_log}
+
+[Install]
+WantedBy={STARTUP_TARGET}
+"""
+
+    def _unit_env_path(self, title: str):
+        return os.path.join(self.config_dir, 'units', f"pypm-{title}.env")
+
+    def _unit_env_content(self, title: str, info):
+        """The process's variables in systemd's EnvironmentFile syntax"""
+        lines = []
+        for key, value in self._process_env(title, info).items():
+            for char in '\\"$`':
+                value = value.replace(char, '\\' + char)
+            lines.append(f'{key}="{value}"\n')
+        return ''.join(lines)
+
+    def _systemctl(self, *args):
+        """Run one systemctl --user command, reporting failures"""
+        try:
+            subprocess.run(['systemctl', '--user', *args], check=True)
+            return True
+        except Exception as e:
+            self.console.print(f"[red]systemctl {args[0]} failed: {str(e)}[/red]")
+            return False
+
+    def _write_if_changed(self, path: str, content: str, mode: int = 0o644):
+        """Write a file only if its content differs, return whether it changed"""
+        try:
+            with open(path, 'r') as f:
+                if f.read() == content:
+                    return False
+        except OSError:
+            pass
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        # An existing file keeps its mode on open
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        return True
+
     def setup_startup(self):
-        """Setup autostart processes using systemd user services"""
+        """Setup autostart processes using systemd user services
+
+        Only units whose content changed are rewritten, units of processes
+        that were deleted or lost autorun are removed, and systemd is
+        reloaded once with one batched enable and restart for the affected
+        units. All units are grouped under pypm.target.
+        """
         # Create systemd user directory if it doesn't exist
         systemd_dir = os.path.expanduser("~/.config/systemd/user")
         os.makedirs(systemd_dir, exist_ok=True)
-        
-        # Create logs directory
-        log_dir = os.path.join(self.config_dir, 'logs')
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # Create service files for each autorun process
+
+        wanted = {}
         for title, info in self.processes.items():
-            if info['autorun']:
-                service_path = os.path.join(systemd_dir, f"pypm-{title}.service")
-                command = info['command']
-                if command.startswith('python ') or command.startswith('python3 '):
-                    command = command.replace('python3 ', '').replace('python ', '')
-                    command = f"{sys.executable} {command}"
-                
-                service_content = f"""[Unit]
-Description=PyProcessManager - {title}
-After=network.target
+            if info.spec.autorun:
+                # Socket units come first so they are (re)started before their services
+                if info.spec.listen:
+                    wanted[f"pypm-{title}.socket"] = self._socket_unit_content(title, info)
+                wanted[f"pypm-{title}.service"] = self._unit_content(title, info)
+        changed = [unit for unit, content in wanted.items()
+                   if self._write_if_changed(os.path.join(systemd_dir, unit), content)]
+        stale = [name for name in os.listdir(systemd_dir)
+                 if name.startswith('pypm-') and name.endswith(('.service', '.socket')) and name not in wanted]
 
-[Service]
-Type=simple
-WorkingDirectory={info['cwd']}
-ExecStart={command}
-Restart=always
-StandardOutput=append:{os.path.join(self.config_dir, 'logs', f"{title}.out")}
-StandardError=append:{os.path.join(self.config_dir, 'logs', f"{title}.err")}
+        # The environments may hold secrets, only the user can read them
+        env_dir = os.path.dirname(self._unit_env_path(''))
+        os.makedirs(env_dir, mode=0o700, exist_ok=True)
+        env_files = {os.path.basename(self._unit_env_path(title)): title
+                     for title, info in self.processes.items() if info.spec.autorun}
+        for name, title in env_files.items():
+            content = self._unit_env_content(title, self.processes[title])
+            if (self._write_if_changed(os.path.join(env_dir, name), content, mode=0o600)
+                    and f"pypm-{title}.service" not in changed):
+                changed.append(f"pypm-{title}.service")
+        for name in os.listdir(env_dir):
+            if name.endswith('.env') and name not in env_files:
+                os.remove(os.path.join(env_dir, name))
+
+        target_changed = self._write_if_changed(os.path.join(systemd_dir, STARTUP_TARGET), f"""[Unit]
+Description=PyProcessManager - all autorun processes
 
 [Install]
 WantedBy=default.target
-"""
-                
-                with open(service_path, 'w') as f:
-                    f.write(service_content)
-                
-                try:
-                    # Enable and start the service
-                    subprocess.run(['systemctl', '--user', 'daemon-reload'], check=True)
-                    subprocess.run(['systemctl', '--user', 'enable', f"pypm-{title}.service"], check=True)
-                    subprocess.run(['systemctl', '--user', 'restart', f"pypm-{title}.service"], check=True)
-                    self.console.print(f"[green]Setup autostart for '{title}'[/green]")
-                except Exception as e:
-                    self.console.print(f"[red]Error setting up autostart for '{title}': {str(e)}[/red]")
+""")
+
+        if not changed and not stale and not target_changed:
+            self.console.print("[green]Autostart units are up to date[/green]")
+            return
+
+        if stale:
+            self._systemctl('disable', '--now', *stale)
+            for name in stale:
+                os.remove(os.path.join(systemd_dir, name))
+                self.console.print(f"[yellow]Removed autostart unit {name}[/yellow]")
+
+        self._systemctl('daemon-reload')
+        if target_changed:
+            self._systemctl('enable', STARTUP_TARGET)
+        if changed:
+            # reenable also moves units installed before pypm.target existed
+            if self._systemctl('reenable', *changed) and self._systemctl('restart', *changed):
+                for unit in changed:
+                    self.console.print(f"[green]Setup autostart unit {unit}[/green]")
 
     def view_logs(self, title: str, follow: bool = False):
         """View logs for a process"""
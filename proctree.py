@@ -0,0 +1,95 @@
+import psutil
+
+
+class ProcessTree:
+    """Parent to children index of every process on the system.
+
+    Built with a single ``process_iter`` pass, so finding the descendants of
+    any number of managed processes doesn't walk ``/proc`` once per process.
+    """
+
+    def __init__(self):
+        self.children = {}  # ppid -> [pid]
+        self.names = {}     # pid -> name
+        for proc in psutil.process_iter(['pid', 'ppid', 'name']):
+            info = proc.info
+            if info['ppid'] is None or info['pid'] == info['ppid']:
+                continue
+            self.children.setdefault(info['ppid'], []).append(info['pid'])
+            self.names[info['pid']] = info['name']
+
+    def walk(self, pid: int):
+        """Yield (pid, depth) for a process and all its descendants, parents first"""
+        stack = [(pid, 0)]
+        seen = set()
+        while stack:
+            pid, depth = stack.pop()
+            if pid in seen:
+                continue
+            seen.add(pid)
+            yield pid, depth
+            # Reversed so children come out in pid order
+            stack.extend((child, depth + 1) for child in reversed(self.children.get(pid, ())))
+
+    def descendants(self, pid: int):
+        return [child for child, depth in self.walk(pid) if depth]
+
+
+class TreeStats:
+    """CPU and memory of whole process trees, summed from the root down.
+
+    ``psutil.Process`` objects are kept between calls so ``cpu_percent`` is
+    measured since the previous collect without sleeping. USS and PSS read
+    ``smaps`` and are only collected when ``full`` is set.
+    """
+
+    def __init__(self):
+        self._procs = {}  # pid -> psutil.Process
+
+    def _process(self, pid: int):
+        proc = self._procs.get(pid)
+        if proc is None:
+            proc = self._procs[pid] = psutil.Process(pid)
+            proc.cpu_percent(None)  # Prime the CPU counter
+        return proc
+
+    def collect(self, roots, full: bool = False):
+        """Return {title: usage} for {title: root pid}
+
+        A usage holds the summed ``cpu``, ``rss`` (and ``uss``/``pss`` if
+        ``full``) of the tree and its ``nodes``: (pid, depth, name, cpu, rss)
+        for every process in it, to draw the tree.
+        """
+        tree = ProcessTree()
+        usage = {}
+        live = set()
+        for title, root in roots.items():
+            total = {'cpu': 0.0, 'rss': 0, 'nodes': []}
+            if full:
+                total.update(uss=0, pss=0)
+            for pid, depth in tree.walk(root):
+                try:
+                    proc = self._process(pid)
+                    with proc.oneshot():
+                        cpu = proc.cpu_percent(None)
+                        if full:
+                            memory = proc.memory_full_info()
+                            total['uss'] += memory.uss
+                            total['pss'] += getattr(memory, 'pss', memory.uss)
+                        else:
+                            memory = proc.memory_info()
+                except psutil.AccessDenied:
+                    continue
+                except psutil.NoSuchProcess:
+                    self._procs.pop(pid, None)
+                    continue
+                live.add(pid)
+                total['cpu'] += cpu
+                total['rss'] += memory.rss
+                total['nodes'].append((pid, depth, tree.names.get(pid, ''), cpu, memory.rss))
+            usage[title] = total
+
+        for pid in list(self._procs):
+            if pid not in live:
+                del self._procs[pid]
+        return usage
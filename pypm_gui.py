@@ -1,15 +1,12 @@
 #!/usr/bin/env python3
 import tkinter as tk
 from tkinter import ttk, scrolledtext
-import psutil
 from process_manager import ProcessManager
-import time
-import threading
+from gui_common import ProcessListMixin
 import os
-import subprocess
 from tkinter import messagebox
 
-class PyPMGUI:
+class PyPMGUI(ProcessListMixin):
     def __init__(self, root):
         self.root = root
         self.root.title("PyProcessManager")
@@ -26,15 +23,12 @@ class PyPMGUI:
         self.create_process_tab()
         self.create_logs_tab()
         self.create_add_process_tab()
+
+        # Actions run in the background, their results show in the status bar
+        ttk.Label(root, textvariable=self.status_var, anchor='w').pack(fill='x', side='bottom', padx=5, before=self.notebook)
         
-        # Start update thread
-        self.running = True
-        self.update_thread = threading.Thread(target=self.update_loop)
-        self.update_thread.daemon = True
-        self.update_thread.start()
-        
-        # Bind close event
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        # Start update thread, bind close event
+        self.start_updates()
 
     def create_process_tab(self):
         """Create the processes list tab"""
@@ -42,7 +36,7 @@ class PyPMGUI:
         self.notebook.add(process_frame, text='Processes')
         
         # Create treeview
-        self.tree = ttk.Treeview(process_frame, columns=("Status", "PID", "CPU", "Memory", "AutoRun"), show="headings")
+        self.init_process_list(process_frame)
         self.tree.pack(fill='both', expand=True, padx=5, pady=5)
         
         # Add scrollbar
@@ -50,16 +44,6 @@ class PyPMGUI:
         scrollbar.pack(side='right', fill='y')
         self.tree.configure(yscrollcommand=scrollbar.set)
         
-        # Configure columns
-        self.tree.heading("Status", text="Status")
-        self.tree.heading("PID", text="PID")
-        self.tree.heading("CPU", text="CPU %")
-        self.tree.heading("Memory", text="Memory MB")
-        self.tree.heading("AutoRun", text="Auto-Run")
-        
-        for col in ("Status", "PID", "CPU", "Memory", "AutoRun"):
-            self.tree.column(col, width=100)
-        
         # Add control buttons
         btn_frame = ttk.Frame(process_frame)
         btn_frame.pack(fill='x', padx=5, pady=5)
@@ -70,6 +54,9 @@ class PyPMGUI:
         ttk.Button(btn_frame, text="View Logs", command=self.view_process_logs).pack(side='left', padx=2)
         ttk.Button(btn_frame, text="Toggle Auto-Run", command=self.toggle_autorun).pack(side='left', padx=2)
         ttk.Button(btn_frame, text="Setup Startup", command=self.setup_startup).pack(side='left', padx=2)
+        ttk.Checkbutton(btn_frame, text="Process tree", variable=self.tree_var).pack(side='left', padx=2)
+        ttk.Label(btn_frame, text="Search:").pack(side='left', padx=2)
+        ttk.Entry(btn_frame, textvariable=self.search_var, width=24).pack(side='left', padx=2)
 
     def create_logs_tab(self):
         """Create the log viewer tab"""
@@ -125,50 +112,10 @@ class PyPMGUI:
         # Add button
         ttk.Button(form_frame, text="Add Process", command=self.add_process).grid(row=4, column=1, sticky='w', pady=20)
 
-    def get_process_stats(self, pid):
-        """Get CPU and memory stats for a process"""
-        try:
-            process = psutil.Process(pid)
-            cpu = process.cpu_percent(interval=0.1)
-            mem = process.memory_info().rss / 1024 / 1024  # Convert to MB
-            return cpu, mem
-        except:
-            return 0, 0
-
     def update_process_list(self):
-        """Update the process list in the treeview"""
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Update process combo in logs tab
-        process_titles = list(self.pm.processes.keys())
-        self.process_combo['values'] = process_titles
-        
-        # Add processes to treeview
-        for title, info in self.pm.processes.items():
-            status = info['status']
-            pid = info['pid'] or ''
-            cpu = 'N/A'
-            mem = 'N/A'
-            
-            if status == 'running' and pid:
-                try:
-                    cpu_usage, mem_usage = self.get_process_stats(pid)
-                    cpu = f"{cpu_usage:.1f}"
-                    mem = f"{mem_usage:.1f}"
-                except:
-                    pass
-            
-            autorun = '✓' if info['autorun'] else '✗'
-            
-            # Insert with tag for color
-            tags = ('running',) if status == 'running' else ('stopped',)
-            self.tree.insert('', tk.END, text=title, values=(status, pid, cpu, mem, autorun), tags=tags)
-        
-        # Configure tags for colors
-        self.tree.tag_configure('running', foreground='green')
-        self.tree.tag_configure('stopped', foreground='red')
+        """Redraw the process list, and the process choice of the logs tab"""
+        super().update_process_list()
+        self.process_combo['values'] = list(self.pm.processes.keys())
 
     def update_logs(self):
         """Update the log viewer"""
@@ -200,40 +147,10 @@ class PyPMGUI:
         self.log_text.insert(tk.END, log_content)
         self.log_text.see(tk.END)  # Scroll to bottom
 
-    def update_loop(self):
-        """Background update loop"""
-        while self.running:
-            self.update_process_list()
-            self.update_logs()
-            time.sleep(2)
-
-    def get_selected_process(self):
-        """Get the selected process from the treeview"""
-        selection = self.tree.selection()
-        if not selection:
-            return None
-        item = self.tree.item(selection[0])
-        return item.get('text')
-
-    def start_process(self):
-        """Start the selected process"""
-        title = self.get_selected_process()
-        if title:
-            self.pm.start(title)
-
-    def stop_process(self):
-        """Stop the selected process"""
-        title = self.get_selected_process()
-        if title:
-            self.pm.stop(title)
-
-    def restart_process(self):
-        """Restart the selected process"""
-        title = self.get_selected_process()
-        if title:
-            self.pm.stop(title)
-            time.sleep(1)
-            self.pm.start(title)
+    def redraw(self):
+        """Everything redrawn after a collect(), on the Tk thread"""
+        self.update_process_list()
+        self.update_logs()
 
     def view_process_logs(self):
         """Switch to logs tab for selected process"""
@@ -251,18 +168,17 @@ class PyPMGUI:
         """Toggle autorun for selected process"""
         title = self.get_selected_process()
         if title and title in self.pm.processes:
-            current = self.pm.processes[title]['autorun']
-            self.pm.processes[title]['autorun'] = not current
-            self.pm._save_processes()
+            info = self.pm.processes[title]
+            with self.pm._lock:
+                info.spec = info.spec.replace(autorun=not info.spec.autorun)
+                self.pm._save_processes()
             self.update_process_list()
 
     def setup_startup(self):
         """Setup startup for autorun processes"""
-        try:
-            self.pm.setup_startup()
-            messagebox.showinfo("Success", "Startup configuration completed successfully!")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to setup startup: {str(e)}")
+        # Runs systemctl, the result shows in the status bar
+        if self.actions.submit('setup_startup'):
+            self.status_var.set("Setting up startup processes...")
 
     def add_process(self):
         """Add a new process"""
@@ -290,11 +206,6 @@ class PyPMGUI:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to add process: {str(e)}")
 
-    def on_closing(self):
-        """Handle window closing"""
-        self.running = False
-        self.root.destroy()
-
 def main():
     root = tk.Tk()
     app = PyPMGUI(root)
@@ -0,0 +1,138 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import yaml
+from models import ProcessRecord, SPEC_FIELDS, STATE_FIELDS
+from process_manager import RESTART_FIELDS
+
+APPLY_WORKERS = 8
+
+
+class Change:
+    """One step of a plan: add, update, remove or keep a process"""
+    __slots__ = ('action', 'title', 'spec', 'fields', 'restart')
+
+    def __init__(self, action: str, title: str, spec=None, fields=(), restart: bool = False):
+        self.action = action
+        self.title = title
+        self.spec = spec        # The desired spec, None when removed
+        self.fields = fields    # Changed field names of an update
+        self.restart = restart  # Whether the running process must be restarted
+
+
+def load_ecosystem(path: str):
+    """Read the desired processes from a YAML file of ``title: {command, cwd, ...}``
+
+    A missing ``cwd`` defaults to the file's directory and relative ones are
+    resolved against it. Raises ValueError if a process is invalid.
+    """
+    with open(path, 'r') as f:
+        data = yaml.safe_load(f) or {}
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected a mapping of titles to processes")
+    base_dir = os.path.dirname(os.path.abspath(path))
+    desired = {}
+    for title, info in data.items():
+        title = str(title)
+        if ':' in title:
+            raise ValueError(f"Process '{title}': ':' is reserved for instance names")
+        if not isinstance(info, dict):
+            raise ValueError(f"Process '{title}': expected a mapping, not {type(info).__name__}")
+        state = set(info) & set(STATE_FIELDS)
+        if state:
+            raise ValueError(f"Process '{title}': {', '.join(sorted(state))} is runtime state, not configuration")
+        info = dict(info)
+        info['cwd'] = os.path.join(base_dir, os.path.expanduser(str(info.get('cwd') or '.')))
+        desired[title] = ProcessRecord.from_dict(title, info).spec
+    return desired
+
+
+def plan(pm, desired):
+    """Compare desired specs ({title: ProcessSpec}) with the saved records, return [Change]"""
+    changes = []
+    current = {title: info for title, info in pm.snapshot() if info.spec.group is None}
+    for title, spec in desired.items():
+        info = current.get(title)
+        if info is None:
+            changes.append(Change('add', title, spec))
+            continue
+        fields = tuple(name for name in SPEC_FIELDS if getattr(info.spec, name) != getattr(spec, name))
+        if not fields:
+            changes.append(Change('keep', title, spec))
+            continue
+        restart = any(name in RESTART_FIELDS for name in fields) and any(
+            pm.processes[name].state.pid for name in pm.instances(title))
+        changes.append(Change('update', title, spec, fields, restart))
+    for title in current:
+        if title not in desired:
+            changes.append(Change('remove', title))
+    return changes
+
+
+def print_plan(pm, changes):
+    from rich.table import Table
+    table = Table(show_header=True, header_style="bold magenta")
+    table.add_column("Action")
+    table.add_column("Process")
+    table.add_column("Changes")
+    colors = {'add': 'green', 'update': 'yellow', 'remove': 'red'}
+    for change in changes:
+        if change.action == 'keep':
+            continue
+        action = change.action + (' + restart' if change.restart else '')
+        table.add_row(f"[{colors[change.action]}]{action}[/{colors[change.action]}]", change.title,
+                      ', '.join(change.fields))
+    kept = sum(change.action == 'keep' for change in changes)
+    pm.console.print(table)
+    pm.console.print(f"{len(changes) - kept} change(s), {kept} process(es) unchanged")
+
+
+def _parallel(calls):
+    """Run the (function, argument) pairs on a bounded pool"""
+    if not calls:
+        return
+    with ThreadPoolExecutor(max_workers=min(APPLY_WORKERS, len(calls))) as pool:
+        for future in [pool.submit(function, argument) for function, argument in calls]:
+            future.result()
+
+
+def apply(pm, changes, run, reload=None):
+    """Carry out a plan, touching only the processes it changes.
+
+    ``run(cmd, title)`` starts, stops or restarts a process (through the
+    daemon when one is running) and ``reload()`` tells whoever runs them
+    about the saved records. Removed processes are stopped first, then
+    the records are saved at once, then changed and new processes are
+    (re)started in parallel.
+    """
+    removed = [change.title for change in changes if change.action == 'remove']
+    _parallel([(lambda title: run('stop', title), name) for title in removed
+               for name in pm.instances(title) if pm.processes[name].state.pid])
+
+    with pm._lock:
+        # Pick up what was written since the plan, e.g. the stops above
+        pm._load_processes()
+        for change in changes:
+            if change.action == 'remove':
+                for name in pm.instances(change.title):
+                    pm.processes.pop(name, None)
+            elif change.action == 'add' or change.title not in pm.processes:
+                pm.processes[change.title] = ProcessRecord(change.spec)
+            elif change.action == 'update':
+                base = pm.processes[change.title]
+                base.spec = change.spec
+                # Instances follow the group's spec
+                for name in pm.instances(change.title)[1:]:
+                    instance = pm.processes[name]
+                    instance.spec = base.instance_record(change.title, instance.spec.instance).spec
+        pm._save_processes()
+    if reload is not None:
+        reload()
+
+    calls = []
+    for change in changes:
+        if change.action == 'update' and change.restart:
+            calls.extend(('restart', name) for name in pm.instances(change.title) if pm.processes[name].state.pid)
+        elif change.action == 'add' and not (change.spec.cron or change.spec.interval):
+            # Scheduled processes are started by the daemon
+            calls.append(('start', change.title))
+    _parallel([(lambda call: run(*call), call) for call in calls])
@@ -0,0 +1,182 @@
+import threading
+import time
+import psutil
+
+MEMORY_INTERVAL = 30  # seconds between smaps reads
+
+
+class MemoryPoller:
+    """USS and PSS of a set of PIDs, read on a background thread.
+
+    ``memory_full_info`` parses ``/proc/<pid>/smaps``, which is far slower
+    than the RSS in ``statm``, so it runs every ``interval`` seconds off the
+    caller's thread. Callers hand over the PIDs they show with ``watch`` and
+    read the last values with ``get``; they never wait for smaps. New PIDs
+    are measured right away rather than at the next full pass.
+    """
+
+    def __init__(self, interval: float = MEMORY_INTERVAL):
+        self.interval = interval
+        self.values = {}  # pid -> {'uss', 'pss', 'time'}
+        self._pids = frozenset()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopped = False
+
+    def watch(self, pids):
+        """Measure these PIDs from now on, and only these"""
+        pids = frozenset(pids)
+        if pids == self._pids:
+            return
+        self._pids = pids
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+        if pids - self.values.keys():
+            self._wake.set()
+
+    def get(self, pid: int):
+        return self.values.get(pid)
+
+    def total(self, pids):
+        """Summed (pss, uss) of the measured PIDs among ``pids``, None if none was measured yet"""
+        values = self.values
+        measured = [values[pid] for pid in pids if pid in values]
+        if not measured:
+            return None
+        return sum(value['pss'] for value in measured), sum(value['uss'] for value in measured)
+
+    def _read(self, pid: int):
+        memory = psutil.Process(pid).memory_full_info()
+        return {'uss': memory.uss, 'pss': getattr(memory, 'pss', memory.uss), 'time': time.time()}
+
+    def _run(self):
+        full = True
+        while not self._stopped:
+            pids = self._pids
+            values = {} if full else {pid: value for pid, value in self.values.items() if pid in pids}
+            for pid in pids:
+                if pid in values:
+                    continue
+                try:
+                    values[pid] = self._read(pid)
+                except psutil.Error:
+                    pass
+            self.values = values
+            # A timeout means it is time for the next full pass, a wake-up only adds new PIDs
+            full = not self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+
+class Sampler:
+    """Periodic CPU/RSS samples for every running managed process.
+
+    ``psutil.Process`` objects are cached per PID so ``cpu_percent`` can be
+    computed without blocking from the time since the previous sample,
+    instead of sleeping ``interval`` seconds per process. USS and PSS come
+    from a MemoryPoller on its slower ``memory_interval`` (0 turns them off)
+    and are None until a process was first measured. With ``counters`` the
+    cumulative CPU seconds and IO bytes of each run are sampled too.
+    """
+
+    def __init__(self, pm, memory_interval: float = MEMORY_INTERVAL, counters: bool = False):
+        self.pm = pm
+        self.counters = counters
+        self.samples = {}   # title -> {'pid', 'cpu', 'rss', 'uss', 'pss', 'time'}, and counters
+        self.exited = []    # titles whose PID disappeared during the last sample
+        self._procs = {}    # pid -> psutil.Process
+        self._peaks = {}    # title -> (pid, highest RSS seen)
+        self.memory = MemoryPoller(memory_interval) if memory_interval else None
+
+    def _process(self, pid: int):
+        proc = self._procs.get(pid)
+        if proc is None:
+            proc = psutil.Process(pid)
+            proc.cpu_percent(None)  # Prime the counter, first real value comes next tick
+            self._procs[pid] = proc
+        return proc
+
+    def sample(self):
+        """Take one sample of all running processes"""
+        now = time.time()
+        samples = {}
+        exited = []
+        live = set()
+        for title, info in self.pm.snapshot():
+            pid = info.state.pid
+            if not pid or info.state.status != 'running':
+                continue
+            try:
+                proc = self._process(pid)
+                with proc.oneshot():
+                    if proc.status() == psutil.STATUS_ZOMBIE:
+                        raise psutil.ZombieProcess(pid)
+                    memory = self.memory.get(pid) if self.memory else None
+                    rss = proc.memory_info().rss
+                    peak = self._peaks.get(title)
+                    if peak is None or peak[0] != pid or peak[1] < rss:
+                        # A new PID starts a new run
+                        peak = self._peaks[title] = (pid, rss)
+                    samples[title] = {
+                        'pid': pid,
+                        'cpu': proc.cpu_percent(None),
+                        'rss': rss,
+                        'peak_rss': peak[1],
+                        'uss': memory['uss'] if memory else None,
+                        'pss': memory['pss'] if memory else None,
+                        'time': now,
+                    }
+                    if self.counters:
+                        samples[title].update(self._counters(proc))
+                live.add(pid)
+            except psutil.NoSuchProcess:
+                # Includes zombies
+                self._procs.pop(pid, None)
+                exited.append(title)
+            except psutil.AccessDenied:
+                self._procs.pop(pid, None)
+
+        for pid in list(self._procs):
+            if pid not in live:
+                del self._procs[pid]
+        if self.memory:
+            self.memory.watch(live)
+        self.samples = samples
+        self.exited = exited
+        return samples
+
+    def _counters(self, proc):
+        """CPU seconds (with reaped children) and IO bytes since the process started"""
+        times = proc.cpu_times()
+        counters = {
+            'cpu_time': times.user + times.system + getattr(times, 'children_user', 0)
+            + getattr(times, 'children_system', 0),
+            'started': proc.create_time(),
+            'io_read': None,
+            'io_write': None,
+        }
+        try:
+            io = proc.io_counters()
+            counters['io_read'], counters['io_write'] = io.read_bytes, io.write_bytes
+        except (psutil.AccessDenied, AttributeError):
+            # Not readable (or not on this platform)
+            pass
+        return counters
+
+    def peak_rss(self, title: str, pid: int):
+        """Highest RSS sampled for this run of a process, kept after it exits"""
+        peak = self._peaks.get(title)
+        return peak[1] if peak and peak[0] == pid else None
+
+    def group_cpu(self, titles):
+        """Aggregate CPU % over several processes (e.g. the instances of a group)"""
+        return sum(self.samples[title]['cpu'] for title in titles if title in self.samples)
+
+    def stop(self):
+        if self.memory:
+            self.memory.stop()
@@ -0,0 +1,277 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from rich.console import Console
+from events import EventType
+
+HISTORY_LIMIT = 50
+OVERLAP_POLICIES = ('skip', 'queue', 'kill')
+
+CRON_ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+
+class TimerHeap:
+    """A min-heap of deadlines served by a single thread.
+
+    The loop sleeps on a condition until the earliest deadline instead of
+    polling, and wakes early when another thread schedules something sooner.
+    Cancelled timers are dropped lazily when they reach the top.
+    """
+
+    def __init__(self, console: Console = None):
+        self.console = console or Console()
+        self._heap = []
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self.running = False
+
+    def call_at(self, when: float, callback, *args):
+        """Run ``callback(*args)`` at the wall-clock time ``when``"""
+        entry = [when, next(self._seq), callback, args, False]
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            if self._heap[0] is entry:
+                self._cond.notify()
+        return entry
+
+    def call_later(self, delay: float, callback, *args):
+        """Run ``callback(*args)`` after ``delay`` seconds"""
+        return self.call_at(time.time() + delay, callback, *args)
+
+    def cancel(self, entry):
+        """Cancel a timer returned by call_at/call_later"""
+        if entry is not None:
+            entry[4] = True
+
+    def run(self):
+        """Serve timers until stop() is called"""
+        self.running = True
+        while self.running:
+            with self._cond:
+                while self._heap and self._heap[0][4]:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                _, _, callback, args, _ = heapq.heappop(self._heap)
+            try:
+                callback(*args)
+            except Exception as e:
+                self.console.print(f"[red]Timer error in {getattr(callback, '__name__', callback)}: {str(e)}[/red]")
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+
+
+class CronSchedule:
+    """A standard five-field cron expression (minute hour day month weekday)"""
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = CRON_ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Invalid cron expression '{expression}': expected 5 fields")
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        )
+        # Sunday may be written as 0 or 7
+        self.weekdays = frozenset(day % 7 for day in self.weekdays)
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def _parse(self, field: str, low: int, high: int):
+        values = set()
+        for part in field.split(','):
+            step = 1
+            try:
+                if '/' in part:
+                    part, step = part.split('/', 1)
+                    step = int(step)
+                if part == '*':
+                    start, end = low, high
+                elif '-' in part:
+                    start, end = (int(v) for v in part.split('-', 1))
+                else:
+                    start = int(part)
+                    end = high if step > 1 else start
+            except ValueError:
+                raise ValueError(f"Invalid cron field '{field}'")
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Invalid cron field '{field}'")
+            values.update(range(start, end + 1, step))
+        return frozenset(values)
+
+    def _day_matches(self, dt: datetime):
+        day = dt.day in self.days
+        weekday = (dt.weekday() + 1) % 7 in self.weekdays
+        # Like cron: when both are restricted either one may match
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, dt: datetime):
+        """Return the first matching minute strictly after ``dt``"""
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f"Cron expression '{self.expression}' never matches")
+
+
+class Scheduler:
+    """Start saved processes on their ``cron`` or ``interval`` schedule.
+
+    Scheduled runs are spawned by the daemon itself so it can wait for them
+    and record the duration and exit code in the process's ``history``.
+    """
+
+    def __init__(self, pm, timers: TimerHeap):
+        self.pm = pm
+        self.timers = timers
+        self._jobs = {}      # title -> (schedule key, timer entry)
+        self._active = {}    # title -> Popen of the current run
+        self._queued = set()
+        self._lock = threading.Lock()
+
+    def _schedule_key(self, spec):
+        return (spec.cron, spec.interval, spec.jitter or 0)
+
+    def sync(self):
+        """(Re)schedule jobs after the process records changed"""
+        with self._lock:
+            scheduled = {
+                title: info.spec for title, info in self.pm.snapshot()
+                if info.spec.cron or info.spec.interval
+            }
+            for title in list(self._jobs):
+                if title not in scheduled or self._jobs[title][0] != self._schedule_key(scheduled[title]):
+                    self.timers.cancel(self._jobs.pop(title)[1])
+            for title, spec in scheduled.items():
+                if title not in self._jobs:
+                    self._schedule_next(title, spec)
+
+    def _schedule_next(self, title: str, spec):
+        if spec.cron:
+            when = CronSchedule(spec.cron).next_after(datetime.now()).timestamp()
+        else:
+            when = time.time() + float(spec.interval)
+        jitter = float(spec.jitter or 0)
+        if jitter:
+            # Spread runs that share a schedule so they don't all start at once
+            when += random.uniform(0, jitter)
+        entry = self.timers.call_at(when, self._fire, title)
+        self._jobs[title] = (self._schedule_key(spec), entry)
+
+    def _fire(self, title: str):
+        with self._lock:
+            info = self.pm.processes.get(title)
+            if info is None or not (info.spec.cron or info.spec.interval):
+                self._jobs.pop(title, None)
+                return
+            self._schedule_next(title, info.spec)
+
+            current = self._active.get(title)
+            if current is not None and current.poll() is None:
+                overlap = info.spec.overlap or 'skip'
+                if overlap == 'queue':
+                    self._queued.add(title)
+                    self.pm.console.print(f"[yellow]Queued run of '{title}', previous run still active[/yellow]")
+                    return
+                if overlap == 'kill':
+                    self.pm.console.print(f"[yellow]Killing previous run of '{title}'[/yellow]")
+                    self.pm.stop(title)
+                    current.wait()
+                else:
+                    self.pm.console.print(f"[yellow]Skipped run of '{title}', previous run still active[/yellow]")
+                    return
+            self._start_run(title)
+
+    def _start_run(self, title: str):
+        proc = self.pm.spawn(title)
+        if proc is None:
+            return
+        self._active[title] = proc
+        waiter = threading.Thread(target=self._wait, args=(title, proc, time.time()))
+        waiter.daemon = True
+        waiter.start()
+
+    def _wait(self, title: str, proc, started: float):
+        exit_code = proc.wait()
+        self.record_run(title, started, time.time() - started, exit_code)
+        with self._lock:
+            if self._active.get(title) is proc:
+                del self._active[title]
+            if title in self._queued:
+                self._queued.discard(title)
+                self._start_run(title)
+
+    def record_run(self, title: str, started: float, duration: float, exit_code: int):
+        """Append a finished run to the process's bounded history"""
+        with self.pm._lock:
+            info = self.pm.processes.get(title)
+            if info is None:
+                return
+            state = info.state
+            if state.history is None:
+                state.history = []
+            history = state.history
+            history.append({
+                'started': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+                'duration': round(duration, 3),
+                'exit_code': exit_code,
+            })
+            del history[:-HISTORY_LIMIT]
+            if state.pid == getattr(self._active.get(title), 'pid', None):
+                state.pid = None
+                state.status = 'stopped'
+            self.pm._save_processes()
+        color = "green" if exit_code == 0 else "red"
+        self.pm.console.print(f"[{color}]Run of '{title}' finished in {duration:.1f}s with exit code {exit_code}[/{color}]")
+        pid = getattr(self._active.get(title), 'pid', None)
+        self.pm._emit(EventType.EXIT, title, pid, exit_code=exit_code, duration=duration)
+        if exit_code != 0:
+            self.pm._emit(EventType.CRASH, title, pid, exit_code=exit_code)
+
+    def owns(self, title: str):
+        """Check whether the current run of a process is the scheduler's child, reaped by its waiter"""
+        return title in self._active
+
+    def is_active(self, title: str):
+        """Check whether a scheduled run of a process is in progress"""
+        current = self._active.get(title)
+        return current is not None and current.poll() is None
+
+    def shutdown(self):
+        """Stop scheduling; runs in progress are left to finish on their own"""
+        with self._lock:
+            for _, entry in self._jobs.values():
+                self.timers.cancel(entry)
+            self._jobs.clear()
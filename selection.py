@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+
+BULK_WORKERS = 8
+# Prefixes of selectors matching a field instead of the title
+SELECTOR_FIELDS = {'ns': 'namespace', 'tag': 'tags', 'group': 'group'}
+GLOB_CHARS = '*?['
+
+
+def is_selector(text: str):
+    """Whether text selects processes (ns:api, tag:batch, group:web, web-*) rather than naming one"""
+    prefix, sep, _ = text.partition(':')
+    return bool(sep and prefix in SELECTOR_FIELDS) or any(char in text for char in GLOB_CHARS)
+
+
+def _match(title: str, spec, selector: str):
+    prefix, sep, pattern = selector.partition(':')
+    field = SELECTOR_FIELDS.get(prefix) if sep else None
+    if field is None:
+        return fnmatchcase(title, selector)
+    if field == 'tags':
+        return any(fnmatchcase(tag, pattern) for tag in spec.tags)
+    if field == 'group':
+        # A group is its first instance and the instances scaled from it
+        return fnmatchcase(spec.group or title, pattern)
+    value = getattr(spec, field)
+    return value is not None and fnmatchcase(value, pattern)
+
+
+def select(pm, *selectors):
+    """Titles matching any of the selectors, in saved order.
+
+    A selector is a title, a glob over titles (``web-*``), ``ns:NAME``,
+    ``tag:NAME`` or ``group:NAME``, where NAME may be a glob too.
+    """
+    return [
+        title for title, info in pm.snapshot()
+        if any(title == selector or _match(title, info.spec, selector) for selector in selectors)
+    ]
+
+
+def run_bulk(pm, action: str, titles, run=None, workers: int = BULK_WORKERS):
+    """Run an action on many processes at most ``workers`` at a time, return [(title, ok, message)]
+
+    ``run(action, title)`` defaults to calling the ProcessManager and must
+    return (ok, message); results keep the order of ``titles``.
+    """
+    from actions import outcome
+    if run is None:
+        def run(action, title):
+            getattr(pm, action)(title)
+            return outcome(pm, action, title)
+
+    def call(title):
+        try:
+            ok, message = run(action, title)
+        except Exception as e:
+            ok, message = False, str(e)
+        return title, ok, message
+
+    if not titles:
+        return []
+    with ThreadPoolExecutor(max_workers=min(workers, len(titles))) as pool:
+        return list(pool.map(call, titles))
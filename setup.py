@@ -4,6 +4,7 @@ setup(
     name="pypm",
     version="0.1",
     packages=find_packages(),
+    python_requires=">=3.10",
     install_requires=[
         'psutil==5.9.0',
         'PyYAML==6.0',
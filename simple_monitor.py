@@ -2,66 +2,125 @@
 import time
 import os
 import sys
+import select
 from process_manager import ProcessManager
+from sampler import MemoryPoller
+from actions import ActionRunner
+from snapshot import reader
 import psutil
 
+REFRESH_INTERVAL = 2  # seconds between redraws while idle
+
 def clear_screen():
     os.system('clear')
 
-def get_process_stats(pid):
+# PSS is read from smaps in the background, never while drawing
+memory = MemoryPoller()
+published = None  # SnapshotReader of the daemon's samples
+
+def published_samples(pm):
+    """The daemon's latest samples, None if no daemon publishes them"""
+    global published
+    if published is None:
+        published = reader(pm)
+    data = published.read()
+    return data['samples'] if data else None
+
+def get_process_stats(pid, sample=None):
+    if sample is not None:
+        # Measured by the daemon, nothing to read here
+        stats = f"CPU: {sample['cpu']:.1f}% | MEM: {sample['rss'] / 1024 / 1024:.1f}MB"
+        if sample.get('pss') is not None:
+            stats += f" | PSS: {sample['pss'] / 1024 / 1024:.1f}MB"
+        return stats
     try:
         process = psutil.Process(pid)
         cpu = process.cpu_percent(interval=0.1)
         mem = process.memory_info().rss / 1024 / 1024  # Convert to MB
-        return f"CPU: {cpu:.1f}% | MEM: {mem:.1f}MB"
+        stats = f"CPU: {cpu:.1f}% | MEM: {mem:.1f}MB"
+        usage = memory.get(pid)
+        if usage:
+            stats += f" | PSS: {usage['pss'] / 1024 / 1024:.1f}MB"
+        return stats
     except:
         return "N/A"
 
-def show_processes(pm, selected_index):
+def show_processes(pm, selected_index, actions=None, marked=(), message=''):
     clear_screen()
     print("\n=== Python Process Manager ===")
     print("\nProcesses:")
-    print("-" * 80)
-    print(f"{'Index':<6} {'Name':<25} {'Status':<10} {'System Stats':<25} {'Auto-Run':<8}")
-    print("-" * 80)
+    print("-" * 95)
+    print(f"{'Index':<6} {'Name':<25} {'Status':<12} {'System Stats':<40} {'Auto-Run':<8}")
+    print("-" * 95)
 
-    process_list = []
-    for title, info in pm.processes.items():
-        stats = get_process_stats(info['pid']) if info['pid'] else "Stopped"
-        process_list.append({
-            'title': title,
-            'status': info['status'],
-            'stats': stats,
-            'autorun': '✓' if info['autorun'] else '✗'
-        })
-
-    for i, proc in enumerate(process_list):
+    # The snapshot shares the records, nothing is copied per refresh
+    process_list = pm.snapshot()
+    samples = published_samples(pm)
+    if samples is None:
+        samples = {}
+        memory.watch(info.state.pid for _, info in process_list if info.state.pid)
+    for i, (title, info) in enumerate(process_list):
+        status = info.state.status
+        stats = get_process_stats(info.state.pid, samples.get(title)) if info.state.pid else "Stopped"
+        autorun = '✓' if info.spec.autorun else '✗'
         status_marker = '*' if i == selected_index else ' '
-        status_color = '\033[92m' if proc['status'] == 'running' else '\033[91m'  # Green for running, red for stopped
-        print(f"{status_marker} {i:<4} {proc['title']:<25} {status_color}{proc['status']:<10}\033[0m {proc['stats']:<25} {proc['autorun']:<8}")
+        status_marker += '+' if title in marked else ' '
+        status_color = '\033[92m' if status == 'running' else '\033[91m'  # Green for running, red for stopped
+        status = (actions.progress(title) if actions else None) or status
+        print(f"{status_marker}{i:<4} {title:<25} {status_color}{status:<12}\033[0m {stats:<40} {autorun:<8}")
 
-    print("\n" + "-" * 80)
+    print("\n" + "-" * 95)
+    if message:
+        print(message)
     print("Commands:")
-    print("↑/↓ (8/2): Select process | Enter (5): Start/Stop | r: Restart | q: Quit")
+    print("↑/↓ (8/2): Select process | Enter (5): Start/Stop | x: Mark | *: Mark all | u/d: Start/Stop | "
+          "r: Restart | q: Quit")
     
     return process_list
 
+def read_command(timeout):
+    """A line typed on stdin, or None if nothing was entered within timeout"""
+    ready, _, _ = select.select([sys.stdin], [], [], timeout)
+    if not ready:
+        return None
+    line = sys.stdin.readline()
+    if not line:
+        # stdin was closed, there is nothing more to read
+        raise EOFError
+    return line.lower().strip()
+
 def main():
     pm = ProcessManager()
+    actions = ActionRunner(pm)
+    # Results are shown above the prompt instead
+    pm.console.quiet = True
     selected_index = 0
-    last_key = None
+    marked = set()
+    status = ''
 
     while True:
-        process_list = show_processes(pm, selected_index)
-        
+        summary = actions.summary()
+        if summary:
+            status = summary
+        process_list = show_processes(pm, selected_index, actions, marked, status)
+
         if not process_list:
             print("\nNo processes found. Add processes using: pypm save <name> <command>")
-            time.sleep(2)
-            continue
+        else:
+            print("\nEnter command: ", end='', flush=True)
 
         try:
-            key = input("\nEnter command: ").lower().strip()
-            
+            # Redraw on a timer (sooner while actions run) instead of waiting for input
+            key = read_command(0.5 if actions.active() else REFRESH_INTERVAL)
+            if key is None or not process_list:
+                if key == 'q':
+                    clear_screen()
+                    break
+                continue
+
+            # Bulk actions apply to the marked processes, or the selected one
+            targets = [(title, info) for title, info in process_list if title in marked] or \
+                [process_list[selected_index]]
             if key == 'q':
                 clear_screen()
                 break
@@ -69,25 +128,24 @@ def main():
                 selected_index = max(0, selected_index - 1)
             elif key in ['2', 'j']:  # Down
                 selected_index = min(len(process_list) - 1, selected_index + 1)
+            elif key == 'x':  # Mark for bulk actions
+                marked.symmetric_difference_update((process_list[selected_index][0],))
+            elif key == '*':
+                titles = {title for title, _ in process_list}
+                marked = set() if marked >= titles else titles
             elif key == '5' or key == '':  # Enter/Start/Stop
-                if process_list:
-                    title = process_list[selected_index]['title']
-                    if pm.processes[title]['status'] == 'running':
-                        pm.stop(title)
-                    else:
-                        pm.start(title)
-            elif key == 'r':  # Restart
-                if process_list:
-                    title = process_list[selected_index]['title']
-                    pm.stop(title)
-                    time.sleep(1)
-                    pm.start(title)
-            
-            time.sleep(0.1)  # Small delay to prevent CPU overuse
+                for title, info in targets:
+                    actions.submit('stop' if info.state.status == 'running' else 'start', title)
+            elif key in ('u', 'd', 'r'):  # Start, stop, restart
+                action = {'u': 'start', 'd': 'stop', 'r': 'restart'}[key]
+                for title, info in targets:
+                    actions.submit(action, title)
             
+        except EOFError:
+            break
         except Exception as e:
-            print(f"\nError: {str(e)}")
-            time.sleep(2)
+            status = f"Error: {str(e)}"
+    actions.shutdown()
 
 if __name__ == "__main__":
     try:
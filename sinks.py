@@ -0,0 +1,372 @@
+import errno
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qsl
+
+BUFFER_LINES = 10000   # lines a sink keeps while its destination is slow or down
+BATCH_LINES = 500      # lines written per batch
+RETRY_MIN = 0.5        # seconds before the first retry, doubled on every failure
+RETRY_MAX = 30
+SEND_TIMEOUT = 5
+MESSAGE_MAX = 8 << 10  # bytes of a line sent to syslog or journald, the rest is cut off
+SYSLOG_SOCKET = '/dev/log'
+JOURNALD_SOCKET = '/run/systemd/journal/socket'
+FACILITIES = {'kern': 0, 'user': 1, 'daemon': 3, 'syslog': 5,
+              **{f'local{i}': 16 + i for i in range(8)}}
+PRIORITIES = {'out': 6, 'err': 3}  # info, err
+
+
+def _size(value: str):
+    """Parse a byte count like 10M"""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    value = value.strip().upper().rstrip('B')
+    if value[-1:] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+class Sink:
+    """A destination for a process's output lines.
+
+    Lines are queued by ``put`` and written in batches by the sink's own
+    thread, so a slow or unreachable destination only delays that sink. Up
+    to ``buffer`` lines are kept while writes fail, the oldest are dropped
+    past that, and failed batches are retried with exponential backoff up to
+    ``retry`` seconds apart.
+    """
+    kind = None
+    options = {'buffer': int, 'retry': float}
+
+    def __init__(self, title: str, target: str = None, buffer: int = BUFFER_LINES, retry: float = RETRY_MAX):
+        self.title = title
+        self.target = target
+        self.size = max(1, buffer)
+        self.retry = retry
+        self.written = 0
+        self.dropped = 0
+        self.error = None  # Last write error while failing
+        self._buffer = deque()  # (time, stream, line)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+    def __str__(self):
+        return f"{self.kind}:{self.target}" if self.target else self.kind
+
+    def put(self, stream: str, lines):
+        now = time.time()
+        with self._cond:
+            if self._closed:
+                return
+            overflow = len(self._buffer) + len(lines) - self.size
+            if overflow > 0:
+                self.dropped += overflow
+                if len(lines) > self.size:
+                    lines = lines[-self.size:]
+                for _ in range(min(overflow, len(self._buffer))):
+                    self._buffer.popleft()
+            self._buffer.extend((now, stream, line) for line in lines)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"sink-{self.title}-{self.kind}")
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        delay = 0
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if not self._buffer or self._closed and self.error:
+                    break
+                batch = [self._buffer.popleft() for _ in range(min(BATCH_LINES, len(self._buffer)))]
+            try:
+                self.write(batch)
+            except (OSError, ValueError) as e:
+                self.error = str(e)
+                self.reset()
+                with self._cond:
+                    # Put the batch back in front, it's older than anything queued since
+                    room = self.size - len(self._buffer)
+                    keep = batch[len(batch) - room:] if room < len(batch) else batch
+                    self.dropped += len(batch) - len(keep)
+                    self._buffer.extendleft(reversed(keep))
+                    delay = min(max(delay * 2, RETRY_MIN), self.retry)
+                    self._cond.wait_for(lambda: self._closed, timeout=delay)
+                continue
+            self.written += len(batch)
+            self.error = None
+            delay = 0
+        self.reset()
+
+    def write(self, batch):
+        """Write [(time, stream, line)] to the destination, raise OSError to retry"""
+        raise NotImplementedError
+
+    def reset(self):
+        """Drop the connection or file after a failure, the next write reopens it"""
+
+    def close(self, timeout: float = 1):
+        """Stop accepting lines, give the thread a moment to flush what's queued"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+class FileSink(Sink):
+    """Append lines to a file, rotated to ``.1`` … ``.N`` past ``max_bytes``"""
+    kind = 'file'
+    options = dict(Sink.options, max_bytes=_size, backups=int)
+
+    def __init__(self, title: str, target: str = None, max_bytes: int = 10 << 20, backups: int = 5, **options):
+        if not target:
+            raise ValueError("file sink needs a path, e.g. file:/var/log/web.log")
+        super().__init__(title, os.path.expanduser(target.replace('${title}', title)), **options)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = None
+
+    def _rotate(self):
+        self.reset()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.target}.{i}"):
+                os.replace(f"{self.target}.{i}", f"{self.target}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.target, f"{self.target}.1")
+        else:
+            os.truncate(self.target, 0)
+
+    def write(self, batch):
+        data = ''.join(
+            f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(t))} {stream} {line}\n"
+            for t, stream, line in batch
+        ).encode('utf-8', errors='replace')
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.target) or '.', exist_ok=True)
+            self._file = open(self.target, 'ab')
+        if self.max_bytes and self._file.tell() and self._file.tell() + len(data) > self.max_bytes:
+            self._rotate()
+            self._file = open(self.target, 'ab')
+        self._file.write(data)
+        self._file.flush()
+
+    def reset(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+
+class _DatagramSink(Sink):
+    """Send one datagram per line to a local Unix socket.
+
+    Lines longer than ``MESSAGE_MAX`` bytes are cut, and a message the
+    socket still refuses as too large is dropped: resending it can't help,
+    and would hold up every line behind it.
+    """
+    default_socket = None
+
+    def __init__(self, title: str, target: str = None, **options):
+        super().__init__(title, target or self.default_socket, **options)
+        self._sock = None
+
+    def message(self, t: float, stream: str, line: str) -> bytes:
+        raise NotImplementedError
+
+    @staticmethod
+    def _cut(line: str):
+        data = line.encode('utf-8', errors='replace')
+        if len(data) <= MESSAGE_MAX:
+            return line
+        return data[:MESSAGE_MAX].decode('utf-8', errors='ignore') + '…'
+
+    def write(self, batch):
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sock.settimeout(SEND_TIMEOUT)
+            self._sock.connect(self.target)
+        too_large = []
+        for i, (t, stream, line) in enumerate(batch):
+            try:
+                self._sock.send(self.message(t, stream, self._cut(line)))
+            except OSError as e:
+                if e.errno == errno.EMSGSIZE:
+                    too_large.append(i)
+                    continue
+                # Don't resend what already went out
+                del batch[:i]
+                raise
+        if too_large:
+            with self._cond:
+                self.dropped += len(too_large)
+            for i in reversed(too_large):
+                del batch[i]
+
+    def reset(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class SyslogSink(_DatagramSink):
+    """RFC 3164 messages to the local syslog socket, stderr at priority err"""
+    kind = 'syslog'
+    default_socket = SYSLOG_SOCKET
+    options = dict(Sink.options, facility=str)
+
+    def __init__(self, title: str, target: str = None, facility: str = 'user', **options):
+        if facility not in FACILITIES:
+            raise ValueError(f"unknown syslog facility '{facility}', use one of {', '.join(FACILITIES)}")
+        super().__init__(title, target, **options)
+        self.facility = FACILITIES[facility]
+        self.tag = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in title)[:48]
+
+    def message(self, t, stream, line):
+        priority = self.facility * 8 + PRIORITIES[stream]
+        stamp = time.strftime('%b %d %H:%M:%S', time.localtime(t))
+        return f"<{priority}>{stamp} {self.tag}: {line}".encode('utf-8', errors='replace')
+
+
+class JournaldSink(_DatagramSink):
+    """Entries in the systemd journal, sent with its native protocol"""
+    kind = 'journald'
+    default_socket = JOURNALD_SOCKET
+
+    @staticmethod
+    def _field(name: str, value: str):
+        value = value.encode('utf-8', errors='replace')
+        if b'\n' in value:
+            # Binary-safe form: the name, a newline, then the length-prefixed value
+            return name.encode() + b'\n' + struct.pack('<Q', len(value)) + value + b'\n'
+        return name.encode() + b'=' + value + b'\n'
+
+    def message(self, t, stream, line):
+        return b''.join((
+            self._field('MESSAGE', line),
+            self._field('PRIORITY', str(PRIORITIES[stream])),
+            self._field('SYSLOG_IDENTIFIER', self.title),
+            self._field('PYPM_TITLE', self.title),
+            self._field('PYPM_STREAM', stream),
+        ))
+
+
+class NDJSONSink(Sink):
+    """JSON lines to a local collector on host:port or a Unix socket path"""
+    kind = 'ndjson'
+
+    def __init__(self, title: str, target: str = None, **options):
+        if not target:
+            raise ValueError("ndjson sink needs host:port or a socket path, e.g. ndjson:127.0.0.1:5170")
+        super().__init__(title, target, **options)
+        self._sock = None
+
+    def _connect(self):
+        if self.target.startswith('/'):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(SEND_TIMEOUT)
+            sock.connect(self.target)
+            return sock
+        from control import parse_host
+        return socket.create_connection(parse_host(self.target), timeout=SEND_TIMEOUT)
+
+    def write(self, batch):
+        if self._sock is None:
+            self._sock = self._connect()
+        self._sock.sendall(''.join(
+            json.dumps({'time': t, 'title': self.title, 'stream': stream, 'line': line}) + '\n'
+            for t, stream, line in batch
+        ).encode())
+
+    def reset(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+SINK_TYPES = {sink.kind: sink for sink in (FileSink, SyslogSink, JournaldSink, NDJSONSink)}
+
+
+def parse_sink(text: str):
+    """Split ``kind[:target][?option=value&...]`` into (sink class, target, options)"""
+    spec, _, query = text.partition('?')
+    kind, _, target = spec.partition(':')
+    cls = SINK_TYPES.get(kind)
+    if cls is None:
+        raise ValueError(f"unknown sink '{kind}', use one of {', '.join(SINK_TYPES)}")
+    options = {}
+    for name, value in parse_qsl(query, keep_blank_values=True):
+        if name not in cls.options:
+            raise ValueError(f"{kind} sink has no option '{name}'")
+        try:
+            options[name] = cls.options[name](value)
+        except ValueError:
+            raise ValueError(f"invalid {kind} sink option {name}={value}")
+    return cls, target or None, options
+
+
+def make_sink(title: str, text: str):
+    cls, target, options = parse_sink(text)
+    return cls(title, target, **options)
+
+
+class SinkRouter:
+    """Feed the lines the log tailer reads to the sinks of each process.
+
+    Used as a ``LogTailer`` listener: ``put`` only queues, so a stalled
+    destination never slows the tailer, let alone the process writing the
+    log.
+    """
+
+    def __init__(self, pm):
+        self.pm = pm
+        self._sinks = {}  # title -> (sink specs, [Sink])
+
+    def sync(self):
+        """Open, replace or close sinks to match the saved records"""
+        processes = dict(self.pm.snapshot())
+        for title in list(self._sinks):
+            info = processes.get(title)
+            if info is None or info.spec.sinks != self._sinks[title][0]:
+                for sink in self._sinks.pop(title)[1]:
+                    sink.close()
+        for title, info in processes.items():
+            if not info.spec.sinks or title in self._sinks:
+                continue
+            sinks = []
+            for text in info.spec.sinks:
+                try:
+                    sinks.append(make_sink(title, text))
+                except ValueError as e:
+                    self.pm.console.print(f"[red]Sink '{text}' of '{title}': {str(e)}[/red]")
+            self._sinks[title] = (info.spec.sinks, sinks)
+
+    def __call__(self, title: str, stream: str, lines):
+        entry = self._sinks.get(title)
+        if entry is not None:
+            for sink in entry[1]:
+                sink.put(stream, lines)
+
+    def titles(self):
+        return [title for title, (_, sinks) in self._sinks.items() if sinks]
+
+    def sinks(self):
+        """Yield (title, sink) for every open sink"""
+        for title, (_, sinks) in self._sinks.items():
+            for sink in sinks:
+                yield title, sink
+
+    def close(self):
+        for title, (_, sinks) in self._sinks.items():
+            for sink in sinks:
+                sink.close()
+        self._sinks = {}
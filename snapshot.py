@@ -0,0 +1,168 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b'PYPMSNP1'
+HEADER = struct.Struct('<8sQQ')  # magic, sequence number, payload length
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = 8
+LENGTH_OFFSET = 16
+INITIAL_SIZE = 64 << 10
+STALE_AFTER = 10  # seconds without a publish before readers ignore the snapshot
+READ_RETRIES = 100
+# The record fields a listing needs, the rest stays in processes.yml
+SPEC_FIELDS = ('command', 'autorun')
+STATE_FIELDS = ('status', 'pid', 'health_status', 'started', 'restarts')
+
+
+def snapshot_path(config_dir: str):
+    """Where the daemon of ``config_dir`` publishes: in /dev/shm when there is one, else next to the records"""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        key = hashlib.sha1(os.path.abspath(config_dir).encode()).hexdigest()[:12]
+        return f"/dev/shm/pypm-{os.getuid()}-{key}.snapshot"
+    return os.path.join(config_dir, 'state.snapshot')
+
+
+def build(pm, samples):
+    """The published state: the listed fields of every record and the latest samples"""
+    return {
+        'time': time.time(),
+        'pid': os.getpid(),
+        'processes': {title: {**{name: getattr(info.spec, name) for name in SPEC_FIELDS},
+                              **{name: getattr(info.state, name) for name in STATE_FIELDS}}
+                      for title, info in pm.snapshot()},
+        'samples': samples,
+    }
+
+
+class SnapshotWriter:
+    """Publish the daemon's state to a memory-mapped file for clients to read without asking it.
+
+    The file is a header followed by a JSON payload. The header's sequence
+    number is odd while the payload is being rewritten (a seqlock), so
+    readers never take a lock and simply retry a torn read. The file only
+    grows; readers remap when the payload outgrows their mapping.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._map = None
+        self._sequence = 0
+
+    def _grow(self, size: int):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            else:
+                size = os.fstat(fd).st_size
+            mapping = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        if self._map is None:
+            # Carry on from a previous daemon's sequence, so a reader mid-read notices the change
+            magic, sequence, _ = HEADER.unpack_from(mapping)
+            self._sequence = sequence + (sequence & 1) if magic == MAGIC else 0
+            HEADER.pack_into(mapping, 0, MAGIC, self._sequence, 0)
+        else:
+            self._map.close()
+        self._map = mapping
+
+    def publish(self, data):
+        payload = json.dumps(data, separators=(',', ':')).encode()
+        needed = HEADER.size + len(payload)
+        if self._map is None or needed > len(self._map):
+            self._grow(max(INITIAL_SIZE, 1 << needed.bit_length()))
+        mapping = self._map
+        SEQUENCE.pack_into(mapping, SEQUENCE_OFFSET, self._sequence + 1)
+        mapping[HEADER.size:needed] = payload
+        SEQUENCE.pack_into(mapping, LENGTH_OFFSET, len(payload))
+        self._sequence += 2
+        SEQUENCE.pack_into(mapping, SEQUENCE_OFFSET, self._sequence)
+
+    def close(self):
+        """Unmap and remove the file, readers stop finding a snapshot"""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, TypeError):
+        return pid is not None
+    return True
+
+
+class SnapshotReader:
+    """Read the daemon's published state lock-free, None when there is no fresh snapshot"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._map = None
+
+    def _open(self):
+        self.close()
+        try:
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Missing, or empty while the daemon creates it
+            return False
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            return False
+        return True
+
+    def read(self):
+        if self._map is None and not self._open():
+            return None
+        for _ in range(READ_RETRIES):
+            mapping = self._map
+            sequence = SEQUENCE.unpack_from(mapping, SEQUENCE_OFFSET)[0]
+            if not sequence:
+                # Nothing published yet
+                return None
+            if sequence & 1:
+                # Being written
+                time.sleep(0.001)
+                continue
+            length = SEQUENCE.unpack_from(mapping, LENGTH_OFFSET)[0]
+            if HEADER.size + length > len(mapping):
+                # The file grew since it was mapped
+                if not self._open():
+                    return None
+                continue
+            payload = mapping[HEADER.size:HEADER.size + length]
+            if SEQUENCE.unpack_from(mapping, SEQUENCE_OFFSET)[0] == sequence:
+                break
+        else:
+            return None
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return None
+        if time.time() - data.get('time', 0) > STALE_AFTER or not _alive(data.get('pid')):
+            # The daemon stopped or hangs; a new one may publish to a new file
+            self.close()
+            return None
+        return data
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+def reader(pm):
+    return SnapshotReader(snapshot_path(pm.config_dir))
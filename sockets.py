@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+import fcntl
+import os
+import shlex
+import socket
+import sys
+import threading
+
+LISTEN_FDS_START = 3  # SD_LISTEN_FDS_START
+BACKLOG = socket.SOMAXCONN
+
+
+def parse_address(address: str):
+    """Turn ``host:port``, ``[v6]:port``, ``:port`` or ``/unix/path`` into (family, sockaddr)"""
+    if address.startswith('/'):
+        return socket.AF_UNIX, address
+    host, sep, port = address.rpartition(':')
+    if not sep or not port.isdigit():
+        raise ValueError(f"Invalid listen address '{address}', expected host:port")
+    host = host.strip('[]')
+    if ':' in host:
+        return socket.AF_INET6, (host, int(port))
+    return socket.AF_INET, (host or '0.0.0.0', int(port))
+
+
+def systemd_address(address: str):
+    """The ListenStream= form of an address"""
+    if address.startswith(':'):
+        return address[1:]
+    return address
+
+
+class SocketRegistry:
+    """Listening sockets bound once and shared by every start of a process.
+
+    The supervisor keeps the sockets open across restarts, so connections
+    wait in the kernel backlog while the process is replaced, and instances
+    of a group listening on the same address share one socket.
+    """
+
+    def __init__(self):
+        self._sockets = {}  # address -> socket
+        self._lock = threading.Lock()
+
+    def _bind(self, address: str):
+        family, sockaddr = parse_address(address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            if family == socket.AF_UNIX:
+                if os.path.exists(sockaddr):
+                    os.unlink(sockaddr)
+            else:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(sockaddr)
+            sock.listen(BACKLOG)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def fds(self, addresses):
+        """Return the file descriptors for addresses, binding the new ones"""
+        with self._lock:
+            for address in addresses:
+                if address not in self._sockets:
+                    self._sockets[address] = self._bind(address)
+            return [self._sockets[address].fileno() for address in addresses]
+
+    def release(self, keep=()):
+        """Close sockets no longer used by any process"""
+        with self._lock:
+            for address in list(self._sockets):
+                if address not in keep:
+                    self._sockets.pop(address).close()
+
+    def close(self):
+        self.release()
+
+
+def launcher_command(fds, command: str):
+    """Wrap a command so it receives ``fds`` with the LISTEN_FDS protocol"""
+    return f"{sys.executable} {shlex.quote(os.path.abspath(__file__))} {','.join(map(str, fds))} {shlex.quote(command)}"
+
+
+def main(argv):
+    """Move the inherited sockets to fd 3.., set LISTEN_* and exec the command in this PID"""
+    fds = [int(fd) for fd in argv[1].split(',')]
+    command = argv[2]
+
+    # Park the sockets above the target range so dup2 can't clobber one of them
+    parked = [fcntl.fcntl(fd, fcntl.F_DUPFD, LISTEN_FDS_START + len(fds)) for fd in fds]
+    for fd in fds:
+        os.close(fd)
+    for i, fd in enumerate(parked):
+        os.dup2(fd, LISTEN_FDS_START + i)
+        os.close(fd)
+
+    os.environ['LISTEN_FDS'] = str(len(fds))
+    os.environ['LISTEN_PID'] = str(os.getpid())
+    os.execv('/bin/sh', ['sh', '-c', f"exec {command}"])
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+import io
+import json
+import os
+import platform
+import shlex
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import psutil
+from rich.console import Console
+from rich.table import Table
+from process_manager import ProcessManager
+from models import ProcessRecord
+from logtail import LogTailer
+from index import ProcessIndex
+from selection import run_bulk
+from actions import outcome
+from control import ControlClient
+from snapshot import SnapshotReader, snapshot_path
+
+SLEEPER = "sleep 86400"
+# One fork per second (the sleep), echo is a shell builtin
+ECHO = ("sh -c 'while :; do i=0; while [ $i -lt {rate} ]; do "
+        "echo \"stress $$ line $i: GET /api/v1/items status=200 duration=12ms\"; i=$((i+1)); done; sleep 1; done'")
+SPAWN_BATCH = 200      # processes launched per shell
+POLL_INTERVAL = 0.5    # seconds between log polls and supervisor measurements
+LIVE_LIST_PROCESSES = 100  # list() measures each process for 0.1s, so only this many are listed live
+STARTUP_TIMEOUT = 300
+STORM_TIMEOUT = 300
+CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cli.py')
+
+
+def _summary(timings, **extra):
+    return {
+        'runs': len(timings),
+        'mean': statistics.mean(timings),
+        'min': min(timings),
+        'max': max(timings),
+        'p50': statistics.median(timings),
+        **extra,
+    }
+
+
+def _time(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+class StressTest:
+    """Run many tiny processes under a real daemon and measure how pypm copes.
+
+    The processes are launched like ``ProcessManager.start`` launches them
+    (``nohup`` with the logs redirected, in their own session) but a few
+    hundred per shell and recorded with one save: starting them one by one
+    would mostly measure rewriting ``processes.yml`` once per process,
+    which ``state_file`` reports on its own. Everything runs in a throwaway
+    home directory with its own daemon, the user's processes are never
+    touched.
+    """
+
+    def __init__(self, processes: int = 500, echo: float = 0.5, log_rate: int = 10, duration: float = 20,
+                 storm: int = 20, repeat: int = 5, console: Console = None):
+        self.count = processes
+        self.echo = int(round(processes * echo))
+        self.log_rate = log_rate
+        self.duration = duration
+        self.storm_size = min(storm, processes)
+        self.repeat = repeat
+        self.console = console or Console()
+        self.results = {}
+        self.workdir = tempfile.mkdtemp(prefix='pypm-stress-')
+        self.env = dict(os.environ, HOME=self.workdir)
+        self.pm = ProcessManager(config_dir=os.path.join(self.workdir, '.pyprocessmanager'))
+        self.pm.console = Console(file=io.StringIO())
+        self.reader = SnapshotReader(snapshot_path(self.pm.config_dir))
+        self.titles = []
+        self.pids = []  # every PID launched, for the cleanup
+        self.daemon = None
+        self.started = time.perf_counter()
+
+    def _step(self, text: str):
+        self.console.print(f"[cyan]{time.perf_counter() - self.started:6.1f}s  {text}[/cyan]")
+
+    def register(self):
+        """Validate and save the records in one write"""
+        self._step(f"Registering {self.count} processes ({self.echo} writing {self.log_rate} lines/s)")
+        start = time.perf_counter()
+        for i in range(self.count):
+            kind = 'echo' if i < self.echo else 'sleeper'
+            title = f"stress-{kind}-{i}"
+            command = ECHO.format(rate=self.log_rate) if kind == 'echo' else SLEEPER
+            self.pm.processes[title] = ProcessRecord.from_dict(title, {
+                'command': command, 'cwd': self.workdir, 'namespace': 'stress', 'tags': ['stress', kind],
+            })
+            self.titles.append(title)
+        self.pm._save_processes()
+        self.results['register'] = {'processes': self.count, 'seconds': time.perf_counter() - start}
+
+    def spawn(self):
+        """Launch every process, a batch of them per shell, and record the PIDs"""
+        self._step(f"Starting {self.count} processes")
+        start = time.perf_counter()
+        for first in range(0, self.count, SPAWN_BATCH):
+            lines = []
+            for title in self.titles[first:first + SPAWN_BATCH]:
+                info = self.pm.processes[title]
+                env = ' '.join(f"{key}={shlex.quote(value)}" for key, value in self.pm._process_env(title, info).items())
+                stdout_log, stderr_log = self.pm._log_paths(title)
+                lines.append(f"{env} nohup {info.spec.command} > {stdout_log} 2> {stderr_log} & echo $!")
+            output = subprocess.run(['sh', '-c', '\n'.join(lines)], cwd=self.workdir, capture_output=True,
+                                    text=True, start_new_session=True, check=True).stdout
+            now = time.time()
+            for title, pid in zip(self.titles[first:first + SPAWN_BATCH], output.split()):
+                state = self.pm.processes[title].state
+                state.pid, state.status, state.started = int(pid), 'running', now
+                self.pids.append(int(pid))
+        self.pm._save_processes()
+        self.results['spawn'] = {'processes': self.count, 'seconds': time.perf_counter() - start}
+
+    def state_file(self):
+        """What every save and every reload of processes.yml costs at this size"""
+        self._step("Timing processes.yml saves and loads")
+        saves = [_time(self.pm._save_processes) for _ in range(self.repeat)]
+        loads = [_time(self.pm._load_processes) for _ in range(self.repeat)]
+        self.results['state_file'] = {
+            'bytes': os.path.getsize(self.pm.processes_file),
+            'save': _summary(saves),
+            'load': _summary(loads),
+        }
+
+    def start_daemon(self):
+        """Run the daemon on the stress home and wait for its first complete snapshot"""
+        self._step("Starting the daemon")
+        start = time.perf_counter()
+        self.daemon = subprocess.Popen([sys.executable, CLI, 'daemon'], env=self.env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        while time.perf_counter() - start < STARTUP_TIMEOUT:
+            if self.daemon.poll() is not None:
+                raise RuntimeError(f"the daemon exited with code {self.daemon.returncode}")
+            data = self.reader.read()
+            if data and len(data['processes']) == self.count and len(data['samples']) >= self.count * 0.9:
+                self.results['supervisor'] = {'first_snapshot_seconds': time.perf_counter() - start}
+                return
+            time.sleep(0.2)
+        raise RuntimeError(f"no complete snapshot after {STARTUP_TIMEOUT}s")
+
+    def steady_state(self):
+        """Supervisor CPU and RSS, snapshot freshness and log capture over ``duration`` seconds"""
+        self._step(f"Measuring the steady state for {self.duration:.0f}s")
+        daemon = psutil.Process(self.daemon.pid)
+        tailer = LogTailer(self.pm)
+        captured = {'lines': 0, 'bytes': 0}
+
+        def count(title, stream, lines):
+            captured['lines'] += len(lines)
+            captured['bytes'] += sum(len(line) + 1 for line in lines)
+
+        tailer.listeners.append(count)
+        tailer.poll()  # Only the output written from now on counts
+        produced_before = self._log_bytes()
+        cpu, rss, ages, ticks, poll_cpu = [], [], [], [], 0.0
+        last_cpu = sum(daemon.cpu_times()[:2])
+        start = last = time.perf_counter()
+        while time.perf_counter() - start < self.duration:
+            time.sleep(POLL_INTERVAL)
+            thread_start = time.thread_time()
+            tailer.poll()
+            poll_cpu += time.thread_time() - thread_start
+            now = time.perf_counter()
+            times = sum(daemon.cpu_times()[:2])
+            cpu.append((times - last_cpu) / (now - last) * 100)
+            last_cpu, last = times, now
+            rss.append(daemon.memory_info().rss)
+            data = self.reader.read()
+            if data:
+                ages.append(time.time() - data['time'])
+                if not ticks or ticks[-1] != data['time']:
+                    ticks.append(data['time'])
+        elapsed = time.perf_counter() - start
+        produced = self._log_bytes() - produced_before
+        intervals = [b - a for a, b in zip(ticks, ticks[1:])]
+        self.results['supervisor'].update({
+            'cpu_percent_mean': statistics.mean(cpu),
+            'cpu_percent_max': max(cpu),
+            'rss_mb_start': rss[0] / 1024 / 1024,
+            'rss_mb_max': max(rss) / 1024 / 1024,
+            'rss_mb_end': rss[-1] / 1024 / 1024,
+            'snapshot_age_max': max(ages) if ages else None,
+            'tick_interval_mean': statistics.mean(intervals) if intervals else None,
+            'tick_interval_max': max(intervals) if intervals else None,
+        })
+        self.results['logs'] = {
+            'produced_mb_per_s': produced / elapsed / 1024 / 1024,
+            'captured_lines_per_s': captured['lines'] / elapsed,
+            'captured_mb_per_s': captured['bytes'] / elapsed / 1024 / 1024,
+            'poll_cpu_seconds': poll_cpu,
+            'lines_per_cpu_second': captured['lines'] / poll_cpu if poll_cpu else None,
+            # Bytes left to read when the window ended (partial lines included)
+            'lag_bytes': max(0, produced - captured['bytes']),
+        }
+
+    def _log_bytes(self):
+        total = 0
+        for title in self.titles:
+            for path in self.pm._log_paths(title):
+                try:
+                    total += os.path.getsize(path)
+                except OSError:
+                    pass
+        return total
+
+    def refresh(self):
+        """How long listings and frontend refreshes take with this many processes"""
+        self._step("Timing refreshes")
+        data = self.reader.read()
+        refresh = {
+            'snapshot_read': _summary([_time(self.reader.read) for _ in range(self.repeat)]),
+            'list_published': _summary([_time(self.pm.list_published, data) for _ in range(self.repeat)]),
+        }
+        index = ProcessIndex(self.pm)
+        refresh['index_build'] = _summary([_time(index.update)])
+        refresh['index_query'] = _summary([_time(index.query, 'echo', sort='cpu', samples=data['samples'])
+                                           for _ in range(self.repeat)])
+        cli = [_time(subprocess.run, [sys.executable, CLI, 'list'], env=self.env,
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for _ in range(min(self.repeat, 3))]
+        refresh['cli_list'] = _summary(cli)
+        titles = set(self.titles[:LIVE_LIST_PROCESSES])
+        refresh['list_live'] = _summary([_time(self.pm.list, titles=titles, live=True)], processes=len(titles))
+        self.results['refresh'] = refresh
+
+    def storm(self):
+        """Send the daemon a burst of restarts and wait until it publishes them all running again.
+
+        The restarts go through the control socket like any client's, so the
+        daemon does the work it is measured for and no second process
+        manager races it for the records.
+        """
+        if not self.storm_size:
+            return
+        self._step(f"Restart storm of {self.storm_size} processes")
+        step = self.count / self.storm_size
+        titles = [self.titles[int(i * step)] for i in range(self.storm_size)]
+        published = (self.reader.read() or {}).get('processes', {})
+        previous = {title: published.get(title, {}).get('pid') for title in titles}
+        client = ControlClient(self.pm, timeout=STORM_TIMEOUT)
+
+        def restart(action, title):
+            response = client.request(action, title=title)
+            if not response.get('ok'):
+                return False, response.get('error')
+            return outcome(self.pm, action, title, response.get('status'))
+
+        start = time.perf_counter()
+        outcomes = run_bulk(self.pm, 'restart', titles, run=restart)
+        restarted = time.perf_counter() - start
+        recovered = {}
+        deadline = time.perf_counter() + STORM_TIMEOUT
+        while time.perf_counter() < deadline:
+            data = self.reader.read()
+            if data:
+                # Running under a PID other than the one before the storm
+                recovered = {title: data['processes'][title]['pid'] for title in titles
+                             if data['processes'].get(title, {}).get('status') == 'running'
+                             and data['processes'][title].get('pid') not in (None, previous[title])}
+                if len(recovered) == len(titles):
+                    break
+            time.sleep(0.2)
+        self.pids.extend(recovered.values())
+        self.results['storm'] = {
+            'processes': len(titles),
+            'failed': sum(1 for _, ok, _ in outcomes if not ok),
+            'restart_seconds': restarted,
+            'recovered': len(recovered),
+            # Until the daemon published every new PID, None if it never did
+            'recovery_seconds': time.perf_counter() - start if len(recovered) == len(titles) else None,
+        }
+        if len(recovered) < len(titles):
+            # Find the rest for the cleanup
+            processes = client.request('list')['processes']
+            self.pids.extend(processes[title]['pid'] for title in titles if processes[title].get('pid'))
+
+    def cleanup(self):
+        if self.daemon is not None and self.daemon.poll() is None:
+            self.daemon.terminate()
+            try:
+                self.daemon.wait(30)
+            except subprocess.TimeoutExpired:
+                self.daemon.kill()
+        for pid in set(self.pids):
+            try:
+                parent = psutil.Process(pid)
+                for child in parent.children(recursive=True):
+                    child.kill()
+                parent.kill()
+            except psutil.Error:
+                pass
+        self.reader.close()
+        try:
+            # Left behind if the daemon had to be killed
+            os.unlink(self.reader.path)
+        except OSError:
+            pass
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def run(self):
+        """Run every phase and return the results"""
+        try:
+            self.register()
+            self.spawn()
+            self.state_file()
+            self.start_daemon()
+            self.steady_state()
+            self.refresh()
+            self.storm()
+        finally:
+            self.cleanup()
+        return {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'timestamp': time.time(),
+            'processes': self.count,
+            'echo_processes': self.echo,
+            'log_rate': self.log_rate,
+            'results': self.results,
+        }
+
+
+def _seconds(value):
+    if value is None:
+        return 'n/a'
+    return f"{value * 1000:.1f} ms" if value < 1 else f"{value:.2f} s"
+
+
+def print_report(console: Console, report):
+    results = report['results']
+    table = Table(show_header=True, header_style="bold magenta",
+                  title=f"Stress test: {report['processes']} processes, {report['echo_processes']} "
+                        f"writing {report['log_rate']} lines/s, {report['cpus']} CPUs")
+    table.add_column("Phase")
+    table.add_column("Measure")
+    table.add_column("Value", justify="right")
+
+    def timing(phase, name, stats):
+        extra = f" ({stats['processes']} processes)" if 'processes' in stats else ''
+        table.add_row(phase, name + extra, f"{_seconds(stats['p50'])} p50, {_seconds(stats['max'])} max")
+
+    if 'register' in results:
+        table.add_row("Setup", "Validate and save all records", _seconds(results['register']['seconds']))
+    if 'spawn' in results:
+        table.add_row("Setup", "Launch all processes", _seconds(results['spawn']['seconds']))
+    if 'state_file' in results:
+        state_file = results['state_file']
+        table.add_row("State file", "processes.yml size", f"{state_file['bytes'] / 1024 / 1024:.1f} MB")
+        timing("State file", "Save", state_file['save'])
+        timing("State file", "Load (every CLI call and daemon reload)", state_file['load'])
+    supervisor = results.get('supervisor', {})
+    if supervisor:
+        table.add_row("Supervisor", "Start to first complete snapshot", _seconds(supervisor['first_snapshot_seconds']))
+    if 'cpu_percent_mean' in supervisor:
+        table.add_row("Supervisor", "CPU", f"{supervisor['cpu_percent_mean']:.1f}% mean, "
+                                           f"{supervisor['cpu_percent_max']:.1f}% max")
+        table.add_row("Supervisor", "RSS", f"{supervisor['rss_mb_start']:.1f} MB at start, "
+                                           f"{supervisor['rss_mb_max']:.1f} MB max")
+        table.add_row("Supervisor", "Sample tick interval (2s nominal)",
+                      f"{_seconds(supervisor['tick_interval_mean'])} mean, {_seconds(supervisor['tick_interval_max'])} max")
+        table.add_row("Supervisor", "Oldest snapshot read", _seconds(supervisor['snapshot_age_max']))
+    for name, label in (('snapshot_read', "Read the snapshot"), ('list_published', "Render the published list"),
+                        ('index_build', "Build the search index"), ('index_query', "Search and sort by CPU"),
+                        ('cli_list', "pypm list"), ('list_live', "list() measuring live")):
+        if name in results.get('refresh', {}):
+            timing("Refresh", label, results['refresh'][name])
+    if 'logs' in results:
+        logs = results['logs']
+        table.add_row("Logs", "Written by the processes", f"{logs['produced_mb_per_s']:.2f} MB/s")
+        table.add_row("Logs", "Captured", f"{logs['captured_lines_per_s']:.0f} lines/s, "
+                                          f"{logs['captured_mb_per_s']:.2f} MB/s")
+        if logs['lines_per_cpu_second']:
+            table.add_row("Logs", "Capture capacity", f"{logs['lines_per_cpu_second']:.0f} lines per CPU second")
+        table.add_row("Logs", "Left unread at the end", f"{logs['lag_bytes'] / 1024:.1f} KB")
+    if 'storm' in results:
+        storm = results['storm']
+        table.add_row("Restart storm", f"Restart {storm['processes']} at once through the daemon", _seconds(storm['restart_seconds']))
+        table.add_row("Restart storm", "Until the daemon published them all running",
+                      _seconds(storm['recovery_seconds']) if storm['recovery_seconds'] is not None
+                      else f"[red]{storm['recovered']}/{storm['processes']} {STORM_TIMEOUT}s after the restarts[/red]")
+        if storm['failed']:
+            table.add_row("Restart storm", "Failed restarts", f"[red]{storm['failed']}[/red]")
+    console.print(table)
+
+
+def main(processes: int = 500, echo: float = 0.5, log_rate: int = 10, duration: float = 20, storm: int = 20,
+         repeat: int = 5, output: str = None):
+    console = Console()
+    # Clean up on SIGTERM too, or thousands of processes would be left behind
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+    report = StressTest(processes, echo, log_rate, duration, storm, repeat, console).run()
+    print_report(console, report)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        console.print(f"[green]Wrote stress test results to {output}[/green]")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,9 @@ import time
 import os
 import sys
 from process_manager import ProcessManager
+from sampler import MemoryPoller
+from snapshot import reader
+from actions import ActionRunner, PROGRESS
 import signal
 import psutil
 
@@ -16,36 +19,50 @@ class TerminalUI:
         self.running = True
         self.process_list = []
         self.update_interval = 2  # seconds
+        self.memory = MemoryPoller()  # PSS on its own slower cadence
+        self.published = reader(self.pm)  # The daemon's samples, when one is running
+        # Actions run in the background, their results show above the footer
+        self.actions = ActionRunner(self.pm)
+        self.pm.console.quiet = True
+        self.message = ''
         
         # Start the update thread
         self.update_thread = threading.Thread(target=self.update_processes)
         self.update_thread.daemon = True
         self.update_thread.start()
     
-    def get_process_stats(self, pid):
+    def get_process_stats(self, pid, sample=None):
+        if sample is not None:
+            # Measured by the daemon, nothing to read here
+            stats = f"CPU: {sample['cpu']:.1f}% | MEM: {sample['rss'] / 1024 / 1024:.1f}MB"
+            if sample.get('pss') is not None:
+                stats += f" | PSS: {sample['pss'] / 1024 / 1024:.1f}MB"
+            return stats
         try:
             process = psutil.Process(pid)
             cpu = process.cpu_percent(interval=0.1)
             mem = process.memory_info().rss / 1024 / 1024  # Convert to MB
-            return f"CPU: {cpu:.1f}% | MEM: {mem:.1f}MB"
+            stats = f"CPU: {cpu:.1f}% | MEM: {mem:.1f}MB"
+            memory = self.memory.get(pid)
+            if memory:
+                stats += f" | PSS: {memory['pss'] / 1024 / 1024:.1f}MB"
+            return stats
         except:
             return "N/A"
     
     def update_processes(self):
         while self.running:
             try:
-                # Update process list
-                new_list = []
-                for title, info in self.pm.processes.items():
-                    stats = self.get_process_stats(info['pid']) if info['pid'] else "Stopped"
-                    new_list.append({
-                        'title': title,
-                        'status': info['status'],
-                        'pid': info['pid'] or '',
-                        'stats': stats,
-                        'autorun': '✓' if info['autorun'] else '✗'
-                    })
-                self.process_list = new_list
+                published = self.published.read()
+                samples = published['samples'] if published else {}
+                if published is None:
+                    self.memory.watch(info.state.pid for _, info in self.pm.snapshot() if info.state.pid)
+                # Rows share the records, only the stats text is new
+                self.process_list = [
+                    (title, info, self.get_process_stats(info.state.pid, samples.get(title))
+                     if info.state.pid else "Stopped")
+                    for title, info in self.pm.snapshot()
+                ]
                 time.sleep(self.update_interval)
             except Exception as e:
                 print(f"Update error: {str(e)}")
@@ -65,23 +82,24 @@ class TerminalUI:
             
             # Draw column headers
             headers = ["Process Name", "Status", "System Stats", "Auto-Run"]
-            header_format = "{:<30} {:<15} {:<25} {:<10}"
+            header_format = "{:<30} {:<15} {:<40} {:<10}"
             print(self.term.move(2, 0) + self.term.bold(
                 header_format.format(*headers)))
             print(self.term.move(3, 0) + "─" * width)
             
             # Draw processes
-            for i, process in enumerate(self.process_list):
+            for i, (title, info, stats) in enumerate(self.process_list):
                 if i >= height - 6:  # Leave space for headers and footer
                     break
                 
                 # Format process information
-                status_color = self.term.green if process['status'] == 'running' else self.term.red
+                status = info.state.status
+                status_color = self.term.green if status == 'running' else self.term.red
                 line = header_format.format(
-                    process['title'][:30],
-                    status_color(process['status']),
-                    process['stats'],
-                    process['autorun']
+                    title[:30],
+                    status_color(self.actions.progress(title) or status),
+                    stats,
+                    '✓' if info.spec.autorun else '✗'
                 )
                 
                 y_pos = i + 4  # Start after headers
@@ -90,6 +108,11 @@ class TerminalUI:
                 else:
                     print(self.term.move(y_pos, 0) + line)
             
+            summary = self.actions.summary()
+            if summary:
+                self.message = summary
+            print(self.term.move(height - 2, 0) + self.message[:width])
+
             # Draw footer
             footer = "↑/↓:Select | Enter:Start/Stop | r:Restart | q:Quit"
             print(self.term.move(height - 1, 0) + self.term.black_on_white(
@@ -103,7 +126,8 @@ class TerminalUI:
         with self.term.cbreak(), self.term.hidden_cursor():
             while self.running:
                 try:
-                    key = self.term.inkey(timeout=1)
+                    # Redraw sooner while actions run
+                    key = self.term.inkey(timeout=0.2 if self.actions.active() else 1)
                     if key:
                         if key.name == 'q':
                             self.running = False
@@ -115,22 +139,21 @@ class TerminalUI:
                                                    self.selected_index + 1)
                         elif key.name == 'enter':
                             if self.process_list:
-                                title = self.process_list[self.selected_index]['title']
-                                if self.pm.processes[title]['status'] == 'running':
-                                    self.pm.stop(title)
-                                else:
-                                    self.pm.start(title)
+                                title, info, _ = self.process_list[self.selected_index]
+                                self.submit('stop' if info.state.status == 'running' else 'start', title)
                         elif key == 'r':
                             if self.process_list:
-                                title = self.process_list[self.selected_index]['title']
-                                self.pm.stop(title)
-                                time.sleep(1)
-                                self.pm.start(title)
+                                self.submit('restart', self.process_list[self.selected_index][0])
                     self.draw()
                 except Exception as e:
                     print(f"Input error: {str(e)}")
                     time.sleep(1)
 
+    def submit(self, action, title):
+        """Run an action in the background, the UI keeps drawing meanwhile"""
+        if not self.actions.submit(action, title):
+            self.message = f"{title} is still {PROGRESS[self.actions.busy(title)]}"
+
 def main():
     ui = TerminalUI()
     
@@ -145,6 +168,7 @@ def main():
     except Exception as e:
         print(f"Error: {str(e)}")
     finally:
+        ui.actions.shutdown()
         print(ui.term.clear())
 
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+import pytest
+from rich.console import Console
+from process_manager import ProcessManager
+from control import RemoteClient, fan_out
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = 'fan-out-test-token'
+HOSTS = 3
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(client, timeout: float = 20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if client.request('ping').get('ok'):
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"daemon on {client.address} did not answer")
+
+
+@pytest.fixture(scope='module')
+def daemons(tmp_path_factory):
+    """{address: config_dir} of local daemons serving the control API on TCP, each with its own process"""
+    hosts, procs = {}, []
+    try:
+        for i in range(HOSTS):
+            home = tmp_path_factory.mktemp(f"host{i}")
+            config_dir = str(home / '.pyprocessmanager')
+            pm = ProcessManager(config_dir=config_dir)
+            pm.console = Console(file=io.StringIO())
+            pm.save('worker', 'sleep 60', cwd=str(home))
+            pm.save(f"only-on-{i}", 'sleep 60', cwd=str(home))
+            address = f"127.0.0.1:{free_port()}"
+            code = (f"import daemon; daemon.main(tcp={address!r}, token={TOKEN!r}, "
+                    f"config_dir={config_dir!r}, memory_interval=0)")
+            procs.append(subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, env=dict(os.environ, HOME=str(home)),
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            hosts[address] = config_dir
+        for address, config_dir in hosts.items():
+            wait_for(RemoteClient(address, config_dir, token=TOKEN))
+        yield hosts
+    finally:
+        clients = {address: RemoteClient(address, config_dir, token=TOKEN) for address, config_dir in hosts.items()}
+        fan_out(clients, 'stop', title='worker')
+        for proc in procs:
+            proc.terminate()
+            proc.wait(10)
+
+
+def clients_for(hosts, token=TOKEN):
+    return {address: RemoteClient(address, config_dir, token=token, timeout=10) for address, config_dir in hosts.items()}
+
+
+def test_list_reaches_every_host(daemons):
+    responses = fan_out(clients_for(daemons), 'list')
+    assert set(responses) == set(daemons)
+    for i, (address, response) in enumerate(responses.items()):
+        assert response['ok'], response
+        assert set(response['processes']) == {'worker', f"only-on-{i}"}
+        assert response['processes']['worker']['status'] == 'stopped'
+
+
+def test_restart_runs_on_every_host(daemons):
+    responses = fan_out(clients_for(daemons), 'restart', title='worker')
+    pids = set()
+    for address, response in responses.items():
+        assert response['ok'], response
+        assert response['status'] == 'running'
+    for address, response in fan_out(clients_for(daemons), 'list').items():
+        pid = response['processes']['worker']['pid']
+        assert response['processes']['worker']['status'] == 'running'
+        pids.add(pid)
+    # One process per host
+    assert len(pids) == len(daemons)
+
+
+def test_wrong_token_is_rejected(daemons):
+    responses = fan_out(clients_for(daemons, token='wrong'), 'list')
+    for response in responses.values():
+        assert response == {'ok': False, 'error': 'unauthorized'}
+    responses = fan_out(clients_for(daemons, token=None), 'list')
+    assert all(response == {'ok': False, 'error': 'unauthorized'} for response in responses.values())
+
+
+def test_host_down_is_reported_without_failing_the_others(daemons):
+    clients = clients_for(daemons)
+    down = f"127.0.0.1:{free_port()}"
+    clients[down] = RemoteClient(down, next(iter(daemons.values())), token=TOKEN, timeout=2)
+    start = time.time()
+    responses = fan_out(clients, 'list')
+    assert time.time() - start < 10
+    assert responses[down]['ok'] is False
+    assert responses[down]['error']
+    for address in daemons:
+        assert responses[address]['ok']
@@ -0,0 +1,56 @@
+import socket
+import time
+import pytest
+import sinks
+from logtail import LINE_MAX, LogTailer, _Follower
+from sinks import SyslogSink
+
+
+@pytest.fixture
+def syslog(tmp_path):
+    """A Unix datagram socket standing in for /dev/log"""
+    path = str(tmp_path / 'log')
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(path)
+    sock.settimeout(5)
+    yield path, sock
+    sock.close()
+
+
+def flushed(sink, lines: int):
+    deadline = time.time() + 5
+    while time.time() < deadline and sink.written + sink.dropped < lines:
+        time.sleep(0.05)
+
+
+def test_long_line_is_cut_and_the_next_one_sent(syslog):
+    path, server = syslog
+    sink = SyslogSink('web', path)
+    sink.put('out', ['x' * (400 << 10), 'short'])
+    flushed(sink, 2)
+    first, second = server.recv(1 << 20), server.recv(1 << 20)
+    sink.close()
+    assert sink.written == 2 and sink.dropped == 0
+    assert len(first) < sinks.MESSAGE_MAX + 100
+    assert second.endswith(b'web: short')
+
+
+def test_message_the_socket_refuses_is_dropped(syslog, monkeypatch):
+    path, server = syslog
+    monkeypatch.setattr(sinks, 'MESSAGE_MAX', 1 << 20)
+    sink = SyslogSink('web', path)
+    sink.put('out', ['x' * (400 << 10), 'short'])
+    flushed(sink, 2)
+    received = server.recv(1 << 20)
+    sink.close()
+    assert sink.written == 1 and sink.dropped == 1 and sink.error is None
+    assert received.endswith(b'web: short')
+
+
+def test_output_without_newlines_is_split(tmp_path):
+    path = tmp_path / 'web.out'
+    path.write_bytes(b'y' * (LINE_MAX * 2 + 10))
+    follower = _Follower(10, history=False)
+    lines = LogTailer(None)._read(str(path), follower)
+    assert [len(line) for line in lines] == [LINE_MAX, LINE_MAX]
+    assert len(follower.partial) == 10
@@ -0,0 +1,59 @@
+import io
+import os
+import threading
+import time
+import pytest
+from rich.console import Console
+from process_manager import ProcessManager
+from scheduler import TimerHeap
+from watcher import FileWatcher
+
+DEBOUNCE = 0.2
+
+
+@pytest.fixture
+def watched(tmp_path):
+    """A watcher over tmp_path/app for a 'running' record whose restarts are only counted"""
+    app = tmp_path / 'app'
+    (app / 'node_modules').mkdir(parents=True)
+    (app / 'main.py').write_text('print("hello")\n')
+    pm = ProcessManager(config_dir=str(tmp_path / 'config'))
+    pm.console = Console(file=io.StringIO())
+    pm.save('app', 'python main.py', cwd=str(app), watch=['.'])
+    pm.processes['app'].state.status = 'running'
+    restarts = []
+    pm.restart = restarts.append
+    timers = TimerHeap(console=pm.console)
+    threading.Thread(target=timers.run, daemon=True).start()
+    watcher = FileWatcher(pm, timers, debounce=DEBOUNCE)
+    watcher.sync()
+    yield app, restarts
+    watcher.shutdown()
+    timers.stop()
+
+
+def settle():
+    time.sleep(DEBOUNCE + 0.5)
+
+
+def test_reading_a_watched_file_does_not_restart(watched):
+    app, restarts = watched
+    for _ in range(3):
+        (app / 'main.py').read_text()
+    settle()
+    assert restarts == []
+
+
+def test_writing_a_watched_file_restarts_once(watched):
+    app, restarts = watched
+    for i in range(3):
+        (app / 'main.py').write_text(f'print({i})\n')
+    settle()
+    assert restarts == ['app']
+
+
+def test_ignored_directories_are_not_watched(watched):
+    app, restarts = watched
+    (app / 'node_modules' / 'lib.js').write_text('x')
+    settle()
+    assert restarts == []
@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 from blessed import Terminal
-import psutil
 import time
 import threading
 import os
 from process_manager import ProcessManager
+from proctree import TreeStats
+from sampler import MemoryPoller, Sampler
+from snapshot import reader
+from index import ProcessIndex, SORT_KEYS
+from actions import ActionRunner, PROGRESS
 import sys
 from collections import deque
 
@@ -26,6 +30,24 @@ class ProcessManagerTUI:
         self.add_process_field_index = 0
         self.status_message = ""
         self.status_time = 0
+        self.tree_mode = False  # Sum usage over each process tree
+        self.tree_stats = TreeStats()
+        self.expanded = set()  # Titles whose children are shown
+        self.memory = MemoryPoller()  # PSS/USS read in the background
+        self.actions = ActionRunner(self.pm)  # start/stop/restart off the input loop
+        self.marked = set()  # Titles selected for bulk actions
+        self.index = ProcessIndex(self.pm)
+        self.sampler = Sampler(self.pm, memory_interval=0)  # CPU/RSS of every process, without sleeping
+        self.published = reader(self.pm)  # The daemon's samples, when one is running
+        self.samples = {}
+        self.rows = []  # The processes drawn last, what keys act on
+        self.search = ""
+        self.searching = False
+        self.sort_key = None
+        self.sort_reverse = False
+        self.scroll = 0
+        # Results go to the status line, prints would tear the screen
+        self.pm.console.quiet = True
 
     def show_status(self, message, duration=3):
         """Show a status message for a few seconds"""
@@ -37,60 +59,112 @@ class ProcessManagerTUI:
         if self.status_message and time.time() > self.status_time:
             self.status_message = ""
 
-    def get_process_stats(self, pid):
-        """Get CPU and memory stats for a process"""
-        try:
-            process = psutil.Process(pid)
-            cpu = process.cpu_percent(interval=0.1)
-            mem = process.memory_info().rss / 1024 / 1024  # Convert to MB
-            return cpu, mem
-        except:
-            return 0, 0
+    def visible(self, usage=None):
+        """The processes matching the search, in the chosen order"""
+        samples = usage if self.tree_mode else self.samples
+        return self.index.query(self.search, self.sort_key, samples, self.sort_reverse)
 
     def draw_processes(self):
         """Draw the process list view"""
-        processes = list(self.pm.processes.items())
-        if not processes:
+        if not self.pm.snapshot():
+            self.rows = []
             print(self.term.center('No processes found. Press "a" to add a new process.'))
             return
 
+        usage = {}
+        if self.tree_mode:
+            # CPU is measured since the previous refresh, nothing sleeps here
+            usage = self.tree_stats.collect({
+                title: info.state.pid for title, info in self.pm.snapshot()
+                if info.state.status == 'running' and info.state.pid
+            })
+            self.memory.watch(pid for tree in usage.values() for pid, *_ in tree['nodes'])
+        else:
+            published = self.published.read()
+            if published is not None:
+                # The daemon sampled already, PSS/USS included
+                self.samples = published['samples']
+            else:
+                self.sampler.sample()
+                self.samples = self.sampler.samples
+                self.memory.watch(info.state.pid for _, info in self.pm.snapshot() if info.state.pid)
+        processes = self.rows = self.visible(usage)
+        self.selected_index = max(0, min(self.selected_index, len(processes) - 1))
+
+        # Search and sort bar
+        sort = f"{self.sort_key}{' ↑' if self.sort_reverse else ''}" if self.sort_key else 'saved order'
+        search = f"/{self.search}{'█' if self.searching else ''}" if self.search or self.searching else 'all'
+        print(f"Showing {search} ({len(processes)} of {len(self.pm.snapshot())}) | Sort: {sort}")
+
         # Header
         print(self.term.black_on_white(self.term.center(
-            f"{'Name':<20} {'Status':<10} {'PID':<8} {'CPU %':<8} {'MEM MB':<8} {'Auto':<6}"
+            f"  {'Name':<20} {'Status':<12} {'PID':<8} {'CPU %':<8} {'MEM MB':<8} {'PSS MB':<8} {'USS MB':<8} {'Auto':<6}"
         )))
-        
+
+        # Scroll so the selected process stays on screen
+        height = max(1, self.term.height - 9)  # Leave room for header and footer
+        if self.selected_index < self.scroll:
+            self.scroll = self.selected_index
+        elif self.selected_index >= self.scroll + height:
+            self.scroll = self.selected_index - height + 1
+
         # Process list
-        for i, (title, info) in enumerate(processes):
-            if i >= self.term.height - 8:  # Leave room for header and footer
+        lines = 0
+        for i, (title, info) in enumerate(processes[self.scroll:], self.scroll):
+            if lines >= height:
                 break
-                
+            lines += 1
+
             selected = i == self.selected_index
-            status = info['status']
-            pid = info['pid'] or 'N/A'
+            status = info.state.status
+            pid = info.state.pid or 'N/A'
             
             cpu = 'N/A'
             mem = 'N/A'
-            if status == 'running' and pid != 'N/A':
-                try:
-                    cpu_usage, mem_usage = self.get_process_stats(pid)
-                    cpu = f"{cpu_usage:.1f}"
-                    mem = f"{mem_usage:.1f}"
-                except:
-                    pass
+            pss = uss = 'N/A'
+            tree = usage.get(title)
+            sample = self.samples.get(title)
+            memory = None
+            if tree:
+                memory = self.memory.total(pid for pid, *_ in tree['nodes'])
+            elif sample and sample.get('pss') is not None:
+                memory = sample['pss'], sample['uss']
+            elif status == 'running' and pid != 'N/A':
+                memory = self.memory.total((pid,))
+            if memory:
+                pss, uss = (f"{value / 1024 / 1024:.1f}" for value in memory)
+            if tree and tree['nodes']:
+                cpu = f"{tree['cpu']:.1f}"
+                mem = f"{tree['rss'] / 1024 / 1024:.1f}"
+            elif sample and not self.tree_mode:
+                cpu = f"{sample['cpu']:.1f}"
+                mem = f"{sample['rss'] / 1024 / 1024:.1f}"
             
-            line = f"{title:<20} {status:<10} {str(pid):<8} {cpu:<8} {mem:<8} {'✓' if info['autorun'] else '✗':<6}"
+            mark = '●' if title in self.marked else ' '
+            status = self.actions.progress(title) or status
+            line = f"{mark} {title:<20} {status:<12} {str(pid):<8} {cpu:<8} {mem:<8} {pss:<8} {uss:<8} {'✓' if info.spec.autorun else '✗':<6}"
             
+            running = info.state.status == 'running'
             if selected:
-                if status == 'running':
+                if running:
                     print(self.term.black_on_green(line))
                 else:
                     print(self.term.black_on_red(line))
             else:
-                if status == 'running':
+                if running:
                     print(self.term.green(line))
                 else:
                     print(self.term.red(line))
 
+            if tree and title in self.expanded:
+                for child_pid, depth, name, child_cpu, rss in tree['nodes'][1:]:
+                    if lines >= height:
+                        break
+                    lines += 1
+                    name = f"{'  ' * depth}└ {name}"
+                    print(self.term.bright_black(
+                        f"  {name[:20]:<20} {'':<12} {child_pid:<8} {child_cpu:<8.1f} {rss / 1024 / 1024:<8.1f}"))
+
     def draw_logs(self):
         """Draw the log viewer"""
         if not self.current_log_process:
@@ -147,7 +221,11 @@ class ProcessManagerTUI:
         help_text = ""
         
         if self.view_mode == 'processes':
-            help_text = "↑/k,↓/j: Select | Enter/Space: Start/Stop | r: Restart | l: View Logs | a: Add | s: Setup Startup | q: Quit"
+            if self.searching:
+                help_text = "Type to search (group:NAME, ns:NAME, tag:NAME, status:running) | Enter: Keep | ESC: Clear"
+            else:
+                help_text = ("↑/k,↓/j: Select | /: Search | o/O: Sort | x: Mark | *: Mark All | Enter/Space: Start/Stop | "
+                             "u/d: Start/Stop | r: Restart | l: Logs | t: Tree | →/←: Expand | a: Add | s: Setup Startup | q: Quit")
         elif self.view_mode == 'logs':
             help_text = "q/ESC: Back"
         elif self.view_mode == 'add':
@@ -182,7 +260,18 @@ class ProcessManagerTUI:
 
     def handle_processes_input(self, key):
         """Handle input in processes view"""
-        processes = list(self.pm.processes.items())
+        if self.searching:
+            self.handle_search_input(key)
+            return
+        processes = self.rows
+        name = getattr(key, 'name', None)
+        if key == '/':
+            self.searching = True
+            return
+        if name == 'KEY_ESCAPE' or key == '\x1b':
+            # Leave the search
+            self.search = ""
+            return
         if not processes:
             if key == 'a':
                 self.view_mode = 'add'
@@ -191,24 +280,49 @@ class ProcessManagerTUI:
             return
 
         # Support both arrow keys and k/j for navigation
-        if key in ('KEY_UP', 'k', 'K') and self.selected_index > 0:
+        page = max(1, self.term.height - 9)
+        if (key in ('KEY_UP', 'k', 'K') or name == 'KEY_UP') and self.selected_index > 0:
             self.selected_index -= 1
-        elif key in ('KEY_DOWN', 'j', 'J') and self.selected_index < len(processes) - 1:
+        elif (key in ('KEY_DOWN', 'j', 'J') or name == 'KEY_DOWN') and self.selected_index < len(processes) - 1:
             self.selected_index += 1
+        elif name == 'KEY_PGUP':
+            self.selected_index = max(0, self.selected_index - page)
+        elif name == 'KEY_PGDOWN':
+            self.selected_index = min(len(processes) - 1, self.selected_index + page)
+        elif key in ('o', 'O'):
+            # o cycles the sort column, O reverses it
+            if key == 'O':
+                self.sort_reverse = not self.sort_reverse
+            else:
+                keys = (None,) + SORT_KEYS
+                self.sort_key = keys[(keys.index(self.sort_key) + 1) % len(keys)]
+            self.show_status(f"Sorted by {self.sort_key or 'saved order'}")
+        elif key in ('x', 'X'):
+            title = processes[self.selected_index][0]
+            self.marked.symmetric_difference_update((title,))
+            self.selected_index = min(self.selected_index + 1, len(processes) - 1)
+        elif key == '*':
+            titles = {title for title, _ in processes}
+            self.marked = set() if self.marked >= titles else titles
         elif key in ('KEY_ENTER', '\n', ' '):  # Support both Enter and Space
+            for title, info in self.targets(processes):
+                self.run_action('stop' if info.state.status == 'running' else 'start', title)
+        elif key in ('u', 'U', 'd', 'D', 'r', 'R'):
+            action = {'u': 'start', 'd': 'stop', 'r': 'restart'}[key.lower()]
+            for title, info in self.targets(processes):
+                self.run_action(action, title)
+        elif key in ('t', 'T'):
+            self.tree_mode = not self.tree_mode
+            self.show_status(f"Tree usage {'on' if self.tree_mode else 'off'}")
+        elif getattr(key, 'name', None) in ('KEY_RIGHT', 'KEY_LEFT') or key in ('e', 'E'):
+            # Expanding a process shows its tree
+            name = getattr(key, 'name', None)
             title = processes[self.selected_index][0]
-            if processes[self.selected_index][1]['status'] == 'running':
-                self.pm.stop(title)
-                self.show_status(f"Stopped process: {title}")
+            if name == 'KEY_LEFT' or (name != 'KEY_RIGHT' and title in self.expanded):
+                self.expanded.discard(title)
             else:
-                self.pm.start(title)
-                self.show_status(f"Started process: {title}")
-        elif key in ('r', 'R'):
-            title = processes[self.selected_index][0]
-            self.pm.stop(title)
-            time.sleep(1)
-            self.pm.start(title)
-            self.show_status(f"Restarted process: {title}")
+                self.expanded.add(title)
+                self.tree_mode = True
         elif key in ('l', 'L'):
             self.current_log_process = processes[self.selected_index][0]
             self.view_mode = 'logs'
@@ -217,11 +331,36 @@ class ProcessManagerTUI:
             self.add_process_fields = {'name': '', 'command': '', 'autorun': False}
             self.add_process_field_index = 0
         elif key in ('s', 'S'):
-            self.pm.setup_startup()
-            self.show_status("Setup startup processes")
+            self.actions.submit('setup_startup')
+            self.show_status("Setting up startup processes...")
         elif key in ('q', 'Q'):
             self.running = False
 
+    def handle_search_input(self, key):
+        """Edit the search, the list is filtered as you type"""
+        name = getattr(key, 'name', None)
+        if name == 'KEY_ESCAPE' or key == '\x1b':
+            self.search = ""
+            self.searching = False
+        elif name == 'KEY_ENTER' or key == '\n':
+            self.searching = False
+        elif name in ('KEY_BACKSPACE', 'KEY_DELETE') or key in ('\x7f', '\b'):
+            self.search = self.search[:-1]
+        elif key and key.isprintable():
+            self.search += key
+        self.selected_index = 0
+
+    def targets(self, processes):
+        """The marked processes, or the selected one if none are marked"""
+        if self.marked:
+            return [(title, info) for title, info in processes if title in self.marked]
+        return [processes[self.selected_index]]
+
+    def run_action(self, action, title):
+        """Queue an action, its result shows up in the status line"""
+        if not self.actions.submit(action, title):
+            self.show_status(f"{title} is still {PROGRESS[self.actions.busy(title)]}")
+
     def handle_logs_input(self, key):
         """Handle input in logs view"""
         if key in ('KEY_ESCAPE', 'q', 'Q', '\x1b'):  # Support Esc, q and Q
@@ -273,11 +412,14 @@ class ProcessManagerTUI:
         with self.term.fullscreen(), self.term.cbreak(), self.term.hidden_cursor():
             while self.running:
                 # Draw the UI
+                summary = self.actions.summary()
+                if summary:
+                    self.show_status(summary)
                 self.draw()
                 self.clear_status()
                 
-                # Handle input
-                key = self.term.inkey(timeout=1)
+                # Handle input, redrawing sooner while spinners turn
+                key = self.term.inkey(timeout=0.2 if self.actions.active() else 1)
                 if key:
                     if self.view_mode == 'processes':
                         self.handle_processes_input(key)
@@ -288,7 +430,10 @@ class ProcessManagerTUI:
 
 def main():
     app = ProcessManagerTUI()
-    app.run()
+    try:
+        app.run()
+    finally:
+        app.actions.shutdown()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,179 @@
+import fnmatch
+import os
+import re
+import threading
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+DEBOUNCE = 1.0  # seconds
+# Events that change a file; watchdog also reports opens and closes after reads
+CHANGE_EVENTS = ('created', 'modified', 'deleted', 'moved', 'closed')
+
+# Trees that change constantly or are huge, and never need a restart
+DEFAULT_IGNORES = (
+    '*/.git/*', '*/node_modules/*', '*/.venv/*', '*/venv/*', '*/__pycache__/*',
+    '*/.mypy_cache/*', '*/.pytest_cache/*', '*/.tox/*',
+    '*.pyc', '*.swp', '*.tmp', '*~',
+)
+
+
+class _Target:
+    """The watched paths of one process and a compiled matcher for its ignore globs"""
+
+    def __init__(self, paths, ignores):
+        self.paths = tuple(paths)
+        self.key = (self.paths, tuple(ignores))
+        self.ignored = re.compile('|'.join(fnmatch.translate(glob) for glob in DEFAULT_IGNORES + tuple(ignores)))
+
+    def covers(self, path: str):
+        return any(path == root or path.startswith(root + os.sep) for root in self.paths)
+
+    def matches(self, path: str):
+        if self.ignored.match(path):
+            return False
+        return self.covers(path)
+
+    def ignores_dir(self, path: str):
+        """Whether nothing under the directory is watched for this process"""
+        return bool(self.ignored.match(path + os.sep))
+
+
+class FileWatcher(FileSystemEventHandler):
+    """Restart processes when files under their ``watch`` paths change.
+
+    One watchdog observer (inotify on Linux) is shared by all processes and
+    each directory is watched once, even if several processes or nested
+    paths ask for it. Ignored directories are never watched: a directory
+    with an ignored one somewhere below it gets a watch of its own and its
+    other subdirectories are planned the same way, only subtrees without
+    ignored directories are watched recursively. Directories created or
+    removed later are planned again. A burst of changes, e.g. a git
+    checkout, is debounced into a single restart per process.
+    """
+
+    def __init__(self, pm, timers, debounce: float = DEBOUNCE):
+        self.pm = pm
+        self.timers = timers
+        self.debounce = debounce
+        self.observer = None
+        self._targets = {}   # title -> _Target
+        self._watches = {}   # directory -> (recursive, ObservedWatch)
+        self._pending = {}   # title -> timer entry
+        self._replan = None  # timer entry of the next sync after directories changed
+        self._lock = threading.Lock()
+
+    def _watch_paths(self, spec):
+        paths = []
+        for path in spec.watch:
+            path = os.path.expanduser(path)
+            if not os.path.isabs(path):
+                path = os.path.join(spec.cwd, path)
+            paths.append(os.path.realpath(path))
+        return paths
+
+    def sync(self):
+        """Add and remove watches after the process records changed"""
+        with self._lock:
+            targets = {}
+            for title, info in self.pm.snapshot():
+                paths = self._watch_paths(info.spec)
+                if paths:
+                    target = _Target(paths, info.spec.watch_ignore)
+                    current = self._targets.get(title)
+                    targets[title] = current if current and current.key == target.key else target
+            self._targets = targets
+
+            # Watch each root once, skipping roots nested in another root
+            roots = sorted({root for target in targets.values() for root in target.paths if os.path.exists(root)})
+            top = set()
+            for root in roots:
+                if not any(root.startswith(parent + os.sep) for parent in top):
+                    top.add(root)
+            wanted = {}
+            for root in top:
+                if os.path.isdir(root):
+                    self._plan(root, list(targets.values()), wanted)
+                else:
+                    wanted[root] = False
+
+            if wanted and self.observer is None:
+                self.observer = Observer()
+                self.observer.daemon = True
+                self.observer.start()
+            for path, (recursive, watch) in list(self._watches.items()):
+                if wanted.get(path) != recursive:
+                    del self._watches[path]
+                    try:
+                        self.observer.unschedule(watch)
+                    except (KeyError, OSError):
+                        pass  # The directory is gone and its watch with it
+            for path, recursive in wanted.items():
+                if path not in self._watches:
+                    try:
+                        self._watches[path] = (recursive, self.observer.schedule(self, path, recursive=recursive))
+                    except OSError:
+                        pass  # Removed since the walk, the parent's event plans again
+
+    def _plan(self, path: str, targets, wanted):
+        """Add the watches for a directory to ``wanted``, True if it had no ignored directory below it"""
+        targets = [target for target in targets if target.covers(path)]
+        children = []
+        clean = True
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        child = entry.path
+                        if all(target.ignores_dir(child) for target in targets if target.covers(child)):
+                            clean = False
+                        else:
+                            children.append(child)
+        except OSError:
+            return True
+        planned = {}
+        for child in children:
+            clean = self._plan(child, targets, planned) and clean
+        if clean:
+            wanted[path] = True
+        else:
+            wanted[path] = False
+            wanted.update(planned)
+        return clean
+
+    def on_any_event(self, event):
+        if event.event_type not in CHANGE_EVENTS:
+            # A process reading its own sources must not restart itself
+            return
+        if event.is_directory and event.event_type == 'modified':
+            return
+        if event.is_directory and event.event_type in ('created', 'deleted', 'moved'):
+            # Watch new directories and drop removed ones once the burst settled
+            self.timers.cancel(self._replan)
+            self._replan = self.timers.call_later(self.debounce, self.sync)
+        paths = [event.src_path]
+        if getattr(event, 'dest_path', None):
+            paths.append(event.dest_path)
+
+        with self._lock:
+            for title, target in self._targets.items():
+                if any(target.matches(path) for path in paths):
+                    # Push the restart back on every change in the burst
+                    self.timers.cancel(self._pending.get(title))
+                    self._pending[title] = self.timers.call_later(self.debounce, self._restart, title)
+
+    def _restart(self, title: str):
+        with self._lock:
+            self._pending.pop(title, None)
+        info = self.pm.processes.get(title)
+        if not info or info.state.status != 'running':
+            return
+        self.pm.console.print(f"[cyan]Files changed, restarting '{title}'[/cyan]")
+        # Restarting waits for the old process, keep that off the timer thread
+        thread = threading.Thread(target=self.pm.restart, args=(title,))
+        thread.daemon = True
+        thread.start()
+
+    def shutdown(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join(timeout=1)